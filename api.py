@@ -0,0 +1,211 @@
+#----------------------------------------------------------------------------#
+# JSON API, /api/v1.
+#
+#   /api/v1/venues?city=Austin&genre=Jazz&fields=id,name&limit=100
+#   /api/v1/artists?state=CA&updated_since=2021-01-01T00:00:00
+#   /api/v1/shows?city=Austin&from=2021-06-01&to=2021-07-01
+#
+# Pages are keyed on the sort columns: follow 'next' (or pass after=) for the
+# next page. fields= selects columns, and only those columns are queried.
+# Rows are serialized straight from the result tuples, not ORM objects.
+#----------------------------------------------------------------------------#
+
+import datetime
+import json
+from urllib.parse import urlencode
+
+from flask import Blueprint, Response, current_app, jsonify, request
+from sqlalchemy import tuple_
+
+from extensions import db
+from pages import has_genre, venues_validator, artists_validator, shows_validator
+from cache import response_cache
+from conditional import conditional
+from models import Venue, Artist, Show
+
+api = Blueprint('api', __name__, url_prefix='/api/v1')
+
+FIELDS = {
+    'venues': {column.name: getattr(Venue, column.name) for column in Venue.__table__.columns
+               if column.name != 'geo_cell'},
+    'artists': {column.name: getattr(Artist, column.name) for column in Artist.__table__.columns},
+    'shows': {
+        'id': Show.id,
+        'start_time': Show.start_time,
+        'end_time': Show.end_time,
+        'venue_id': Show.venue_id,
+        'venue_name': Venue.name,
+        'venue_city': Venue.city,
+        'venue_state': Venue.state,
+        'venue_timezone': Venue.timezone,
+        'venue_image_link': Venue.image_link,
+        'artist_id': Show.artist_id,
+        'artist_name': Artist.name,
+        'artist_image_link': Artist.image_link,
+        'updated_at': Show.updated_at,
+    },
+}
+
+
+class ApiError(Exception):
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+@api.errorhandler(ApiError)
+def api_error(e):
+    return jsonify(error=e.message), e.status
+
+
+#  Queries
+#  ----------------------------------------------------------------
+#  Built from the query arguments alone (a werkzeug or starlette mapping) so
+#  asgi.py can run them as well. Each returns (names, query, limit, cursor):
+#  the requested field names, the query, the page size, and a function
+#  giving the 'after' value for a row.
+
+def argument(args, name, parse):
+    value = args.get(name)
+    if value is None:
+        return None
+    try:
+        return parse(value)
+    except ValueError:
+        raise ApiError(400, f'Invalid {name}: {value!r}')
+
+
+def selected_fields(args, kind, required):
+    # the requested columns, plus the ones the cursor needs
+    available = FIELDS[kind]
+    names = args.get('fields')
+    names = names.split(',') if names else list(available)
+    unknown = [name for name in names if name not in available]
+    if unknown:
+        raise ApiError(400, f'Unknown fields: {", ".join(unknown)}')
+    extra = [name for name in required if name not in names]
+    return names, [available[name] for name in names + extra]
+
+
+def page_size(args, config):
+    limit = argument(args, 'limit', int) or config['API_PAGE_SIZE']
+    return max(1, min(limit, config['API_MAX_PAGE_SIZE']))
+
+
+def entities_query(model, kind, args, config):
+    names, columns = selected_fields(args, kind, ['id'])
+    query = db.session.query(*columns)
+
+    city = args.get('city')
+    if city:
+        query = query.filter(model.city == city)
+    state = args.get('state')
+    if state:
+        query = query.filter(model.state == state)
+    genre = args.get('genre')
+    if genre:
+        query = query.filter(has_genre(model.genres, genre))
+    updated_since = argument(args, 'updated_since', datetime.datetime.fromisoformat)
+    if updated_since:
+        query = query.filter(model.updated_at >= updated_since)
+    after = argument(args, 'after', int)
+    if after is not None:
+        query = query.filter(model.id > after)
+
+    limit = page_size(args, config)
+    query = query.order_by(model.id).limit(limit + 1)
+    id_position = (names + ['id']).index('id')
+    return names, query, limit, lambda row: str(row[id_position])
+
+
+def shows_query(args, config):
+    names, columns = selected_fields(args, 'shows', ['start_time', 'id'])
+    query = db.session.query(*columns).select_from(Show)
+
+    # join only the tables the fields or filters use
+    tables = {column.class_ for column in columns}
+    city, state = args.get('city'), args.get('state')
+    if Venue in tables or city or state:
+        query = query.join(Venue, Venue.id == Show.venue_id)
+    if Artist in tables:
+        query = query.join(Artist, Artist.id == Show.artist_id)
+
+    if city:
+        query = query.filter(Venue.city == city)
+    if state:
+        query = query.filter(Venue.state == state)
+    for name, column in (('venue_id', Show.venue_id), ('artist_id', Show.artist_id)):
+        value = argument(args, name, int)
+        if value is not None:
+            query = query.filter(column == value)
+    start = argument(args, 'from', datetime.datetime.fromisoformat)
+    if start:
+        query = query.filter(Show.start_time >= start)
+    end = argument(args, 'to', datetime.datetime.fromisoformat)
+    if end:
+        query = query.filter(Show.start_time < end)
+
+    cursor = args.get('after')
+    if cursor:
+        try:
+            after_time, after_id = cursor.rsplit(',', 1)
+            after = (datetime.datetime.fromisoformat(after_time), int(after_id))
+        except ValueError:
+            raise ApiError(400, f'Invalid after: {cursor!r}')
+        query = query.filter(tuple_(Show.start_time, Show.id) > tuple_(*after))
+
+    limit = page_size(args, config)
+    query = query.order_by(Show.start_time, Show.id).limit(limit + 1)
+    positions = names + [name for name in ('start_time', 'id') if name not in names]
+    time_position, id_position = positions.index('start_time'), positions.index('id')
+    return names, query, limit, lambda row: f'{row[time_position].isoformat()},{row[id_position]}'
+
+
+#  Serialization
+#  ----------------------------------------------------------------
+
+def encode(value):
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    raise TypeError(f'{type(value).__name__} is not JSON serializable')
+
+
+def serialize(names, rows, limit, cursor, path, args):
+    # rows carry the requested columns first, then any the cursor needed
+    count = len(names)
+    data = [dict(zip(names, row[:count])) for row in rows[:limit]]
+    next_url = None
+    if len(rows) > limit:
+        next_url = path + '?' + urlencode({**args, 'after': cursor(rows[limit - 1])})
+    return json.dumps({'data': data, 'next': next_url}, default=encode, separators=(',', ':'))
+
+
+def listing(names, query, limit, cursor):
+    body = serialize(names, query.all(), limit, cursor, request.path, request.args.to_dict())
+    return Response(body, mimetype='application/json')
+
+
+#  Routes
+#  ----------------------------------------------------------------
+
+@api.route('/venues')
+@conditional(venues_validator)
+@response_cache.cached(tags=['venues'])
+def venues():
+    return listing(*entities_query(Venue, 'venues', request.args, current_app.config))
+
+
+@api.route('/artists')
+@conditional(artists_validator)
+@response_cache.cached(tags=['artists'])
+def artists():
+    return listing(*entities_query(Artist, 'artists', request.args, current_app.config))
+
+
+@api.route('/shows')
+@conditional(shows_validator)
+@response_cache.cached(tags=['shows'])
+def shows():
+    return listing(*shows_query(request.args, current_app.config))
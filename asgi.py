@@ -0,0 +1,270 @@
+#----------------------------------------------------------------------------#
+# Async serving mode for the read paths (Postgres only).
+#
+#   uvicorn asgi:application --workers 4
+#   gunicorn asgi:application -k uvicorn.workers.UvicornWorker --workers 4
+#
+# The venue, artist and show listings and detail pages, both searches and the
+# /api/v1 listings are answered here: their queries (built by pages.py, search.py
+# and api.py, exactly as the Flask views build them) are compiled for asyncpg
+# and run on an asyncpg pool, and the independent queries of a page (a venue
+# and its shows, a search count and its page) run concurrently. The pages are
+# rendered with the Flask app's templates. Everything else, and any request
+# that has flashed messages waiting in its session, is passed through to the
+# Flask app unchanged.
+#
+# Not done here: conditional GET and the response cache, both of which live in
+# the Flask request cycle; put the async workers behind the same cache (or use
+# the sync app) where those matter more than throughput.
+# The pool connects to the primary; the read replicas of routing.py are only
+# used by the Flask app.
+#----------------------------------------------------------------------------#
+
+import asyncio
+import collections
+import contextlib
+import functools
+import re
+from http.cookies import SimpleCookie
+from urllib.parse import parse_qs
+
+import asyncpg
+from a2wsgi import WSGIMiddleware
+from flask import render_template
+from sqlalchemy.dialects.postgresql.base import PGDialect
+from sqlalchemy.engine.url import make_url
+from starlette.applications import Starlette
+from starlette.responses import HTMLResponse, Response
+from starlette.routing import Mount, Route
+
+from app import create_app
+import api
+import pages
+import search
+from models import Venue, Artist
+
+DIALECT = PGDialect(paramstyle='numeric')
+PARAMETER = re.compile(r'(?<!:):(\d+)')
+
+flask_app = create_app()
+flask = WSGIMiddleware(flask_app)
+pool = None
+
+
+#  Queries
+#  ----------------------------------------------------------------
+#  The werkzeug context stacks are per thread, not per task, so a Flask
+#  context is only ever held between two awaits: queries are built in one
+#  context and the page is rendered in another.
+
+def compile_query(query):
+    compiled = query.statement.compile(dialect=DIALECT)
+    sql = PARAMETER.sub(r'$\1', compiled.string)
+    return sql, [compiled.params[name] for name in compiled.positiontup]
+
+
+@functools.lru_cache(maxsize=None)
+def row_type(keys):
+    return collections.namedtuple('Row', keys, rename=True)
+
+
+async def fetch(compiled):
+    # rows as named tuples, like the ORM's, so pages.py can use them as is
+    sql, params = compiled
+    records = await pool.fetch(sql, *params)
+    if not records:
+        return []
+    Row = row_type(tuple(records[0].keys()))
+    return [Row(*record) for record in records]
+
+
+async def fetch_first(compiled):
+    rows = await fetch(compiled)
+    return rows[0] if rows else None
+
+
+async def fetch_scalar(compiled):
+    sql, params = compiled
+    return await pool.fetchval(sql, *params)
+
+
+def flask_context(request, form=None):
+    # a request context for building queries and rendering templates
+    headers = [(key.decode('latin-1'), value.decode('latin-1')) for key, value in request.scope['headers']]
+    return flask_app.test_request_context(
+        request.url.path,
+        base_url=f'{request.url.scheme}://{request.url.netloc}',
+        query_string=request.url.query,
+        method=request.method,
+        headers=headers,
+        data=form,
+    )
+
+
+def render(request, template, context, form=None):
+    with flask_context(request, form):
+        return HTMLResponse(render_template(template, **context))
+
+
+#  Venues
+#  ----------------------------------------------------------------
+
+async def venues(request):
+    per_page = flask_app.config['AREAS_PER_PAGE']
+    try:
+        after = request.query_params.get('after') and pages.parse_area_cursor(request.query_params['after'])
+    except ValueError:
+        return flask
+    with flask_context(request):
+        query = compile_query(pages.venues_query(after, per_page))
+    rows = await fetch(query)
+    return render(request, 'pages/venues.html', pages.venues_context(rows, per_page))
+
+
+async def show_venue(request):
+    venue_id = request.path_params['venue_id']
+    with flask_context(request):
+        queries = compile_query(pages.venue_query(venue_id)), compile_query(pages.venue_shows_query(venue_id))
+    venue, shows = await asyncio.gather(fetch_first(queries[0]), fetch(queries[1]))
+    if venue is None:
+        return flask
+    return render(request, 'pages/show_venue.html', pages.venue_context(venue, shows))
+
+
+#  Artists
+#  ----------------------------------------------------------------
+
+async def artists(request):
+    with flask_context(request):
+        query = compile_query(pages.artists_query())
+    rows = await fetch(query)
+    return render(request, 'pages/artists.html', pages.artists_context(rows))
+
+
+async def show_artist(request):
+    artist_id = request.path_params['artist_id']
+    with flask_context(request):
+        queries = compile_query(pages.artist_query(artist_id)), compile_query(pages.artist_shows_query(artist_id))
+    artist, shows = await asyncio.gather(fetch_first(queries[0]), fetch(queries[1]))
+    if artist is None:
+        return flask
+    return render(request, 'pages/show_artist.html', pages.artist_context(artist, shows))
+
+
+#  Shows
+#  ----------------------------------------------------------------
+
+async def shows(request):
+    per_page = flask_app.config['SHOWS_PER_PAGE']
+    try:
+        after = request.query_params.get('after') and pages.parse_show_cursor(request.query_params['after'])
+    except ValueError:
+        return flask
+    with flask_context(request):
+        query = compile_query(pages.shows_query(after, per_page))
+    rows = await fetch(query)
+    return render(request, 'pages/shows.html', pages.shows_context(rows, per_page))
+
+
+#  Search
+#  ----------------------------------------------------------------
+
+def searcher(model, template):
+    async def search_view(request):
+        # main.html -> name="search_term"
+        body = await request.body()
+        form = {name: values[0] for name, values in parse_qs(body.decode()).items()}
+        search_term = form.get('search_term', '')
+        try:
+            page = max(int(form.get('page', 1)), 1)
+        except ValueError:
+            page = 1
+        per_page = flask_app.config['SEARCH_RESULTS_PER_PAGE']
+
+        with flask_context(request):
+            count, rows = map(compile_query, search.trigram_queries(model, search_term, page, per_page))
+        count, rows = await asyncio.gather(fetch_scalar(count), fetch(rows))
+        return render(request, template, pages.search_context(search_term, count, rows, page, per_page), form)
+    return search_view
+
+
+#  JSON API
+#  ----------------------------------------------------------------
+
+def listing(build):
+    async def api_view(request):
+        args = dict(request.query_params)
+        try:
+            with flask_context(request):
+                names, query, limit, cursor = build(args, flask_app.config)
+                query = compile_query(query)
+        except api.ApiError:
+            return flask
+        rows = await fetch(query)
+        body = api.serialize(names, rows, limit, cursor, request.url.path, args)
+        return Response(body, media_type='application/json')
+    return api_view
+
+
+#  Application
+#  ----------------------------------------------------------------
+
+@contextlib.asynccontextmanager
+async def lifespan(starlette):
+    global pool
+    url = make_url(flask_app.config['SQLALCHEMY_DATABASE_URI'])
+    url.drivername = 'postgresql'
+    settings = flask_app.config['POOL_SETTINGS']
+    pool = await asyncpg.create_pool(
+        str(url),
+        min_size=min(2, settings['pool_size']),
+        max_size=settings['pool_size'] + settings['max_overflow'],
+        max_inactive_connection_lifetime=settings['pool_recycle'],
+        timeout=settings['pool_timeout'],
+        server_settings={'statement_timeout': str(settings['statement_timeout_ms'])},
+    )
+    try:
+        yield
+    finally:
+        await pool.close()
+
+
+routes = Starlette(
+    routes=[
+        Route('/venues', venues),
+        Route('/venues/{venue_id:int}', show_venue),
+        Route('/venues/search', searcher(Venue, 'pages/search_venues.html'), methods=['POST']),
+        Route('/artists', artists),
+        Route('/artists/{artist_id:int}', show_artist),
+        Route('/artists/search', searcher(Artist, 'pages/search_artists.html'), methods=['POST']),
+        Route('/shows', shows),
+        Route('/api/v1/venues', listing(functools.partial(api.entities_query, Venue, 'venues'))),
+        Route('/api/v1/artists', listing(functools.partial(api.entities_query, Artist, 'artists'))),
+        Route('/api/v1/shows', listing(api.shows_query)),
+        Mount('', flask),
+    ],
+    lifespan=lifespan,
+)
+
+
+def has_flashes(scope):
+    # flashed messages are consumed by the page that shows them, which needs
+    # the Flask request cycle to save the session
+    for key, value in scope['headers']:
+        if key == b'cookie':
+            morsel = SimpleCookie(value.decode('latin-1')).get(flask_app.session_cookie_name)
+            if morsel is None:
+                return False
+            serializer = flask_app.session_interface.get_signing_serializer(flask_app)
+            try:
+                return '_flashes' in serializer.loads(morsel.value)
+            except Exception:
+                return False
+    return False
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'http' and has_flashes(scope):
+        await flask(scope, receive, send)
+    else:
+        await routes(scope, receive, send)
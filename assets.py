@@ -0,0 +1,214 @@
+#----------------------------------------------------------------------------#
+# Static asset pipeline.
+#
+#   pip install -r requirements-assets.txt
+#   flask assets build
+#
+# The build copies every file under static/ to ASSETS_PATH with a content
+# hash in its name (img/front-splash.jpg -> img/front-splash.3f9a1c2e.jpg),
+# and concatenates the files of each bundle in BUNDLES into one minified,
+# hashed file. Text files also get .gz and .br siblings, precompressed at the
+# highest level. manifest.json maps each file and bundle name to its hashed
+# path. url() references in the CSS are rewritten to the hashed files. Files
+# of earlier builds are kept for the pages that still link them. The
+# minifiers and brotli are only needed to build, and only imported there.
+#
+# Templates link assets with static_url('main.css') or
+# static_url('img/front-splash.jpg'): the hashed file under /assets/ when the
+# manifest has it, the plain /static/ file otherwise (before the first build,
+# in development; a bundle is then concatenated on each request, unminified
+# and uncached). /assets/ serves the precompressed variant the client
+# accepts, cached for ASSETS_MAX_AGE and marked immutable: a changed file gets
+# a new name, so a cached one never needs revalidating.
+#----------------------------------------------------------------------------#
+
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import posixpath
+import re
+
+import click
+from flask import Blueprint, abort, current_app, request, safe_join, send_from_directory, url_for
+from flask.cli import with_appcontext
+
+# name -> files under static/, in order
+BUNDLES = {
+    'main.css': [
+        'css/bootstrap.min.css',
+        'css/layout.main.css',
+        'css/main.css',
+        'css/main.responsive.css',
+        'css/main.quickfix.css',
+    ],
+    'head.js': [
+        'js/libs/modernizr-2.8.2.min.js',
+        'js/libs/moment.min.js',
+    ],
+    'main.js': [
+        'js/libs/jquery-1.11.1.min.js',
+        'js/libs/bootstrap-3.1.1.min.js',
+        'js/plugins.js',
+        'js/script.js',
+    ],
+}
+
+COMPRESSED = {'.css', '.js', '.map', '.svg', '.json', '.txt', '.eot', '.otf', '.ttf'}
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+CSS_URL = re.compile(r'''url\(\s*(['"]?)([^'")]+)\1\s*\)''')
+SOURCE_MAP = re.compile(r'^\s*//[#@] sourceMappingURL=.*$', re.MULTILINE)
+
+assets = Blueprint('assets', __name__)
+manifest = {}
+
+
+#  Serving
+#  ----------------------------------------------------------------
+
+def init_app(app):
+    manifest.clear()
+    path = os.path.join(app.config['ASSETS_PATH'], 'manifest.json')
+    if os.path.exists(path):
+        with open(path) as f:
+            manifest.update(json.load(f))
+    app.register_blueprint(assets)
+    app.jinja_env.globals['static_url'] = static_url
+
+
+def static_url(name):
+    hashed = manifest.get(name)
+    if hashed is not None:
+        return url_for('assets.asset', filename=hashed)
+    if name in BUNDLES:
+        return url_for('assets.asset', filename=name)
+    return url_for('static', filename=name)
+
+
+@assets.route('/assets/<path:filename>')
+def asset(filename):
+    root = current_app.config['ASSETS_PATH']
+    path = safe_join(root, filename)
+    if not os.path.isfile(path):
+        if filename not in BUNDLES:
+            abort(404)
+        response = current_app.response_class(bundle(filename, current_app.static_folder, {}, minify=False),
+                                              mimetype=mimetypes.guess_type(filename)[0])
+        response.cache_control.no_cache = True
+        return response
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    for encoding, suffix in ENCODINGS:
+        if encoding in request.accept_encodings and os.path.isfile(path + suffix):
+            response = send_from_directory(root, filename + suffix, mimetype=mimetype)
+            response.headers['Content-Encoding'] = encoding
+            break
+    else:
+        response = send_from_directory(root, filename, mimetype=mimetype)
+    response.cache_control.public = True
+    response.cache_control.max_age = current_app.config['ASSETS_MAX_AGE']
+    response.cache_control.immutable = True
+    response.vary.add('Accept-Encoding')
+    return response
+
+
+#  Building
+#  ----------------------------------------------------------------
+
+def hashed_name(name, content):
+    root, ext = posixpath.splitext(name)
+    return f'{root}.{hashlib.sha256(content).hexdigest()[:8]}{ext}'
+
+
+def write(out, name, content):
+    path = os.path.join(out, name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(content)
+    if posixpath.splitext(name)[1] not in COMPRESSED:
+        return
+    import brotli
+    for data, suffix in ((brotli.compress(content, quality=11), '.br'), (gzip.compress(content, 9, mtime=0), '.gz')):
+        if len(data) < len(content):
+            with open(path + suffix, 'wb') as f:
+                f.write(data)
+
+
+def rewrite_css(css, source, files):
+    # url()s relative to the source file, pointed at the hashed files
+    def replace(match):
+        url = match.group(2)
+        if re.match(r'^([a-z]+:|/|#)', url):
+            return match.group(0)
+        target, _, rest = url.partition('?')
+        target, hash_sep, fragment = target.partition('#')
+        name = posixpath.normpath(posixpath.join(posixpath.dirname(source), target))
+        if name in files:
+            path = url_for('assets.asset', filename=files[name])
+        else:
+            path = url_for('static', filename=name)
+        return f'url("{path}{"?" + rest if rest else ""}{hash_sep}{fragment}")'
+    return CSS_URL.sub(replace, css)
+
+
+def bundle(name, static, files, minify=True):
+    if minify:
+        import rcssmin
+        import rjsmin
+    parts = []
+    for source in BUNDLES[name]:
+        with open(os.path.join(static, source), encoding='utf-8') as f:
+            text = f.read()
+        if name.endswith('.css'):
+            text = rewrite_css(text, source, files)
+            parts.append(rcssmin.cssmin(text) if minify else text)
+        else:
+            # the maps of the minified libraries do not apply to the bundle
+            text = SOURCE_MAP.sub('', text)
+            parts.append(rjsmin.jsmin(text) if minify and not source.endswith('.min.js') else text)
+    separator = '\n' if name.endswith('.css') else ';\n'
+    return separator.join(parts).encode()
+
+
+def build(static, out):
+    # returns the manifest
+    files = {}
+    for directory, _, names in os.walk(static):
+        for filename in sorted(names):
+            if filename.startswith('.'):
+                continue
+            path = os.path.join(directory, filename)
+            name = os.path.relpath(path, static).replace(os.sep, '/')
+            with open(path, 'rb') as f:
+                content = f.read()
+            files[name] = hashed_name(name, content)
+            write(out, files[name], content)
+    bundles = {}
+    for name in BUNDLES:
+        content = bundle(name, static, files)
+        bundles[name] = hashed_name(name, content)
+        write(out, bundles[name], content)
+    result = dict(files, **bundles)
+    with open(os.path.join(out, 'manifest.json'), 'w') as f:
+        json.dump(result, f, indent=2, sort_keys=True)
+    return result
+
+
+#  Commands
+#  ----------------------------------------------------------------
+
+@click.group('assets')
+def assets_command():
+    """Build the static assets."""
+
+
+@assets_command.command('build')
+@with_appcontext
+def build_command():
+    """Bundle, hash and precompress the files under static/."""
+    out = current_app.config['ASSETS_PATH']
+    with current_app.test_request_context():
+        result = build(current_app.static_folder, out)
+    manifest.clear()
+    manifest.update(result)
+    click.echo(f'{len(result)} assets written to {out}.')
@@ -0,0 +1,4 @@
+import os
+
+# the benchmarks sign no real sessions; the app refuses to start without a key
+os.environ.setdefault('SECRET_KEY', 'benchmarks')
@@ -0,0 +1,166 @@
+#----------------------------------------------------------------------------#
+# Sync vs async throughput, per worker.
+#
+#   python -m benchmarks.async_benchmark --duration 20 --clients 16 --out async.json
+#
+# Starts one gunicorn worker serving the Flask app (with --threads threads)
+# and one uvicorn worker serving asgi.py, against the Postgres database in
+# DATABASE_URL (filled by benchmarks.datagen), and drives each read route with
+# --clients concurrent keep-alive clients for --duration seconds. Reports
+# requests per second and p50/p99 latency for each server; one worker each, so
+# the numbers are per worker.
+#----------------------------------------------------------------------------#
+
+import argparse
+import http.client
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from urllib.parse import urlencode
+
+os.environ.setdefault('CACHE_BACKEND', '')
+
+from app import create_app
+from extensions import db
+from models import Venue, Artist, Show
+
+app = create_app()
+
+
+def routes():
+    # (name, method, path, form)
+    with app.app_context():
+        if db.engine.dialect.name != 'postgresql':
+            raise SystemExit('The async server needs Postgres; point DATABASE_URL at one.')
+        venue = db.session.query(Venue.id, Venue.city).order_by(Venue.id).first()
+        artist = db.session.query(Artist.id).order_by(Artist.id).first()
+        middle = db.session.query(Show.start_time, Show.id).order_by(Show.start_time, Show.id) \
+            .offset(db.session.query(Show).count() // 2).first()
+        if venue is None or artist is None or middle is None:
+            raise SystemExit('The database is empty; run benchmarks.datagen first.')
+    return [
+        ('venues', 'GET', '/venues', None),
+        ('venue', 'GET', f'/venues/{venue.id}', None),
+        ('venue search', 'POST', '/venues/search', {'search_term': venue.city}),
+        ('artists', 'GET', '/artists', None),
+        ('artist', 'GET', f'/artists/{artist.id}', None),
+        ('shows', 'GET', f'/shows?after={middle.start_time.isoformat()},{middle.id}', None),
+        ('api venues', 'GET', '/api/v1/venues?limit=100', None),
+        ('api shows', 'GET', f'/api/v1/shows?city={venue.city}&limit=100', None),
+    ]
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start(command, port):
+    server = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return server
+        except OSError:
+            time.sleep(0.2)
+    server.kill()
+    raise SystemExit(f'{command[0]} did not start listening on port {port}')
+
+
+def drive(port, route, clients, duration):
+    name, method, path, form = route
+    body = urlencode(form) if form else None
+    headers = {'Content-Type': 'application/x-www-form-urlencoded'} if form else {}
+    timings, errors = [], []
+    stop = time.monotonic() + duration
+
+    def client():
+        connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+        mine, failed = [], 0
+        while time.monotonic() < stop:
+            started = time.perf_counter()
+            try:
+                connection.request(method, path, body=body, headers=headers)
+                response = connection.getresponse()
+                response.read()
+                if response.status >= 400:
+                    failed += 1
+            except (OSError, http.client.HTTPException):
+                failed += 1
+                connection.close()
+                connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+                continue
+            mine.append((time.perf_counter() - started) * 1000)
+        connection.close()
+        timings.extend(mine)
+        errors.append(failed)
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    started = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - started
+
+    quantiles = statistics.quantiles(timings, n=100, method='inclusive') if len(timings) > 1 else [0] * 99
+    return {
+        'requests': len(timings),
+        'errors': sum(errors),
+        'rps': round(len(timings) / elapsed, 1),
+        'p50_ms': round(quantiles[49], 2),
+        'p99_ms': round(quantiles[98], 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare sync and async throughput per worker.')
+    parser.add_argument('--duration', type=float, default=10, help='Seconds per route and server.')
+    parser.add_argument('--clients', type=int, default=16, help='Concurrent clients.')
+    parser.add_argument('--threads', type=int, default=8, help='Threads of the gunicorn worker.')
+    parser.add_argument('--only', action='append', help='Run only this route (by name); can be repeated.')
+    parser.add_argument('--out', help='Write the report here as JSON.')
+    args = parser.parse_args()
+
+    sync_port, async_port = free_port(), free_port()
+    servers = {
+        'sync': (sync_port, [sys.executable, '-m', 'gunicorn', '--workers', '1', '--threads', str(args.threads),
+                             '--bind', f'127.0.0.1:{sync_port}', 'app:app']),
+        'async': (async_port, [sys.executable, '-m', 'uvicorn', '--workers', '1', '--no-access-log',
+                               '--port', str(async_port), 'asgi:application']),
+    }
+    report = {'meta': {'duration': args.duration, 'clients': args.clients, 'threads': args.threads}, 'routes': {}}
+    selected = [route for route in routes() if not args.only or route[0] in args.only]
+
+    for mode, (port, command) in servers.items():
+        server = start(command, port)
+        try:
+            for route in selected:
+                drive(port, route, args.clients, min(args.duration, 1))   # warm up
+                result = report['routes'].setdefault(route[0], {})[mode] = \
+                    drive(port, route, args.clients, args.duration)
+                print(f'{mode:<6} {route[0]:<14} {result["rps"]:>9} req/s  p50 {result["p50_ms"]:>8} ms  '
+                      f'p99 {result["p99_ms"]:>8} ms' + (f'  {result["errors"]} errors' if result['errors'] else ''))
+        finally:
+            server.terminate()
+            server.wait()
+
+    print(f'\n{"route":<14} {"sync req/s":>11} {"async req/s":>12} {"ratio":>7}')
+    for name, result in report['routes'].items():
+        ratio = result['async']['rps'] / result['sync']['rps'] if result['sync']['rps'] else 0
+        print(f'{name:<14} {result["sync"]["rps"]:>11} {result["async"]["rps"]:>12} {ratio:>6.2f}x')
+
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
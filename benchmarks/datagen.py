@@ -0,0 +1,196 @@
+#----------------------------------------------------------------------------#
+# Deterministic synthetic catalogue.
+#
+#   python -m benchmarks.datagen --scale large
+#   python -m benchmarks.datagen --venues 500 --artists 2000 --shows 20000 --seed 7
+#
+# The same seed and sizes always produce the same rows. Show times are spread
+# two years either side of --epoch (today by default) so pages have both past
+# and upcoming shows. The target database must be empty: on Postgres run
+# 'flask db upgrade' first, on SQLite the tables are created here.
+#----------------------------------------------------------------------------#
+
+import argparse
+import datetime
+import random
+import time
+
+from sqlalchemy import text
+
+from app import create_app
+from extensions import db
+import counters
+import geo
+import scheduling
+import search
+from importer import insert_records
+from models import Venue, Artist, Show
+
+app = create_app()
+
+SCALES = {
+    'small': {'venues': 100, 'artists': 1000, 'shows': 10000},
+    'medium': {'venues': 1000, 'artists': 10000, 'shows': 100000},
+    'large': {'venues': 10000, 'artists': 100000, 'shows': 1000000},
+}
+
+GENRES = ['Alternative', 'Blues', 'Classical', 'Country', 'Electronic', 'Folk', 'Funk',
+          'Hip-Hop', 'Heavy Metal', 'Instrumental', 'Jazz', 'Musical Theatre', 'Pop',
+          'Punk', 'R&B', 'Reggae', 'Rock n Roll', 'Soul', 'Other']
+STATES = ['CA', 'NY', 'TX', 'WA', 'IL', 'MA', 'FL', 'CO', 'GA', 'OR']
+CITY_PARTS = ['Spring', 'Oak', 'River', 'Lake', 'Hill', 'Fair', 'Green', 'Maple', 'Cedar', 'Clear']
+CITY_SUFFIXES = ['field', 'ville', 'ton', ' City', 'port', 'wood', 'dale', ' Falls']
+VENUE_WORDS = ['The', 'Blue', 'Red', 'Golden', 'Velvet', 'Electric', 'Old', 'Midnight']
+VENUE_NOUNS = ['Room', 'Hall', 'Lounge', 'Hop', 'Theatre', 'Club', 'Tavern', 'Garden']
+TIMEZONES = [None, 'America/Los_Angeles', 'America/Chicago', 'America/New_York']
+ARTIST_WORDS = ['Guns', 'Petals', 'Wild', 'Sabers', 'Quevedo', 'Echo', 'Static', 'Velvet', 'Neon']
+
+BATCH_SIZE = 5000
+
+
+def cities(rng, count):
+    names = set()
+    while len(names) < count:
+        names.add((rng.choice(CITY_PARTS) + rng.choice(CITY_SUFFIXES), rng.choice(STATES)))
+    return sorted(names)
+
+
+def area_center(city, state):
+    # a point in the continental US for each area, from a generator of its
+    # own so the rest of the catalogue is the same as without coordinates
+    place = random.Random(f'{city},{state}')
+    return place.uniform(25, 49), place.uniform(-124, -67)
+
+
+def generate_venues(rng, count, areas):
+    for id in range(1, count + 1):
+        city, state = rng.choice(areas)
+        seeking = rng.random() < 0.4
+        # within about 20 km of the area's center
+        place = random.Random(id)
+        latitude, longitude = area_center(city, state)
+        latitude += place.uniform(-0.2, 0.2)
+        longitude += place.uniform(-0.2, 0.2)
+        yield {
+            'id': id,
+            'name': f'{rng.choice(VENUE_WORDS)} {rng.choice(VENUE_NOUNS)} {id}',
+            'city': city,
+            'state': state,
+            'address': f'{rng.randint(1, 9999)} Main Street',
+            'phone': f'{rng.randint(200, 999)}-{rng.randint(100, 999)}-{rng.randint(1000, 9999)}',
+            'website': f'https://venue{id}.example.com',
+            'genres': rng.sample(GENRES, rng.randint(1, 3)),
+            'image_link': f'https://images.example.com/venues/{id}.jpg',
+            'facebook_link': f'https://www.facebook.com/venue{id}',
+            'seeking_talent': seeking,
+            'seeking_description': 'Looking for local acts' if seeking else None,
+            'timezone': rng.choice(TIMEZONES),
+            'latitude': latitude,
+            'longitude': longitude,
+            'geo_cell': geo.grid_cell(latitude, longitude),
+        }
+
+
+def generate_artists(rng, count, areas):
+    for id in range(1, count + 1):
+        city, state = rng.choice(areas)
+        seeking = rng.random() < 0.5
+        yield {
+            'id': id,
+            'name': f'{rng.choice(ARTIST_WORDS)} {rng.choice(ARTIST_WORDS)} {id}',
+            'city': city,
+            'state': state,
+            'phone': f'{rng.randint(200, 999)}-{rng.randint(100, 999)}-{rng.randint(1000, 9999)}',
+            'website': f'https://artist{id}.example.com',
+            'genres': rng.sample(GENRES, rng.randint(1, 3)),
+            'image_link': f'https://images.example.com/artists/{id}.jpg',
+            'facebook_link': f'https://www.facebook.com/artist{id}',
+            'seeking_venue': seeking,
+            'seeking_description': 'Looking for gigs' if seeking else None,
+        }
+
+
+# shows start at 18:00, 20:00 or 22:00 and last up to two hours, so a venue
+# has SLOTS free slots and its shows never overlap
+SLOTS = 1461 * 3
+
+
+def generate_shows(rng, count, venues, artists, epoch):
+    start = datetime.datetime.combine(epoch, datetime.time(18)) - datetime.timedelta(days=730)
+    taken = set()
+    for id in range(1, count + 1):
+        venue_id, slot = rng.randint(1, venues), rng.randrange(SLOTS)
+        while (venue_id, slot) in taken:
+            venue_id, slot = rng.randint(1, venues), rng.randrange(SLOTS)
+        taken.add((venue_id, slot))
+        start_time = start + datetime.timedelta(days=slot // 3, hours=slot % 3 * 2)
+        yield {
+            'id': id,
+            'venue_id': venue_id,
+            'artist_id': rng.randint(1, artists),
+            'start_time': start_time,
+            'end_time': start_time + datetime.timedelta(minutes=rng.choice((60, 90, 120))),
+        }
+
+
+def load(model, rows):
+    batch = []
+    total = 0
+    started = time.time()
+    for row in rows:
+        batch.append(row)
+        if len(batch) == BATCH_SIZE:
+            insert_records(model, batch)
+            db.session.commit()
+            total += len(batch)
+            batch = []
+    if batch:
+        insert_records(model, batch)
+        db.session.commit()
+        total += len(batch)
+    print(f'  {total} {model.__tablename__} rows in {time.time() - started:.1f}s')
+
+
+def populate(sizes, seed=0, epoch=None):
+    rng = random.Random(seed)
+    epoch = epoch or datetime.date.today()
+    if db.engine.dialect.name == 'sqlite':
+        db.create_all()
+        search.install_sqlite_fts(db.engine, [Venue, Artist])
+        scheduling.install_sqlite_triggers(db.engine, app.config['SHOW_MAX_MINUTES'])
+        counters.install(db.engine)
+    if db.session.query(Venue.id).first() is not None:
+        raise SystemExit('The database already has venues; datagen needs an empty one.')
+    if sizes['shows'] > sizes['venues'] * SLOTS:
+        raise SystemExit(f'At most {SLOTS} shows per venue fit without overlapping.')
+
+    areas = cities(rng, max(sizes['venues'] // 20, 1))
+    load(Venue, generate_venues(rng, sizes['venues'], areas))
+    load(Artist, generate_artists(rng, sizes['artists'], areas))
+    load(Show, generate_shows(rng, sizes['shows'], sizes['venues'], sizes['artists'], epoch))
+    if db.engine.dialect.name == 'postgresql':
+        db.session.execute(text('ANALYZE'))
+        db.session.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Fill an empty database with a synthetic catalogue.')
+    parser.add_argument('--scale', choices=list(SCALES), default='small')
+    parser.add_argument('--venues', type=int)
+    parser.add_argument('--artists', type=int)
+    parser.add_argument('--shows', type=int)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--epoch', type=datetime.date.fromisoformat, help='YYYY-MM-DD, defaults to today.')
+    args = parser.parse_args()
+
+    sizes = dict(SCALES[args.scale])
+    for kind in sizes:
+        if getattr(args, kind):
+            sizes[kind] = getattr(args, kind)
+
+    with app.app_context():
+        populate(sizes, args.seed, args.epoch)
+
+
+if __name__ == '__main__':
+    main()
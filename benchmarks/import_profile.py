@@ -0,0 +1,96 @@
+#----------------------------------------------------------------------------#
+# Import-time profile of a worker's boot.
+#
+#   python -m benchmarks.import_profile
+#   python -m benchmarks.import_profile --budget 300 --out boot.json
+#
+# Boots the app in a fresh interpreter the way wsgi.py does (import app, then
+# create_app()) under python -X importtime, and reports how long each step
+# took, the packages that took the most time to import (their own module
+# bodies, summed, so nothing is counted twice) and every module of this
+# repository. With --budget the exit status is 1 when the boot takes more
+# than that many milliseconds. The first run after a change also compiles
+# the bytecode: read the second one.
+#----------------------------------------------------------------------------#
+
+import argparse
+import collections
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = '''
+import time
+started = time.perf_counter()
+from app import create_app
+imported = time.perf_counter()
+create_app()
+print((imported - started) * 1000, (time.perf_counter() - imported) * 1000)
+'''
+
+
+def profile():
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', PROBE], cwd=ROOT,
+                            capture_output=True, text=True)
+    if result.returncode != 0:
+        raise SystemExit(result.stderr)
+    import_ms, create_ms = (float(value) for value in result.stdout.split()[-2:])
+    modules = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        own, cumulative, name = line[len('import time:'):].split('|')
+        modules.append((name.strip(), int(own) / 1000, int(cumulative) / 1000))
+    return import_ms, create_ms, modules
+
+
+def local_modules():
+    names = {name[:-3] for name in os.listdir(ROOT) if name.endswith('.py')}
+    return names | {'benchmarks'}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Profile the imports of a worker boot.')
+    parser.add_argument('--top', type=int, default=15, help='Packages to list.')
+    parser.add_argument('--budget', type=float, help='Fail when the boot takes longer, in ms.')
+    parser.add_argument('--out', help='Write the report here as JSON.')
+    args = parser.parse_args()
+
+    import_ms, create_ms, modules = profile()
+    packages = collections.Counter()
+    for name, own, cumulative in modules:
+        packages[name.split('.')[0]] += own
+    local = local_modules()
+    report = {
+        'import_ms': round(import_ms, 1),
+        'create_app_ms': round(create_ms, 1),
+        'boot_ms': round(import_ms + create_ms, 1),
+        'modules': len(modules),
+        'packages': {name: round(ms, 1) for name, ms in packages.most_common(args.top)},
+        'local': {name: {'self_ms': round(own, 1), 'cumulative_ms': round(cumulative, 1)}
+                  for name, own, cumulative in modules if name.split('.')[0] in local},
+    }
+
+    print(f'import app    {report["import_ms"]:>8} ms')
+    print(f'create_app()  {report["create_app_ms"]:>8} ms')
+    print(f'boot          {report["boot_ms"]:>8} ms  ({report["modules"]} modules imported)')
+    print('\nslowest packages (own import time)')
+    for name, ms in report['packages'].items():
+        print(f'  {name:<24} {ms:>8} ms')
+    print('\nthis repository (own / with its imports)')
+    for name, times in sorted(report['local'].items(), key=lambda item: -item[1]['cumulative_ms']):
+        print(f'  {name:<24} {times["self_ms"]:>8} ms {times["cumulative_ms"]:>8} ms')
+
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(report, f, indent=2)
+    if args.budget is not None and report['boot_ms'] > args.budget:
+        print(f'\nboot took {report["boot_ms"]} ms, over the {args.budget:g} ms budget')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,165 @@
+#----------------------------------------------------------------------------#
+# Before/after benchmark for the index migration (a7c6c87d6dfc).
+#
+#   DATABASE_URL=postgresql://localhost/fyyur_bench \
+#       python -m benchmarks.index_benchmark --venues 10000 --artists 100000 --shows 1000000
+#
+# Run from the repository root against an empty Postgres database. The script
+# migrates to the revision before the indexes, seeds a deterministic dataset
+# with generate_series, times every read route through the test client, then
+# upgrades to the index revision and times them again. The response cache is
+# disabled so every request reaches the database.
+#----------------------------------------------------------------------------#
+
+import argparse
+import json
+import os
+import statistics
+import time
+
+os.environ['CACHE_BACKEND'] = ''
+
+from alembic.util import CommandError
+from flask_migrate import Migrate, upgrade, downgrade
+from sqlalchemy import event, text
+
+from app import create_app
+from extensions import db
+
+# create_app() only sets up migrations when the flask command loads it
+app = create_app()
+Migrate(app, db, compare_type=True)
+
+BEFORE = 'e5b165eaa362'
+AFTER = 'a7c6c87d6dfc'
+
+SEED = [
+    '''INSERT INTO "Venue" (name, city, state, address, genres, facebook_link, seeking_talent)
+       SELECT 'Venue ' || i, 'City ' || (i % :cities), (ARRAY['CA', 'NY', 'TX', 'WA', 'IL'])[1 + i % 5],
+              i || ' Main Street', ARRAY[(ARRAY['Jazz', 'Blues', 'Pop', 'Folk', 'Soul'])[1 + i % 5]],
+              'https://www.facebook.com/venue' || i, i % 2 = 0
+       FROM generate_series(1, :venues) AS i''',
+    '''INSERT INTO "Artist" (name, city, state, genres, facebook_link, seeking_venue)
+       SELECT 'Artist ' || i, 'City ' || (i % :cities), (ARRAY['CA', 'NY', 'TX', 'WA', 'IL'])[1 + i % 5],
+              ARRAY[(ARRAY['Jazz', 'Blues', 'Pop', 'Folk', 'Soul'])[1 + i % 5]],
+              'https://www.facebook.com/artist' || i, i % 3 = 0
+       FROM generate_series(1, :artists) AS i''',
+    # spread shows over venues and artists with co-prime strides, over four years
+    '''INSERT INTO "Show" (venue_id, artist_id, start_time)
+       SELECT v.first + (i * 7919) % :venues, a.first + (i * 104729) % :artists,
+              timestamp '2019-01-01 18:00' + (i % 1461) * interval '1 day' + (i % 6) * interval '1 hour'
+       FROM generate_series(1, :shows) AS i,
+            (SELECT min(id) AS first FROM "Venue") AS v,
+            (SELECT min(id) AS first FROM "Artist") AS a''',
+]
+
+
+def seed(sizes):
+    if db.session.execute(text('SELECT count(*) FROM "Show"')).scalar():
+        print('Database already seeded, reusing it')
+        return
+    for statement in SEED:
+        started = time.time()
+        db.session.execute(text(statement), sizes)
+        db.session.commit()
+        print(f'  {statement.split()[2]} seeded in {time.time() - started:.1f}s')
+
+
+def routes():
+    venue_id = db.session.execute(text('SELECT min(id) + count(*) / 2 FROM "Venue"')).scalar()
+    artist_id = db.session.execute(text('SELECT min(id) + count(*) / 2 FROM "Artist"')).scalar()
+    middle = db.session.execute(text(
+        'SELECT start_time, id FROM "Show" ORDER BY start_time, id '
+        'OFFSET (SELECT count(*) / 2 FROM "Show") LIMIT 1')).first()
+    return [
+        ('GET', '/venues', None),
+        ('GET', '/venues?after=City 5,CA', None),
+        ('GET', f'/venues/{venue_id}', None),
+        ('GET', '/artists', None),
+        ('GET', f'/artists/{artist_id}', None),
+        ('GET', '/shows', None),
+        ('GET', f'/shows?after={middle.start_time.isoformat()},{middle.id}', None),
+        ('POST', '/venues/search', {'search_term': 'Venue 42'}),
+        ('POST', '/artists/search', {'search_term': 'City 7, TX'}),
+    ]
+
+
+def measure(client, routes, repeat):
+    db_time = [0.0]
+
+    def before(conn, cursor, statement, parameters, context, executemany):
+        context._bench_started = time.perf_counter()
+
+    def after(conn, cursor, statement, parameters, context, executemany):
+        db_time[0] += time.perf_counter() - context._bench_started
+
+    event.listen(db.engine, 'before_cursor_execute', before)
+    event.listen(db.engine, 'after_cursor_execute', after)
+    results = {}
+    try:
+        for method, url, data in routes:
+            client.open(url, method=method, data=data)   # warm up
+            totals, queries = [], []
+            for _ in range(repeat):
+                db_time[0] = 0.0
+                started = time.perf_counter()
+                response = client.open(url, method=method, data=data)
+                totals.append((time.perf_counter() - started) * 1000)
+                queries.append(db_time[0] * 1000)
+                assert response.status_code == 200, (url, response.status_code)
+            results[f'{method} {url}'] = {
+                'median_ms': round(statistics.median(totals), 2),
+                'median_db_ms': round(statistics.median(queries), 2),
+            }
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', before)
+        event.remove(db.engine, 'after_cursor_execute', after)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Before/after benchmark for the index migration.')
+    parser.add_argument('--venues', type=int, default=10000)
+    parser.add_argument('--artists', type=int, default=100000)
+    parser.add_argument('--shows', type=int, default=1000000)
+    parser.add_argument('--cities', type=int, default=500)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--out', help='Also write the results here as JSON.')
+    args = parser.parse_args()
+
+    with app.app_context():
+        if db.engine.dialect.name != 'postgresql':
+            parser.error('the index migration and this benchmark need Postgres')
+        client = app.test_client()
+
+        print(f'Migrating to {BEFORE} (no indexes)')
+        try:
+            upgrade(revision=BEFORE)
+        except CommandError:
+            # the database is already past it
+            downgrade(revision=BEFORE)
+        seed({'venues': args.venues, 'artists': args.artists, 'shows': args.shows, 'cities': args.cities})
+        db.session.execute(text('ANALYZE'))
+        db.session.commit()
+        before = measure(client, routes(), args.repeat)
+
+        print(f'Migrating to {AFTER} (indexes)')
+        upgrade(revision=AFTER)
+        db.session.execute(text('ANALYZE'))
+        db.session.commit()
+        after = measure(client, routes(), args.repeat)
+        upgrade()
+
+    print(f'\n{"route":<60} {"before ms":>10} {"after ms":>10} {"db before":>10} {"db after":>10}')
+    for route in before:
+        b, a = before[route], after[route]
+        print(f'{route:<60} {b["median_ms"]:>10} {a["median_ms"]:>10} '
+              f'{b["median_db_ms"]:>10} {a["median_db_ms"]:>10}')
+
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump({'sizes': vars(args), 'before': before, 'after': after}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,242 @@
+#----------------------------------------------------------------------------#
+# Route benchmark.
+#
+#   python -m benchmarks.datagen --scale medium
+#   python -m benchmarks.runner --repeat 100 --out bench-$(git rev-parse --short HEAD).json
+#   python -m benchmarks.runner --compare bench-old.json
+#
+# Drives every route in app.py through the Flask test client against the
+# database in DATABASE_URL (Postgres or SQLite, filled by benchmarks.datagen)
+# and reports p50/p95/p99 latency, queries per request (from the Server-Timing
+# header; streamed responses like the export query after it is sent and show
+# none) and the peak Python memory of one request. The response cache is off
+# unless CACHE_BACKEND is set, so reads reach the database. The write routes
+# add rows named 'Bench ...' and the DELETE route removes the benchmark venues.
+#----------------------------------------------------------------------------#
+
+import argparse
+import datetime
+import json
+import logging
+import os
+import platform
+import re
+import statistics
+import subprocess
+import time
+import tracemalloc
+
+os.environ.setdefault('CACHE_BACKEND', '')
+
+from sqlalchemy import func
+
+from app import create_app
+from extensions import db
+from models import Venue, Artist, Show
+
+app = create_app()
+
+SERVER_TIMING = re.compile(r'db;dur=([\d.]+);desc="(\d+) queries"')
+
+
+def venue_form(i):
+    return {
+        'name': f'Bench Venue {i}', 'city': 'Benchville', 'state': 'CA',
+        'address': f'{i} Bench Street', 'phone': '555-555-5555', 'genres': ['Jazz'],
+        'image_link': 'https://images.example.com/bench.jpg',
+        'website': 'https://bench.example.com', 'facebook_link': 'https://www.facebook.com/bench',
+    }
+
+
+def artist_form(i):
+    form = venue_form(i)
+    del form['address']
+    form['name'] = f'Bench Artist {i}'
+    return form
+
+
+def routes():
+    # (name, method, url, data); url and data may be callables of the iteration
+    venue = db.session.query(Venue).order_by(Venue.id).offset(db.session.query(Venue).count() // 2).first()
+    artist = db.session.query(Artist).order_by(Artist.id).offset(db.session.query(Artist).count() // 2).first()
+    middle = db.session.query(Show.start_time, Show.id).order_by(Show.start_time, Show.id) \
+        .offset(db.session.query(Show).count() // 2).first()
+    if venue is None or artist is None or middle is None:
+        raise SystemExit('The database is empty; run benchmarks.datagen first.')
+    area = db.session.query(Venue.city, Venue.state).group_by(Venue.city, Venue.state) \
+        .order_by(Venue.city, Venue.state).offset(1).first() or (venue.city, venue.state)
+    # plain values for the callables below, which outlive this session:
+    # main() removes it after every route
+    venue_id, venue_name, venue_city = venue.id, venue.name, venue.city
+    venue_point = f'lat={venue.latitude or 0}&lng={venue.longitude or 0}'
+    artist_id, artist_name, artist_area = artist.id, artist.name, f'{artist.city}, {artist.state}'
+    # after the generated shows, and apart from each other so none overlap
+    future = datetime.datetime.now().replace(minute=0, second=0, microsecond=0) + datetime.timedelta(days=800)
+
+    def show(i):
+        start = future + datetime.timedelta(hours=3 * i)
+        return {'artist_id': artist_id, 'venue_id': venue_id, 'start_time': start.strftime('%Y-%m-%d %H:%M:%S'),
+                'duration': 60}
+
+    def bulk_shows(i):
+        # four weekly shows, four weeks further each iteration
+        start = future + datetime.timedelta(days=400, weeks=4 * i)
+        return {'artist_id': artist_id, 'venue_id': venue_id, 'start_time': start.strftime('%Y-%m-%d %H:%M'),
+                'duration': 60, 'weeks': 4}
+
+    bench_venues = []
+
+    def delete_url(i):
+        if not bench_venues:
+            bench_venues.extend(id for id, in db.session.query(Venue.id)
+                                .filter(Venue.name.like('Bench Venue %')).order_by(Venue.id))
+        return f'/venues/{bench_venues[i] if i < len(bench_venues) else 0}'
+
+    return [
+        ('home', 'GET', '/', None),
+        ('venues', 'GET', '/venues', None),
+        ('venues next page', 'GET', f'/venues?after={area[0]},{area[1]}', None),
+        ('venue', 'GET', f'/venues/{venue_id}', None),
+        ('venue search', 'POST', '/venues/search', {'search_term': venue_name.split()[1]}),
+        ('venues near', 'GET', f'/venues/near?{venue_point}&km=50', None),
+        ('artists', 'GET', '/artists', None),
+        ('artist', 'GET', f'/artists/{artist_id}', None),
+        ('artist search', 'POST', '/artists/search', {'search_term': artist_area}),
+        ('shows', 'GET', '/shows', None),
+        ('shows next page', 'GET', f'/shows?after={middle.start_time.isoformat()},{middle.id}', None),
+        ('typeahead', 'GET', f'/api/typeahead?q={venue_name[:3]}', None),
+        ('venue form', 'GET', '/venues/create', None),
+        ('create venue', 'POST', '/venues/create', venue_form),
+        ('venue edit form', 'GET', f'/venues/{venue_id}/edit', None),
+        ('edit venue', 'POST', f'/venues/{venue_id}/edit', dict(venue_form(0), name=venue_name, city=venue_city)),
+        ('artist form', 'GET', '/artists/create', None),
+        ('create artist', 'POST', '/artists/create', artist_form),
+        ('artist edit form', 'GET', f'/artists/{artist_id}/edit', None),
+        ('edit artist', 'POST', f'/artists/{artist_id}/edit', dict(artist_form(0), name=artist_name)),
+        ('show form', 'GET', '/shows/create', None),
+        ('create show', 'POST', '/shows/create', show),
+        ('bulk show form', 'GET', '/shows/bulk', None),
+        ('bulk shows', 'POST', '/shows/bulk', bulk_shows),
+        ('export', 'GET', f'/export/shows.ndjson?city={venue_city}', None),
+        ('cache stats', 'GET', '/internal/cache', None),
+        ('pool stats', 'GET', '/internal/pool', None),
+        ('delete venue', 'DELETE', delete_url, None),
+    ]
+
+
+def percentile(quantiles, p):
+    return round(quantiles[p - 1], 2)
+
+
+def measure(client, route, repeat):
+    name, method, url, data = route
+
+    def send(i):
+        response = client.open(url(i) if callable(url) else url, method=method,
+                               data=data(i) if callable(data) else data)
+        response.get_data()   # drain streamed bodies
+        return response
+
+    timings, queries, db_times, errors = [], [], [], 0
+    send(repeat)   # warm up
+    for i in range(repeat):
+        started = time.perf_counter()
+        response = send(i)
+        timings.append((time.perf_counter() - started) * 1000)
+        if response.status_code >= 400:
+            errors += 1
+        match = SERVER_TIMING.search(response.headers.get('Server-Timing', ''))
+        if match:
+            db_times.append(float(match.group(1)))
+            queries.append(int(match.group(2)))
+
+    # memory is measured on a separate request, tracing slows everything down
+    tracemalloc.start()
+    send(repeat + 1)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    quantiles = statistics.quantiles(timings, n=100, method='inclusive')
+    return {
+        'method': method,
+        'url': url if isinstance(url, str) else url.__name__,
+        'status': response.status_code,
+        'requests': repeat,
+        'errors': errors,
+        'p50_ms': percentile(quantiles, 50),
+        'p95_ms': percentile(quantiles, 95),
+        'p99_ms': percentile(quantiles, 99),
+        'mean_ms': round(statistics.mean(timings), 2),
+        'queries': max(queries) if queries else None,
+        'db_p50_ms': round(statistics.median(db_times), 2) if db_times else None,
+        'peak_kib': round(peak / 1024, 1),
+    }
+
+
+def git_revision():
+    try:
+        revision = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'],
+                               capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return None
+    return revision + ('-dirty' if dirty else '') if revision else None
+
+
+def compare(report, baseline):
+    print(f'\n{"route":<20} {"p50 ms":>16} {"p95 ms":>16} {"queries":>10} {"peak KiB":>18}')
+    for name, new in report['routes'].items():
+        old = baseline['routes'].get(name)
+        if old is None:
+            continue
+        print(f'{name:<20} {old["p50_ms"]:>7} → {new["p50_ms"]:<7} {old["p95_ms"]:>7} → {new["p95_ms"]:<7} '
+              f'{old["queries"]!s:>4} → {new["queries"]!s:<4} {old["peak_kib"]:>8} → {new["peak_kib"]:<8}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark every route against a synthetic catalogue.')
+    parser.add_argument('--repeat', type=int, default=100, help='Timed requests per route.')
+    parser.add_argument('--only', action='append', help='Run only this route (by name); can be repeated.')
+    parser.add_argument('--out', help='Write the report here as JSON.')
+    parser.add_argument('--compare', help='A previous JSON report to compare against.')
+    args = parser.parse_args()
+    if args.repeat < 2:
+        parser.error('--repeat needs at least 2 requests for percentiles')
+
+    app.config['WTF_CSRF_ENABLED'] = False
+    app.logger.setLevel(logging.WARNING)
+    client = app.test_client()
+
+    with app.app_context():
+        report = {
+            'meta': {
+                'revision': git_revision(),
+                'started': datetime.datetime.now().isoformat(timespec='seconds'),
+                'python': platform.python_version(),
+                'database': db.engine.dialect.name,
+                'cache': app.config['CACHE_BACKEND'],
+                'rows': {model.__tablename__: db.session.query(func.count(model.id)).scalar()
+                         for model in (Venue, Artist, Show)},
+                'repeat': args.repeat,
+            },
+            'routes': {},
+        }
+        for route in routes():
+            if args.only and route[0] not in args.only:
+                continue
+            result = report['routes'][route[0]] = measure(client, route, args.repeat)
+            print(f'{route[0]:<20} p50 {result["p50_ms"]:>8} ms  p95 {result["p95_ms"]:>8} ms  '
+                  f'p99 {result["p99_ms"]:>8} ms  {result["queries"]!s:>4} queries  '
+                  f'{result["peak_kib"]:>8} KiB' + (f'  {result["errors"]} errors' if result['errors'] else ''))
+            db.session.remove()
+
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            compare(report, json.load(f))
+
+
+if __name__ == '__main__':
+    main()
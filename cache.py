@@ -0,0 +1,280 @@
+#----------------------------------------------------------------------------#
+# Response cache.
+#
+# Rendered GET responses are stored under their full path together with the
+# versions of the tags they depend on ('venues', 'venue:3', ...). Invalidating
+# a tag bumps its version, which makes every entry recorded with the old
+# version a miss. Entries are evicted least-recently-used first and expire
+# after a TTL.
+#
+# Tag versions live in the backend, so with 'memory' an invalidation only
+# reaches the process that made it. Pages behind @conditional are also keyed
+# by their ETag, which is computed from the database on every request: a
+# write made by another worker or a flask command changes it, and the page is
+# rendered again rather than served stale under the new ETag.
+#
+# Backends:
+#   'memory' - per-process dict, the default
+#   'sqlite' - a SQLite file shared by every worker on the host
+#   None     - caching disabled
+#----------------------------------------------------------------------------#
+
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import g, make_response, request, session, Response
+
+
+class MemoryBackend:
+
+    def __init__(self, max_entries=1000):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()   # key -> (expires, value)
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires < time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (time.time() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def versions(self, tags):
+        with self._lock:
+            return {tag: self._versions.get(tag, 0) for tag in tags}
+
+    def bump(self, tags):
+        with self._lock:
+            for tag in tags:
+                self._versions[tag] = self._versions.get(tag, 0) + 1
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SQLiteBackend:
+
+    def __init__(self, path, max_entries=10000):
+        self.path = path
+        self.max_entries = max_entries
+        self._local = threading.local()
+        # closed again, so a process that forks after this holds no connection
+        connection = sqlite3.connect(self.path, timeout=5)
+        with connection:
+            connection.execute('CREATE TABLE IF NOT EXISTS cache_entries '
+                               '(key TEXT PRIMARY KEY, value BLOB, expires REAL, accessed REAL)')
+            connection.execute('CREATE INDEX IF NOT EXISTS cache_entries_accessed ON cache_entries (accessed)')
+            connection.execute('CREATE TABLE IF NOT EXISTS cache_tags '
+                               '(tag TEXT PRIMARY KEY, version INTEGER NOT NULL)')
+        connection.close()
+
+    def _connection(self):
+        # one connection per thread; WAL lets workers read while one writes
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=5)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            self._local.connection = connection
+        return connection
+
+    def get(self, key):
+        with self._connection() as connection:
+            row = connection.execute(
+                'SELECT value, expires FROM cache_entries WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                return None
+            value, expires = row
+            now = time.time()
+            if expires < now:
+                connection.execute('DELETE FROM cache_entries WHERE key = ?', (key,))
+                return None
+            connection.execute('UPDATE cache_entries SET accessed = ? WHERE key = ?', (now, key))
+            return pickle.loads(value)
+
+    def set(self, key, value, ttl):
+        now = time.time()
+        with self._connection() as connection:
+            connection.execute(
+                'INSERT OR REPLACE INTO cache_entries (key, value, expires, accessed) VALUES (?, ?, ?, ?)',
+                (key, pickle.dumps(value), now + ttl, now))
+            excess = connection.execute('SELECT count(*) FROM cache_entries').fetchone()[0] - self.max_entries
+            if excess > 0:
+                connection.execute(
+                    'DELETE FROM cache_entries WHERE key IN '
+                    '(SELECT key FROM cache_entries ORDER BY accessed LIMIT ?)', (excess,))
+
+    def clear(self):
+        with self._connection() as connection:
+            connection.execute('DELETE FROM cache_entries')
+
+    def versions(self, tags):
+        tags = list(tags)
+        versions = dict.fromkeys(tags, 0)
+        if tags:
+            placeholders = ', '.join('?' * len(tags))
+            rows = self._connection().execute(
+                f'SELECT tag, version FROM cache_tags WHERE tag IN ({placeholders})', tags)
+            versions.update(rows)
+        return versions
+
+    def bump(self, tags):
+        with self._connection() as connection:
+            connection.executemany(
+                'INSERT INTO cache_tags (tag, version) VALUES (?, 1) '
+                'ON CONFLICT (tag) DO UPDATE SET version = version + 1',
+                [(tag,) for tag in tags])
+
+    def __len__(self):
+        return self._connection().execute('SELECT count(*) FROM cache_entries').fetchone()[0]
+
+
+def make_backend(kind, path, max_entries):
+    # 'memory', 'sqlite' (stored at path) or None
+    if kind == 'memory':
+        return MemoryBackend(max_entries)
+    if kind == 'sqlite':
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return SQLiteBackend(path, max_entries)
+    if kind is None:
+        return None
+    raise ValueError(f'Unknown cache backend {kind!r}')
+
+
+class ResponseCache:
+
+    def __init__(self, app=None):
+        self.backend = None
+        self.default_ttl = 300
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.variant = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.default_ttl = app.config.get('CACHE_DEFAULT_TTL', 300)
+        self.backend = make_backend(app.config.get('CACHE_BACKEND', 'memory'),
+                                    app.config.get('CACHE_PATH') or os.path.join(app.instance_path, 'cache.sqlite'),
+                                    app.config.get('CACHE_MAX_ENTRIES', 1000))
+
+    def vary(self, f):
+        # register a function whose result (e.g. the request locale) is part
+        # of every key, for pages that differ by more than their URL
+        self.variant = f
+        return f
+
+    def tag(self, *tags):
+        # record that the response being built depends on these tags; their
+        # versions are read now so a concurrent invalidation is not missed
+        if self.backend is None or 'cache_versions' not in g:
+            return
+        new = [tag for tag in tags if tag not in g.cache_versions]
+        if new:
+            g.cache_versions.update(self.backend.versions(new))
+
+    def invalidate(self, *tags):
+        if self.backend is None:
+            return
+        self.invalidations += 1
+        self.backend.bump(tags)
+
+    def clear(self):
+        if self.backend is not None:
+            self.backend.clear()
+
+    def stats(self):
+        return {
+            'backend': type(self.backend).__name__ if self.backend is not None else None,
+            'entries': len(self.backend) if self.backend is not None else 0,
+            'hits': self.hits,
+            'misses': self.misses,
+            'invalidations': self.invalidations,
+        }
+
+    def cached(self, tags=(), ttl=None):
+        # cache a GET view; tags are the static ones, views add per-entity
+        # tags with tag() while they build the page
+        def decorator(f):
+            @wraps(f)
+            def wrapper(*args, **kwargs):
+                # pages showing a flashed message are personal, never cached
+                if self.backend is None or request.method != 'GET' or session.get('_flashes'):
+                    return f(*args, **kwargs)
+
+                key = 'view:' + request.full_path
+                if self.variant is not None:
+                    key += '|' + self.variant()
+                if 'validator' in g:
+                    key += '|' + g.validator
+                entry = self.backend.get(key)
+                if entry is not None:
+                    body, status, headers, versions = entry
+                    if self.backend.versions(versions) == versions:
+                        self.hits += 1
+                        return Response(body, status, headers)
+                self.misses += 1
+
+                g.cache_versions = {}
+                self.tag(*tags)
+                response = make_response(f(*args, **kwargs))
+                if response.status_code == 200 and 'Set-Cookie' not in response.headers:
+                    headers = [(name, value) for name, value in response.headers
+                               if name in ('Content-Type', 'Cache-Control')]
+                    versions = g.cache_versions
+
+                    def store(body):
+                        self.backend.set(key, (body, response.status_code, headers, versions),
+                                         ttl or self.default_ttl)
+
+                    if response.is_streamed:
+                        response.response = self.recording(response.response, response.charset, store)
+                    else:
+                        store(response.get_data())
+                return response
+            return wrapper
+        return decorator
+
+
+    @staticmethod
+    def recording(chunks, charset, store):
+        # pass a streamed body through and store it once it is complete; an
+        # aborted stream is not stored
+        body = []
+        try:
+            for chunk in chunks:
+                if isinstance(chunk, str):
+                    chunk = chunk.encode(charset)
+                body.append(chunk)
+                yield chunk
+        finally:
+            close = getattr(chunks, 'close', None)
+            if close is not None:
+                close()
+        store(b''.join(body))
+
+
+response_cache = ResponseCache()
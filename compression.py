@@ -0,0 +1,127 @@
+#----------------------------------------------------------------------------#
+# Response compression.
+#
+# WSGI middleware that compresses text responses (COMPRESS_MIMETYPES) with
+# gzip, or with brotli when the client accepts it and the Brotli package is
+# installed. A body is compressed chunk by chunk as the app yields it, each
+# chunk flushed, so a streamed page reaches the client as it renders.
+# Responses that already have a Content-Encoding (the precompressed /assets/
+# files), are shorter than COMPRESS_MIN_SIZE or carry no-transform are passed
+# through. A compressed response's ETag is made weak: the body differs from
+# the identity one, and If-None-Match compares weakly anyway.
+#----------------------------------------------------------------------------#
+
+import zlib
+
+from werkzeug.datastructures import Headers
+from werkzeug.http import parse_accept_header
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+class Gzip:
+    name = 'gzip'
+
+    def __init__(self, level):
+        self.compressor = zlib.compressobj(level, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+
+    def compress(self, chunk):
+        return self.compressor.compress(chunk) + self.compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self.compressor.flush()
+
+
+class Brotli:
+    name = 'br'
+
+    def __init__(self, level):
+        # brotli's quality runs 0-11; its middle settings are the fast ones
+        self.compressor = brotli.Compressor(quality=min(level, 5))
+
+    def compress(self, chunk):
+        return self.compressor.process(chunk) + self.compressor.flush()
+
+    def finish(self):
+        return self.compressor.finish()
+
+
+class CompressionMiddleware:
+
+    def __init__(self, app, config):
+        self.app = app
+        self.level = config['COMPRESS_LEVEL']
+        self.min_size = config['COMPRESS_MIN_SIZE']
+        self.mimetypes = set(config['COMPRESS_MIMETYPES'])
+
+    def encoder(self, environ):
+        accepted = parse_accept_header(environ.get('HTTP_ACCEPT_ENCODING', ''))
+        if brotli is not None and accepted['br']:
+            return Brotli
+        if accepted['gzip']:
+            return Gzip
+        return None
+
+    def __call__(self, environ, start_response):
+        encoder = self.encoder(environ)
+        if encoder is None:
+            return self.app(environ, start_response)
+
+        chosen = []
+        started = []
+
+        def compressing_start_response(status, headers, exc_info=None):
+            started.append(True)
+            headers = Headers(headers)
+            if self.compressible(status, headers):
+                chosen.append(encoder(self.level))
+                del headers['Content-Length']
+                headers['Content-Encoding'] = encoder.name
+                etag = headers.get('ETag')
+                if etag and not etag.startswith('W/'):
+                    headers['ETag'] = 'W/' + etag
+            vary = headers.get('Vary')
+            if not vary:
+                headers['Vary'] = 'Accept-Encoding'
+            elif 'Accept-Encoding' not in vary:
+                headers['Vary'] = vary + ', Accept-Encoding'
+            write = start_response(status, headers.to_wsgi_list(), exc_info)
+            if not chosen:
+                return write
+            # the legacy write() callable: compress what goes through it too
+            return lambda data: write(chosen[0].compress(data))
+
+        body = self.app(environ, compressing_start_response)
+        if started and not chosen:
+            return body
+        # an app may also start the response on its first chunk
+        return self.compress(body, chosen)
+
+    def compressible(self, status, headers):
+        if not status.startswith('200') or 'Content-Encoding' in headers:
+            return False
+        if 'no-transform' in headers.get('Cache-Control', ''):
+            return False
+        if headers.get('Content-Type', '').split(';')[0].strip() not in self.mimetypes:
+            return False
+        length = headers.get('Content-Length')
+        return length is None or int(length) >= self.min_size
+
+    def compress(self, body, chosen):
+        try:
+            for chunk in body:
+                if not chosen:
+                    yield chunk
+                elif chunk:
+                    data = chosen[0].compress(chunk)
+                    if data:
+                        yield data
+            if chosen:
+                yield chosen[0].finish()
+        finally:
+            close = getattr(body, 'close', None)
+            if close is not None:
+                close()
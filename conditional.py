@@ -0,0 +1,75 @@
+#----------------------------------------------------------------------------#
+# Conditional GET.
+#
+# A view decorated with @conditional(validator) first calls the validator,
+# which should be a single cheap query returning (last_modified, version) for
+# the data the page shows. The ETag is derived from both, so repeat requests
+# carrying If-None-Match / If-Modified-Since get a 304 without the page's own
+# queries or template ever running.
+#----------------------------------------------------------------------------#
+
+import datetime
+import hashlib
+from functools import wraps
+
+from flask import g, make_response, request, session, Response
+
+
+def to_http_date(value):
+    # naive UTC with second precision, like the dates werkzeug parses
+    if value is None:
+        return None
+    if value.tzinfo is not None:
+        value = value.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    return value.replace(microsecond=0)
+
+
+def conditional(validator):
+    def decorator(f):
+        @wraps(f)
+        def wrapper(*args, **kwargs):
+            # a pending flashed message has to be rendered
+            if request.method not in ('GET', 'HEAD') or session.get('_flashes'):
+                return f(*args, **kwargs)
+
+            state = validator(*args, **kwargs)
+            if state is None:
+                return f(*args, **kwargs)
+            last_modified, version = state
+            # the ETag keeps the full precision: two edits within one second
+            # share a Last-Modified but not an ETag
+            changed = last_modified.isoformat() if last_modified else None
+            last_modified = to_http_date(last_modified)
+            # pages are rendered in the client's language
+            language = request.headers.get('Accept-Language')
+            etag = hashlib.md5(repr((request.full_path, language, changed, version)).encode()).hexdigest()
+
+            # If-None-Match wins when both are sent. If-Modified-Since alone
+            # cannot see deletions, which leave max(updated_at) unchanged, so
+            # clients that send an ETag back get the exact answer.
+            if request.if_none_match:
+                # weakly, as for any If-None-Match: compression makes the ETag weak
+                not_modified = request.if_none_match.contains_weak(etag)
+            elif request.if_modified_since and last_modified:
+                not_modified = last_modified <= request.if_modified_since
+            else:
+                not_modified = False
+
+            if not_modified:
+                response = Response(status=304)
+            else:
+                # the response cache keys the page by it (see cache.py)
+                g.validator = etag
+                response = make_response(f(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+
+            response.set_etag(etag)
+            if last_modified:
+                response.last_modified = last_modified
+            # let browsers and the CDN keep the page but revalidate every time
+            response.cache_control.no_cache = True
+            response.vary.add('Accept-Language')
+            return response
+        return wrapper
+    return decorator
@@ -1,14 +1,141 @@
 import os
-SECRET_KEY = os.urandom(32)
+from dbpool import engine_options
 # Grabs the folder where the script runs.
 basedir = os.path.abspath(os.path.dirname(__file__))
 
-# Enable debug mode.
-DEBUG = True
+# Signs the session cookie (flashed messages, CSRF tokens), so every worker
+# and every restart must use the same one: set SECRET_KEY in the environment.
+# Only development falls back to a fixed key; elsewhere create_app() refuses
+# to start without one
+SECRET_KEY = os.environ.get('SECRET_KEY') or ('development' if os.environ.get('FLASK_ENV') == 'development' else None)
+
+# Debug mode only in development (FLASK_ENV=development)
+DEBUG = os.environ.get('FLASK_ENV') == 'development'
 
 # Connect to the database
 
 
 # TODO IMPLEMENT DATABASE URL
-SQLALCHEMY_DATABASE_URI = 'postgres://haifa@localhost:5432/fyyur'
+SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL', 'postgres://haifa@localhost:5432/fyyur')
 SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+# Connection pool profiles, picked by FLASK_ENV; every setting can also be
+# overridden with its DB_* environment variable (e.g. DB_POOL_SIZE=20)
+POOL_PROFILES = {
+    'development': {
+        'pool_size': 5,
+        'max_overflow': 5,
+        'pool_timeout': 10,
+        'pool_recycle': 1800,
+        'pool_pre_ping': True,
+        'statement_timeout_ms': 30000,
+    },
+    'production': {
+        'pool_size': 10,
+        'max_overflow': 10,
+        'pool_timeout': 5,
+        'pool_recycle': 1800,
+        'pool_pre_ping': True,
+        'statement_timeout_ms': 5000,
+    },
+}
+POOL_SETTINGS = dict(POOL_PROFILES.get(os.environ.get('FLASK_ENV'), POOL_PROFILES['production']))
+for _name, _default in POOL_SETTINGS.items():
+    _value = os.environ.get('DB_' + _name.upper())
+    if _value is not None:
+        POOL_SETTINGS[_name] = _value.lower() in ('1', 'true', 'yes') if isinstance(_default, bool) else int(_value)
+SQLALCHEMY_ENGINE_OPTIONS = engine_options(SQLALCHEMY_DATABASE_URI, POOL_SETTINGS)
+
+# Page locales, picked from Accept-Language. Show times are entered and shown
+# in the venue's timezone, BABEL_DEFAULT_TIMEZONE for a venue without one, and
+# stored naive in UTC
+LANGUAGES = ['en', 'fr', 'de', 'es', 'ar']
+BABEL_DEFAULT_LOCALE = 'en'
+BABEL_DEFAULT_TIMEZONE = 'UTC'
+
+# Number of shows listed per page on /shows
+SHOWS_PER_PAGE = 30
+
+# Number of city/state areas listed per page on /venues
+AREAS_PER_PAGE = 50
+
+# Number of results per page on /venues/search and /artists/search
+SEARCH_RESULTS_PER_PAGE = 20
+
+# Default and largest page sizes of the /api/v1 listings
+API_PAGE_SIZE = 50
+API_MAX_PAGE_SIZE = 200
+
+# Largest number of shows /shows/bulk schedules in one batch
+BULK_SHOWS_MAX = 500
+
+# Show length in minutes when none is given, and the longest allowed; the
+# bound keeps overlap checks to a range of the (venue_id, start_time) index
+SHOW_DEFAULT_MINUTES = 120
+SHOW_MAX_MINUTES = 12 * 60
+
+# Longest window /venues/<id>/availability answers for, in days
+AVAILABILITY_MAX_DAYS = 90
+
+# /venues/near: the radius searched when none is given and the largest
+# allowed, in km, and the most venues listed
+NEAR_DEFAULT_KM = 25
+NEAR_MAX_KM = 200
+NEAR_MAX_RESULTS = 100
+
+# Seconds between checks that the typeahead index (typeahead.py) is current
+TYPEAHEAD_REFRESH_SECONDS = 10
+
+# Response cache: 'memory' (per worker), 'sqlite' (shared by the workers of
+# one host, stored at CACHE_PATH) or None (CACHE_BACKEND=) to disable it
+CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'memory') or None
+CACHE_PATH = os.environ.get('CACHE_PATH', os.path.join(basedir, 'instance', 'cache.sqlite'))
+CACHE_DEFAULT_TTL = 300
+CACHE_MAX_ENTRIES = 1000
+
+# Rendered listing tiles ({% cache %} in the templates, see templating.py):
+# 'memory', 'sqlite' (in the instance folder) or None (FRAGMENT_CACHE_BACKEND=)
+FRAGMENT_CACHE_BACKEND = os.environ.get('FRAGMENT_CACHE_BACKEND', 'memory') or None
+FRAGMENT_CACHE_TTL = 3600
+FRAGMENT_CACHE_MAX_ENTRIES = 10000
+
+# Compiled templates, shared by the workers of one host; templates are only
+# checked for changes in development
+TEMPLATE_CACHE_PATH = os.environ.get('TEMPLATE_CACHE_PATH', os.path.join(basedir, 'instance', 'jinja'))
+TEMPLATES_AUTO_RELOAD = os.environ.get('FLASK_ENV') == 'development'
+
+# Streamed pages (/artists, /shows) are sent in chunks of at least this many bytes
+STREAM_BUFFER_BYTES = 4096
+
+# Responses compressed on the fly (compression.py): gzip level (brotli quality
+# is capped at 5), smallest body worth it, and the content types compressed
+COMPRESS_LEVEL = 6
+COMPRESS_MIN_SIZE = 500
+COMPRESS_MIMETYPES = ['text/html', 'text/css', 'text/csv', 'text/plain', 'text/javascript',
+                      'application/javascript', 'application/json', 'application/x-ndjson', 'image/svg+xml']
+
+# Log a warning when one statement runs more than this many times in a
+# request (an N+1 query); with QUERY_REPEAT_RAISE the request fails instead
+QUERY_REPEAT_THRESHOLD = 10
+QUERY_REPEAT_RAISE = os.environ.get('QUERY_REPEAT_RAISE', '') == '1'
+
+# Addresses allowed to reach the /internal/* endpoints
+INTERNAL_IPS = ['127.0.0.1', '::1']
+
+# Times a transaction is retried after a serialization failure or deadlock
+TRANSACTION_RETRIES = 3
+
+# Read replicas, comma separated: GET requests read from a healthy one (see
+# routing.py). A client reads from the primary for REPLICA_STICKY_SECONDS
+# after it writes; a replica is pinged at most every REPLICA_CHECK_SECONDS and
+# left out for REPLICA_RETRY_SECONDS when it fails
+REPLICA_DATABASE_URLS = [url for url in os.environ.get('REPLICA_DATABASE_URLS', '').split(',') if url]
+SQLALCHEMY_BINDS = {f'replica{i}': url for i, url in enumerate(REPLICA_DATABASE_URLS)}
+REPLICA_STICKY_SECONDS = 5
+REPLICA_CHECK_SECONDS = 10
+REPLICA_RETRY_SECONDS = 30
+
+# Hashed, bundled and precompressed static files written by `flask assets
+# build` and served under /assets/ (see assets.py), cached by browsers for a year
+ASSETS_PATH = os.environ.get('ASSETS_PATH', os.path.join(basedir, 'instance', 'assets'))
+ASSETS_MAX_AGE = 365 * 24 * 3600
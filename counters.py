@@ -0,0 +1,165 @@
+#----------------------------------------------------------------------------#
+# Upcoming/past show counters.
+#
+# Venue and Artist carry upcoming_shows_count and past_shows_count. A show is
+# counted as past when it starts before the watermark in ShowCounterWatermark
+# and as upcoming otherwise. Inserting or deleting a show adjusts the counters
+# in the same flush; 'flask counters rollover' (run it every few minutes
+# from cron) advances the watermark and moves the shows that have started
+# since from upcoming to past; 'flask counters rebuild' recounts everything.
+# The listings show these counts, so they may lag by one rollover interval;
+# the detail pages split and count their own shows at the current time.
+#
+# Writers take a share lock on the watermark row and the rollover an update
+# lock, so a show inserted during a rollover is counted on the right side.
+#----------------------------------------------------------------------------#
+
+import datetime
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import and_, bindparam, event, func, select
+
+from extensions import db
+from cache import response_cache
+from models import Venue, Artist, Show, ShowCounterWatermark
+
+venues = Venue.__table__
+artists = Artist.__table__
+shows = Show.__table__
+state = ShowCounterWatermark.__table__
+
+WATERMARK = select([state.c.rolled_over_at]).where(state.c.id == 1)
+
+OWNERS = ((venues, shows.c.venue_id), (artists, shows.c.artist_id))
+
+
+def install(engine):
+    # the watermark row, for databases made with create_all
+    with engine.begin() as connection:
+        if connection.execute(WATERMARK).scalar() is None:
+            connection.execute(state.insert(), {'id': 1, 'rolled_over_at': datetime.datetime.utcnow()})
+
+
+def watermark(connection, lock=None):
+    query = WATERMARK
+    if lock == 'share':
+        query = query.with_for_update(read=True)
+    elif lock == 'update':
+        query = query.with_for_update()
+    return connection.execute(query).scalar()
+
+
+def adjust(connection, table, deltas):
+    # deltas: {id: (upcoming, past)}, applied in id order to avoid deadlocks
+    if not deltas:
+        return
+    statement = table.update().where(table.c.id == bindparam('_id')).values(
+        upcoming_shows_count=table.c.upcoming_shows_count + bindparam('_upcoming'),
+        past_shows_count=table.c.past_shows_count + bindparam('_past'),
+    )
+    connection.execute(statement, [
+        {'_id': id, '_upcoming': upcoming, '_past': past}
+        for id, (upcoming, past) in sorted(deltas.items())
+    ])
+
+
+def count_shows(connection, rows, sign=1):
+    # rows are (venue_id, artist_id, start_time); sign=-1 for deleted shows
+    mark = watermark(connection, lock='share')
+    for position, (table, _) in enumerate(OWNERS):
+        deltas = {}
+        for row in rows:
+            upcoming, past = deltas.get(row[position], (0, 0))
+            if row[2] >= mark:
+                upcoming += sign
+            else:
+                past += sign
+            deltas[row[position]] = (upcoming, past)
+        adjust(connection, table, deltas)
+
+
+# once per flush rather than per show, so a cascade delete stays two UPDATEs;
+# deleted shows are read before the flush, while their rows can be loaded
+@event.listens_for(db.session, 'before_flush')
+def collect_deleted_shows(session, flush_context, instances):
+    deleted = [(show.venue_id, show.artist_id, show.start_time)
+               for show in session.deleted if isinstance(show, Show)]
+    if deleted:
+        session.info.setdefault('deleted_shows', []).extend(deleted)
+
+
+@event.listens_for(db.session, 'after_soft_rollback')
+def forget_deleted_shows(session, previous_transaction):
+    session.info.pop('deleted_shows', None)
+
+
+@event.listens_for(db.session, 'after_flush')
+def count_flushed_shows(session, flush_context):
+    added = [(show.venue_id, show.artist_id, show.start_time)
+             for show in session.new if isinstance(show, Show)]
+    deleted = session.info.pop('deleted_shows', [])
+    if added:
+        count_shows(session.connection(), added)
+    if deleted:
+        count_shows(session.connection(), deleted, sign=-1)
+
+
+def rollover(connection, now):
+    # returns the cache tags of the venues and artists whose counts moved
+    mark = watermark(connection, lock='update')
+    if now <= mark:
+        return []
+    tags = []
+    for (table, key), prefix in zip(OWNERS, ('venue', 'artist')):
+        started = connection.execute(
+            select([key, func.count()])
+            .where(and_(shows.c.start_time >= mark, shows.c.start_time < now))
+            .group_by(key)
+        ).fetchall()
+        adjust(connection, table, {id: (-count, count) for id, count in started})
+        tags.extend(f'{prefix}:{id}' for id, count in started)
+    connection.execute(state.update().where(state.c.id == 1).values(rolled_over_at=now))
+    return tags
+
+
+def rebuild(connection, now):
+    watermark(connection, lock='update')
+    for table, key in OWNERS:
+        # correlated counts, one UPDATE per table
+        upcoming = select([func.count()]).where(and_(key == table.c.id, shows.c.start_time >= now))
+        past = select([func.count()]).where(and_(key == table.c.id, shows.c.start_time < now))
+        connection.execute(table.update().values(
+            upcoming_shows_count=upcoming.as_scalar(),
+            past_shows_count=past.as_scalar(),
+        ))
+    connection.execute(state.update().where(state.c.id == 1).values(rolled_over_at=now))
+
+
+#  Commands
+#  ----------------------------------------------------------------
+
+@click.group('counters')
+def counters_command():
+    """Maintain the upcoming/past show counters."""
+
+
+@counters_command.command('rollover')
+@with_appcontext
+def rollover_command():
+    """Move shows that have started from upcoming to past."""
+    with db.engine.begin() as connection:
+        tags = rollover(connection, datetime.datetime.utcnow())
+    if tags:
+        response_cache.invalidate('venues', 'artists', 'shows', *tags)
+    click.echo(f'{len(tags)} venues and artists updated.')
+
+
+@counters_command.command('rebuild')
+@with_appcontext
+def rebuild_command():
+    """Recount every venue's and artist's shows from scratch."""
+    with db.engine.begin() as connection:
+        rebuild(connection, datetime.datetime.utcnow())
+    response_cache.clear()
+    click.echo('Show counters rebuilt.')
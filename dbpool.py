@@ -0,0 +1,86 @@
+#----------------------------------------------------------------------------#
+# Database connection pool settings and statistics.
+#----------------------------------------------------------------------------#
+
+import sqlite3
+import threading
+import time
+
+from sqlalchemy import event, exc
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import QueuePool
+
+
+class InstrumentedQueuePool(QueuePool):
+    # a QueuePool that also records how long checkouts wait for a connection
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._stats_lock = threading.Lock()
+        self.checkouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.timeouts = 0
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            with self._stats_lock:
+                self.timeouts += 1
+            raise
+        finally:
+            waited = time.perf_counter() - started
+            with self._stats_lock:
+                self.checkouts += 1
+                self.wait_total += waited
+                self.wait_max = max(self.wait_max, waited)
+
+    def stats(self):
+        with self._stats_lock:
+            checkouts = self.checkouts
+            return {
+                'size': self.size(),
+                'max_overflow': self._max_overflow,
+                'checked_out': self.checkedout(),
+                'idle': self.checkedin(),
+                'overflow': max(self.overflow(), 0),
+                'checkouts': checkouts,
+                'timeouts': self.timeouts,
+                'avg_wait_ms': round(self.wait_total / checkouts * 1000, 3) if checkouts else 0.0,
+                'max_wait_ms': round(self.wait_max * 1000, 3),
+            }
+
+
+def pool_stats(engine):
+    pool = engine.pool
+    if isinstance(pool, InstrumentedQueuePool):
+        return pool.stats()
+    return {'pool': type(pool).__name__, 'status': pool.status()}
+
+
+# SQLite only enforces foreign keys (and their ON DELETE CASCADE) when asked,
+# on every connection
+@event.listens_for(Engine, 'connect')
+def enforce_sqlite_foreign_keys(dbapi_connection, connection_record):
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        dbapi_connection.execute('PRAGMA foreign_keys=ON')
+
+
+def engine_options(uri, settings):
+    # SQLALCHEMY_ENGINE_OPTIONS for a database URI from a pool profile
+    if uri.startswith('sqlite'):
+        # SQLite connections are not pooled across threads
+        return {}
+    options = {
+        'poolclass': InstrumentedQueuePool,
+        'pool_size': settings['pool_size'],
+        'max_overflow': settings['max_overflow'],
+        'pool_timeout': settings['pool_timeout'],
+        'pool_recycle': settings['pool_recycle'],
+        'pool_pre_ping': settings['pool_pre_ping'],
+    }
+    if uri.startswith('postgres') and settings.get('statement_timeout_ms'):
+        options['connect_args'] = {'options': f'-c statement_timeout={settings["statement_timeout_ms"]}'}
+    return options
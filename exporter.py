@@ -0,0 +1,127 @@
+#----------------------------------------------------------------------------#
+# Catalogue export.
+#
+# Venues, artists and shows (joined with their venue and artist) are read
+# with a server-side cursor in id order and written out as CSV or NDJSON one
+# batch at a time, so memory stays flat whatever the table size. An export
+# can be resumed with after=<last id written>. Show times are written in the
+# venue's local time, as the forms and the importer take them.
+#----------------------------------------------------------------------------#
+
+import csv
+import io
+import json
+
+import click
+from flask.cli import with_appcontext
+
+from extensions import db
+import formatting
+from models import Venue, Artist, Show
+import scheduling
+
+BATCH_SIZE = 1000
+
+EXPORTS = {
+    'venues': [Venue.id, Venue.name, Venue.city, Venue.state, Venue.address, Venue.phone,
+               Venue.website, Venue.genres, Venue.facebook_link, Venue.image_link,
+               Venue.seeking_talent, Venue.seeking_description, Venue.timezone,
+               Venue.latitude, Venue.longitude, Venue.updated_at],
+    'artists': [Artist.id, Artist.name, Artist.city, Artist.state, Artist.phone,
+                Artist.website, Artist.genres, Artist.facebook_link, Artist.image_link,
+                Artist.seeking_venue, Artist.seeking_description, Artist.updated_at],
+    'shows': [Show.id, Show.start_time, Show.end_time,
+              Show.venue_id, Venue.name.label('venue_name'), Venue.city.label('venue_city'),
+              Venue.state.label('venue_state'), Venue.timezone.label('venue_timezone'),
+              Show.artist_id, Artist.name.label('artist_name'), Show.updated_at],
+}
+
+MIMETYPES = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+
+def export_query(kind, city=None, start=None, end=None, after=None):
+    columns = EXPORTS[kind]
+    query = db.session.query(*columns)
+    if kind == 'shows':
+        model = Show
+        query = query.join(Venue, Venue.id == Show.venue_id).join(Artist, Artist.id == Show.artist_id)
+        if city:
+            query = query.filter(Venue.city == city)
+        if start:
+            query = query.filter(Show.start_time >= start)
+        if end:
+            query = query.filter(Show.start_time < end)
+    else:
+        model = Venue if kind == 'venues' else Artist
+        if city:
+            query = query.filter(model.city == city)
+    if after is not None:
+        query = query.filter(model.id > after)
+    # yield_per streams rows from a server-side cursor instead of buffering them
+    return query.order_by(model.id).yield_per(BATCH_SIZE)
+
+
+def column_names(kind):
+    return [column.key for column in EXPORTS[kind]]
+
+
+def generate_csv(kind, rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(column_names(kind))
+    for i, row in enumerate(rows, 1):
+        writer.writerow(','.join(value) if isinstance(value, list) else value for value in row)
+        if i % BATCH_SIZE == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def generate_ndjson(kind, rows):
+    names = column_names(kind)
+    lines = []
+    for row in rows:
+        lines.append(json.dumps(dict(zip(names, row)), default=str))
+        if len(lines) == BATCH_SIZE:
+            yield '\n'.join(lines) + '\n'
+            lines = []
+    if lines:
+        yield '\n'.join(lines) + '\n'
+
+
+def local_show_times(rows):
+    # stored in UTC, written in the venue's local time
+    start, end, zone = (column_names('shows').index(name) for name in ('start_time', 'end_time', 'venue_timezone'))
+    for row in rows:
+        row = list(row)
+        tz = scheduling.local_timezone(row[zone])
+        row[start], row[end] = formatting.from_utc(row[start], tz), formatting.from_utc(row[end], tz)
+        yield row
+
+
+def generate(kind, format, **filters):
+    rows = export_query(kind, **filters)
+    if kind == 'shows':
+        rows = local_show_times(rows)
+    if format == 'csv':
+        return generate_csv(kind, rows)
+    return generate_ndjson(kind, rows)
+
+
+@click.command('export')
+@click.argument('kind', type=click.Choice(list(EXPORTS)))
+@click.option('--format', type=click.Choice(list(MIMETYPES)), default='ndjson', show_default=True)
+@click.option('--out', type=click.File('w'), default='-', help='Defaults to stdout.')
+@click.option('--city')
+@click.option('--from', 'start', type=click.DateTime(), help='Shows starting at or after this time (UTC).')
+@click.option('--to', 'end', type=click.DateTime(), help='Shows starting before this time (UTC).')
+@click.option('--after', type=int, help='Resume after this id.')
+@with_appcontext
+def export_command(kind, format, out, city, start, end, after):
+    """Stream venues, artists or shows as CSV or NDJSON."""
+    for chunk in generate(kind, format, city=city, start=start, end=end, after=after):
+        out.write(chunk)
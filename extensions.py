@@ -0,0 +1,16 @@
+#----------------------------------------------------------------------------#
+# Extensions, created unbound and set up for an app by create_app() (app.py).
+#
+# Modules import db from here rather than from app, so importing a model or
+# a query module builds no app and connects to nothing.
+#----------------------------------------------------------------------------#
+
+from flask_babel import Babel
+
+from routing import RoutingSQLAlchemy
+
+# reads of GET requests go to the replicas in SQLALCHEMY_BINDS, if any; objects
+# stay loaded after a commit, for the commit hooks and the redirect after it
+db = RoutingSQLAlchemy(session_options={'expire_on_commit': False})
+
+babel = Babel()
@@ -0,0 +1,59 @@
+#----------------------------------------------------------------------------#
+# Date formatting.
+#
+# Babel's format_datetime parses the locale identifier (a data-file lookup)
+# and the pattern on every call. Here the Locale and the compiled pattern are
+# built once per (locale, format) and applied straight to datetime objects.
+# Naive values are in UTC, as show times are stored, and are converted when
+# a timezone (e.g. the venue's) is given. to_utc() and from_utc() convert
+# between UTC and a venue's wall-clock time, in which show times are entered.
+#----------------------------------------------------------------------------#
+
+import datetime
+import functools
+
+from babel import Locale
+from babel.dates import UTC, get_timezone, parse_pattern
+
+FORMATS = {
+    'full': "EEEE MMMM, d, y 'at' h:mma",
+    'medium': "EE MM, dd, y h:mma",
+}
+
+
+@functools.lru_cache(maxsize=256)
+def compiled(locale, format):
+    # a function formatting datetimes for this locale and format
+    pattern = parse_pattern(FORMATS.get(format, format))
+    return functools.partial(pattern.apply, locale=Locale.parse(locale))
+
+
+@functools.lru_cache(maxsize=None)
+def timezone(name):
+    return get_timezone(name)
+
+
+def to_utc(value, tz):
+    # a naive wall-clock time in tz -> the naive UTC time it stands for
+    if value is None or tz in (None, 'UTC'):
+        return value
+    return timezone(tz).localize(value).astimezone(UTC).replace(tzinfo=None)
+
+
+def from_utc(value, tz):
+    # a naive UTC time -> the naive wall-clock time in tz
+    if value is None or tz in (None, 'UTC'):
+        return value
+    return UTC.localize(value).astimezone(timezone(tz)).replace(tzinfo=None)
+
+
+def format_datetime(value, format='medium', locale='en', tz=None):
+    if value is None:
+        return ''
+    if isinstance(value, str):
+        value = datetime.datetime.fromisoformat(value)
+    if tz and tz != 'UTC':
+        if value.tzinfo is None:
+            value = UTC.localize(value)
+        value = value.astimezone(timezone(tz))
+    return compiled(locale, format)(value)
@@ -1,7 +1,41 @@
 from datetime import datetime
+from pytz import common_timezones
+from flask import current_app
 from flask_wtf import Form
-from wtforms import StringField, SelectField, SelectMultipleField, DateTimeField, BooleanField
-from wtforms.validators import DataRequired, AnyOf, URL, Regexp, Length
+from wtforms import StringField, SelectField, SelectMultipleField, DateTimeField, BooleanField, TextAreaField, IntegerField, FloatField
+from wtforms.validators import DataRequired, AnyOf, URL, Regexp, Length, Optional, NumberRange
+
+
+# a show's length in minutes: 1 to the app's SHOW_MAX_MINUTES
+def show_length(form, field):
+    NumberRange(min=1, max=current_app.config['SHOW_MAX_MINUTES'])(form, field)
+
+
+def default_show_length():
+    return current_app.config['SHOW_DEFAULT_MINUTES']
+
+
+# start times are entered as 'YYYY-MM-DD HH:MM' (the placeholder); seconds
+# are accepted too, as exports write them
+class StartTimeField(DateTimeField):
+    formats = ('%Y-%m-%d %H:%M', '%Y-%m-%d %H:%M:%S')
+
+    def __init__(self, label=None, validators=None, **kwargs):
+        super().__init__(label, validators, format=self.formats[0], **kwargs)
+
+    def process_formdata(self, valuelist):
+        if not valuelist:
+            return
+        value = ' '.join(valuelist).strip()
+        for format in self.formats:
+            try:
+                self.data = datetime.strptime(value, format)
+                return
+            except ValueError:
+                pass
+        self.data = None
+        raise ValueError(self.gettext('Not a valid datetime value'))
+
 
 class ShowForm(Form):
     artist_id = StringField(
@@ -10,11 +44,60 @@ class ShowForm(Form):
     venue_id = StringField(
         'venue_id'
     )
-    start_time = DateTimeField(
+    start_time = StartTimeField(
         'start_time',
         validators=[DataRequired()],
         default= datetime.today()
     )
+    duration = IntegerField(
+        'duration', validators=[DataRequired(), show_length],
+        default=default_show_length
+    )
+
+
+# either shows (one 'artist_id, venue_id, start_time' per line) or a weekly
+# recurrence of one artist at one venue; duration is the default length
+class BulkShowForm(Form):
+    shows = TextAreaField(
+        'shows'
+    )
+    artist_id = IntegerField(
+        'artist_id', validators=[Optional()]
+    )
+    venue_id = IntegerField(
+        'venue_id', validators=[Optional()]
+    )
+    start_time = StartTimeField(
+        'start_time', validators=[Optional()]
+    )
+    duration = IntegerField(
+        'duration', validators=[DataRequired(), show_length],
+        default=default_show_length
+    )
+    weeks = IntegerField(
+        'weeks', validators=[Optional(), NumberRange(min=1, max=52)],
+        default=1
+    )
+    weekdays = SelectMultipleField(
+        'weekdays', coerce=int,
+        choices=[
+            (0, 'Monday'),
+            (1, 'Tuesday'),
+            (2, 'Wednesday'),
+            (3, 'Thursday'),
+            (4, 'Friday'),
+            (5, 'Saturday'),
+            (6, 'Sunday'),
+        ]
+    )
+
+    def validate(self):
+        if not super().validate():
+            return False
+        if not (self.shows.data or '').strip() and None in (self.artist_id.data, self.venue_id.data, self.start_time.data):
+            self.shows.errors.append('List some shows, or give an artist, a venue and a first start time')
+            return False
+        return True
 
 
 
@@ -129,6 +212,16 @@ class VenueForm(Form):
     seeking_description = StringField(
         'seeking_description' 
     )
+    timezone = SelectField(
+        'timezone', default='',
+        choices=[('', 'Not set')] + [(name, name) for name in common_timezones]
+    )
+    latitude = FloatField(
+        'latitude', validators=[Optional(), NumberRange(min=-90, max=90)]
+    )
+    longitude = FloatField(
+        'longitude', validators=[Optional(), NumberRange(min=-180, max=180)]
+    )
 
 
 
@@ -0,0 +1,69 @@
+#----------------------------------------------------------------------------#
+# Venue locations on a grid.
+#
+# The globe is cut into cells of CELL_DEGREES by CELL_DEGREES, numbered row
+# by row from the south pole and the antimeridian, and a venue with
+# coordinates stores the number of its cell in geo_cell (a B-tree index).
+# The cells of one row are consecutive numbers, so the cells around a point
+# are a few ranges of the index, one per row of cells (or one in all when
+# whole rows are covered): a nearby search reads the venues of those cells
+# only, and the exact distances are then computed for them alone.
+#
+# Changing CELL_DEGREES renumbers every cell: geo_cell must then be
+# recomputed for every venue.
+#----------------------------------------------------------------------------#
+
+import math
+
+CELL_DEGREES = 0.1
+ROWS = round(180 / CELL_DEGREES)
+COLUMNS = round(360 / CELL_DEGREES)
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+
+
+def row(latitude):
+    return min(int((latitude + 90) / CELL_DEGREES), ROWS - 1)
+
+
+def column(longitude):
+    return int(((longitude + 180) % 360) / CELL_DEGREES) % COLUMNS
+
+
+def grid_cell(latitude, longitude):
+    if latitude is None or longitude is None:
+        return None
+    return row(latitude) * COLUMNS + column(longitude)
+
+
+def cell_ranges(latitude, longitude, km):
+    # (first, last) cell numbers covering every point within km
+    span = km / KM_PER_DEGREE
+    south, north = max(latitude - span, -90), min(latitude + span, 90)
+    # a circle is widest in longitude on its edge nearest a pole
+    widest = math.cos(math.radians(max(abs(south), abs(north))))
+    width = span / widest if widest > 0 else 360
+    if width >= 180:
+        columns = [(0, COLUMNS - 1)]
+    else:
+        west, east = column(longitude - width), column(longitude + width)
+        columns = [(west, east)] if west <= east else [(west, COLUMNS - 1), (0, east)]
+
+    ranges = []
+    for number in range(row(south), row(north) + 1):
+        for first, last in columns:
+            first, last = number * COLUMNS + first, number * COLUMNS + last
+            if ranges and ranges[-1][1] + 1 == first:
+                ranges[-1] = (ranges[-1][0], last)
+            else:
+                ranges.append((first, last))
+    return ranges
+
+
+def distance_km(latitude, longitude, other_latitude, other_longitude):
+    # haversine, on a sphere of the Earth's mean radius
+    lat1, lat2 = math.radians(latitude), math.radians(other_latitude)
+    dlat = lat2 - lat1
+    dlng = math.radians(other_longitude - longitude)
+    a = math.sin(dlat / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin(dlng / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
@@ -0,0 +1,32 @@
+#----------------------------------------------------------------------------#
+# gunicorn settings, read from the working directory.
+#
+#   SECRET_KEY=... DATABASE_URL=... gunicorn
+#
+# The app is loaded once, in the master (preload_app), and app.preload()
+# configures the mappers and compiles the templates there; the workers are
+# forked from it and share that memory instead of each importing and
+# compiling everything again, so a new worker is serving in milliseconds.
+# The master opens no database connection (see app.py), so there is none for
+# the workers to inherit. Environment: PORT, WEB_CONCURRENCY (workers) and
+# WEB_THREADS (threads per worker).
+#----------------------------------------------------------------------------#
+
+import gc
+import multiprocessing
+import os
+
+wsgi_app = 'wsgi:app'
+bind = '0.0.0.0:' + os.environ.get('PORT', '8000')
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get('WEB_THREADS', 1))
+preload_app = True
+
+
+def when_ready(server):
+    from app import preload
+    from wsgi import app
+    preload(app)
+    # objects made so far are never collected, so the collector does not
+    # touch (and copy) the pages the workers share with the master
+    gc.freeze()
@@ -0,0 +1,377 @@
+#----------------------------------------------------------------------------#
+# Bulk import.
+#
+#   flask import venues venues.csv
+#   flask import artists artists.jsonl --chunk-size 10000
+#   flask import shows shows.csv --rejects rejected.jsonl
+#
+# Rows are streamed from CSV or JSON-lines files, validated with the same
+# forms the web pages use (and shows with the overlap checks of /shows/bulk),
+# and inserted a chunk at a time: COPY on Postgres, executemany elsewhere.
+# Show times are in the venue's local time, as the forms take them and as
+# exports write them, and are stored in UTC. Each chunk is committed in one transaction with its checkpoint (a row of
+# ImportCheckpoint), so an interrupted import picks up after the last
+# committed chunk and never inserts a row twice.
+#----------------------------------------------------------------------------#
+
+import csv
+import datetime
+import io
+import json
+import os
+import time
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import select
+from werkzeug.datastructures import MultiDict
+
+from extensions import db
+from cache import response_cache
+import counters
+from forms import VenueForm, ArtistForm, ShowForm
+import geo
+from models import Venue, Artist, Show, ImportCheckpoint
+import scheduling
+
+
+#  Reading
+#  ----------------------------------------------------------------
+
+def read_rows(path, format=None):
+    # yields one dict per data row, without loading the file
+    format = format or ('csv' if path.endswith('.csv') else 'jsonl')
+    with open(path, newline='', encoding='utf-8') as f:
+        if format == 'csv':
+            for row in csv.DictReader(f):
+                yield row
+        else:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def chunked(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+#  Validation
+#  ----------------------------------------------------------------
+
+def as_formdata(row):
+    formdata = MultiDict()
+    for key, value in row.items():
+        if value is None:
+            continue
+        if key == 'genres':
+            # a JSON list, or comma separated in CSV files
+            values = value if isinstance(value, list) else value.split(',')
+            for genre in values:
+                formdata.add(key, genre.strip())
+        else:
+            formdata.add(key, str(value))
+    return formdata
+
+
+# a value the forms do not check, rejected under the field it came from
+class FieldError(ValueError):
+
+    def __init__(self, field, message):
+        super().__init__(message)
+        self.field = field
+
+
+def optional_id(row, key='id'):
+    value = row.get(key)
+    if value in (None, ''):
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise FieldError(key, f'Not a valid id: {value!r}')
+
+
+def venue_record(form, row):
+    return {
+        'id': optional_id(row),
+        'name': form.name.data,
+        'city': form.city.data,
+        'state': form.state.data,
+        'address': form.address.data,
+        'phone': form.phone.data or None,
+        'website': form.website.data or None,
+        'genres': form.genres.data,
+        'image_link': form.image_link.data or None,
+        'facebook_link': form.facebook_link.data or None,
+        'seeking_talent': bool(form.seeking_description.data),
+        'seeking_description': form.seeking_description.data or None,
+        'timezone': form.timezone.data or None,
+        'latitude': form.latitude.data,
+        'longitude': form.longitude.data,
+        # bulk inserts bypass locate_venue, which sets it on ORM inserts
+        'geo_cell': geo.grid_cell(form.latitude.data, form.longitude.data),
+    }
+
+
+def artist_record(form, row):
+    return {
+        'id': optional_id(row),
+        'name': form.name.data,
+        'city': form.city.data,
+        'state': form.state.data,
+        'phone': form.phone.data or None,
+        'website': form.website.data or None,
+        'genres': form.genres.data,
+        'image_link': form.image_link.data or None,
+        'facebook_link': form.facebook_link.data,
+        'seeking_venue': bool(form.seeking_description.data),
+        'seeking_description': form.seeking_description.data or None,
+    }
+
+
+def show_end_time(form, row):
+    # exports carry end_time; other files may give a duration in minutes,
+    # which the form has already checked
+    if not row.get('end_time'):
+        return form.start_time.data + datetime.timedelta(minutes=form.duration.data)
+    try:
+        end_time = datetime.datetime.fromisoformat(str(row['end_time']))
+    except ValueError:
+        raise FieldError('end_time', f'Not a valid datetime: {row["end_time"]!r}')
+    length = end_time - form.start_time.data
+    if not datetime.timedelta(0) < length <= datetime.timedelta(minutes=current_app.config['SHOW_MAX_MINUTES']):
+        raise FieldError('end_time', f'a show lasts 1 to {current_app.config["SHOW_MAX_MINUTES"]} minutes')
+    return end_time
+
+
+def show_record(form, row):
+    return {
+        'id': optional_id(row),
+        'artist_id': optional_id(row, 'artist_id'),
+        'venue_id': optional_id(row, 'venue_id'),
+        'artist_name': row.get('artist_name'),
+        'venue_name': row.get('venue_name'),
+        'start_time': form.start_time.data,
+        'end_time': show_end_time(form, row),
+    }
+
+
+KINDS = {
+    'venues': (Venue, VenueForm, venue_record),
+    'artists': (Artist, ArtistForm, artist_record),
+    'shows': (Show, ShowForm, show_record),
+}
+
+
+def validate_chunk(kind, rows, first_line):
+    # returns (records, rejects); one form instance is reused for the chunk
+    model, form_class, to_record = KINDS[kind]
+    form = form_class(formdata=None, meta={'csrf': False})
+    records = []
+    rejects = []
+    for line, row in enumerate(rows, first_line):
+        form.process(as_formdata(row))
+        if not form.validate():
+            rejects.append({'line': line, 'errors': form.errors})
+            continue
+        try:
+            records.append((line, to_record(form, row)))
+        except FieldError as e:
+            rejects.append({'line': line, 'errors': {e.field: [str(e)]}})
+    return records, rejects
+
+
+def resolve_foreign_keys(records, rejects):
+    # shows may reference venues and artists by id or by unique name; one
+    # IN query per referenced table per chunk
+    resolved = []
+    lookups = {}
+    for model, key in ((Venue, 'venue'), (Artist, 'artist')):
+        ids = {record[f'{key}_id'] for line, record in records if record[f'{key}_id'] is not None}
+        names = {record[f'{key}_name'] for line, record in records
+                 if record[f'{key}_id'] is None and record[f'{key}_name']}
+        existing = set()
+        if ids:
+            existing = {row.id for row in db.session.query(model.id).filter(model.id.in_(ids))}
+        by_name = {}
+        if names:
+            for row in db.session.query(model.id, model.name).filter(model.name.in_(names)):
+                # a name used by several rows cannot be resolved
+                by_name[row.name] = None if row.name in by_name else row.id
+        lookups[key] = (existing, by_name)
+
+    for line, record in records:
+        errors = {}
+        for key in ('venue', 'artist'):
+            existing, by_name = lookups[key]
+            if record[f'{key}_id'] is not None:
+                if record[f'{key}_id'] not in existing:
+                    errors[f'{key}_id'] = [f'No {key} with id {record[key + "_id"]}']
+            elif by_name.get(record[f'{key}_name']):
+                record[f'{key}_id'] = by_name[record[f'{key}_name']]
+            else:
+                errors[f'{key}_id'] = [f'No unique {key} named {record[key + "_name"]!r}']
+        if errors:
+            rejects.append({'line': line, 'errors': errors})
+            continue
+        del record['venue_name'], record['artist_name']
+        resolved.append((line, record))
+    return resolved
+
+
+def check_schedule(records, rejects):
+    # the overlap checks of /shows/bulk, against the shows already booked and
+    # the earlier rows of the chunk: one clash would otherwise abort the
+    # whole chunk on the exclusion constraint (or the SQLite triggers)
+    rows = scheduling.check(scheduling.to_utc([dict(record, line=line, error=None) for line, record in records]))
+    scheduled = []
+    for (line, record), row in zip(records, rows):
+        if row['error']:
+            rejects.append({'line': line, 'errors': {'start_time': [row['error']]}})
+        else:
+            record.update(start_time=row['start_time'], end_time=row['end_time'])
+            scheduled.append((line, record))
+    return scheduled
+
+
+#  Writing
+#  ----------------------------------------------------------------
+
+def pg_copy_value(value):
+    if value is None:
+        return None
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    if isinstance(value, list):
+        return '{' + ','.join('"' + v.replace('\\', '\\\\').replace('"', '\\"') + '"' for v in value) + '}'
+    return value
+
+
+def insert_records(model, records):
+    table = model.__table__
+    # rows without an id get one from the sequence
+    with_id = [record for record in records if record['id'] is not None]
+    without_id = [{k: v for k, v in record.items() if k != 'id'} for record in records if record['id'] is None]
+    connection = db.session.connection()
+
+    for batch in (with_id, without_id):
+        if not batch:
+            continue
+        if connection.dialect.name == 'postgresql':
+            columns = list(batch[0])
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            for record in batch:
+                writer.writerow([pg_copy_value(record[column]) for column in columns])
+            buffer.seek(0)
+            column_list = ', '.join(f'"{column}"' for column in columns)
+            cursor = connection.connection.cursor()
+            cursor.copy_expert(f'COPY "{table.name}" ({column_list}) FROM STDIN WITH (FORMAT csv)', buffer)
+        else:
+            connection.execute(table.insert(), batch)
+
+    if model is Show:
+        # bulk inserts bypass the ORM events that keep the counters
+        counters.count_shows(connection, [(record['venue_id'], record['artist_id'], record['start_time'])
+                                          for record in records])
+
+    if with_id and connection.dialect.name == 'postgresql':
+        # explicit ids do not advance the sequence
+        connection.execute(
+            f'SELECT setval(pg_get_serial_sequence(\'"{table.name}"\', \'id\'), '
+            f'(SELECT max(id) FROM "{table.name}"))')
+
+
+#  Checkpoints
+#  ----------------------------------------------------------------
+
+checkpoints = ImportCheckpoint.__table__
+
+
+def load_checkpoint(name):
+    row = db.session.execute(select([checkpoints.c.rows, checkpoints.c.inserted, checkpoints.c.rejected])
+                             .where(checkpoints.c.name == name)).first()
+    return dict(row) if row else {'rows': 0, 'inserted': 0, 'rejected': 0}
+
+
+def save_checkpoint(name, checkpoint):
+    # in the chunk's transaction, committed by the caller
+    connection = db.session.connection()
+    updated = connection.execute(checkpoints.update().where(checkpoints.c.name == name).values(**checkpoint))
+    if not updated.rowcount:
+        connection.execute(checkpoints.insert().values(name=name, **checkpoint))
+
+
+def clear_checkpoint(name):
+    db.session.execute(checkpoints.delete().where(checkpoints.c.name == name))
+    db.session.commit()
+
+
+#  Command
+#  ----------------------------------------------------------------
+
+@click.command('import')
+@click.argument('kind', type=click.Choice(list(KINDS)))
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', type=click.Choice(['csv', 'jsonl']), help='Defaults to the file extension.')
+@click.option('--chunk-size', default=5000, show_default=True)
+@click.option('--checkpoint', help='Checkpoint name, defaults to KIND:PATH with the absolute path.')
+@click.option('--restart', is_flag=True, help='Ignore an existing checkpoint.')
+@click.option('--rejects', type=click.File('a'), help='Append rejected rows and their errors here (JSON lines).')
+@with_appcontext
+def import_command(kind, path, format, chunk_size, checkpoint, restart, rejects):
+    """Stream venues, artists or shows from a CSV or JSON-lines file."""
+    model = KINDS[kind][0]
+    if db.engine.dialect.name == 'sqlite':
+        # no migrations there; the web app makes the other tables
+        checkpoints.create(db.engine, checkfirst=True)
+    checkpoint = checkpoint or f'{kind}:{os.path.abspath(path)}'
+    if restart:
+        clear_checkpoint(checkpoint)
+    state = load_checkpoint(checkpoint)
+    if state['rows']:
+        click.echo(f'Resuming after row {state["rows"]}')
+
+    rows = read_rows(path, format)
+    for _ in range(state['rows']):
+        next(rows, None)
+
+    started = time.time()
+    imported = 0
+    for chunk in chunked(rows, chunk_size):
+        first_line = state['rows'] + 1
+        records, rejected = validate_chunk(kind, chunk, first_line)
+        if kind == 'shows':
+            records = resolve_foreign_keys(records, rejected)
+            records = check_schedule(records, rejected)
+
+        insert_records(model, [record for line, record in records])
+        state['rows'] += len(chunk)
+        state['inserted'] += len(records)
+        state['rejected'] += len(rejected)
+        save_checkpoint(checkpoint, state)
+        db.session.commit()
+
+        if rejects:
+            for reject in sorted(rejected, key=lambda reject: reject['line']):
+                # the checks report the line, the row is added here
+                reject['row'] = chunk[reject['line'] - first_line]
+                rejects.write(json.dumps(reject, default=str) + '\n')
+
+        imported += len(chunk)
+        rate = imported / max(time.time() - started, 1e-6)
+        click.echo(f'{kind}: {state["rows"]} rows read, {state["inserted"]} inserted, '
+                   f'{state["rejected"]} rejected, {rate:,.0f} rows/s')
+
+    clear_checkpoint(checkpoint)
+    # the workers' typeahead indexes catch up within TYPEAHEAD_REFRESH_SECONDS
+    response_cache.clear()
+    click.echo(f'Done: {state["inserted"]} {kind} inserted, {state["rejected"]} rejected.')
@@ -0,0 +1,85 @@
+#----------------------------------------------------------------------------#
+# Per-request query accounting.
+#
+# Counts the queries each request runs and the time spent in them, reports
+# both in a Server-Timing header and in the application log, and warns when
+# the same statement (literals stripped) runs more than QUERY_REPEAT_THRESHOLD
+# times in one request, which is what an N+1 loop looks like. With
+# QUERY_REPEAT_RAISE set the request fails instead, so tests catch it.
+#----------------------------------------------------------------------------#
+
+import re
+import time
+from collections import Counter
+
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+class RepeatedQueryError(Exception):
+    pass
+
+
+def normalize(statement):
+    # the same query with different literals is the same query
+    statement = re.sub(r"'(?:[^']|'')*'", '?', statement)
+    statement = re.sub(r'\b\d+(?:\.\d+)?\b', '?', statement)
+    statement = re.sub(r'%\(\w+\)s|:\w+', '?', statement)
+    statement = re.sub(r'\(\s*\?(?:\s*,\s*\?)*\s*\)', '(?)', statement)
+    return ' '.join(statement.split())
+
+
+class QueryTracker:
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('QUERY_REPEAT_THRESHOLD', 10)
+        app.config.setdefault('QUERY_REPEAT_RAISE', False)
+        # on the Engine class so every engine (and bind) of every app is covered
+        if not event.contains(Engine, 'before_cursor_execute', self._before_cursor_execute):
+            event.listen(Engine, 'before_cursor_execute', self._before_cursor_execute)
+            event.listen(Engine, 'after_cursor_execute', self._after_cursor_execute)
+        app.before_request(self._start)
+        app.after_request(self._finish)
+
+    def _start(self):
+        g.query_stats = {'count': 0, 'time': 0.0, 'statements': Counter(), 'repeated': []}
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        started = conn.info['query_started'].pop()
+        if not has_request_context() or 'query_stats' not in g:
+            return
+        stats = g.query_stats
+        stats['count'] += 1
+        stats['time'] += time.perf_counter() - started
+
+        key = normalize(statement)
+        stats['statements'][key] += 1
+        if stats['statements'][key] == current_app.config['QUERY_REPEAT_THRESHOLD'] + 1:
+            stats['repeated'].append(key)
+            current_app.logger.warning(
+                'Possible N+1: statement ran more than %d times in %s %s: %s',
+                current_app.config['QUERY_REPEAT_THRESHOLD'], request.method, request.path, key)
+
+    def _finish(self, response):
+        stats = g.pop('query_stats', None)
+        if stats is None:
+            return response
+        duration = stats['time'] * 1000
+        response.headers.add('Server-Timing', f'db;dur={duration:.1f};desc="{stats["count"]} queries"')
+        current_app.logger.info('%s %s %s: %d queries, %.1f ms in the database',
+                             request.method, request.path, response.status_code, stats['count'], duration)
+        if stats['repeated'] and current_app.config['QUERY_REPEAT_RAISE']:
+            raise RepeatedQueryError(
+                f'{request.method} {request.path} repeated: ' + '; '.join(stats['repeated']))
+        return response
+
+
+query_tracker = QueryTracker()
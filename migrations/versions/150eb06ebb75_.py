@@ -0,0 +1,50 @@
+"""show counters on venues and artists
+
+Revision ID: 150eb06ebb75
+Revises: d9a06c1f92c0
+Create Date: 2026-10-18 20:05:41.902316
+
+"""
+import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '150eb06ebb75'
+down_revision = 'd9a06c1f92c0'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    for table in ('Venue', 'Artist'):
+        op.add_column(table, sa.Column('upcoming_shows_count', sa.Integer(), server_default='0', nullable=False))
+        op.add_column(table, sa.Column('past_shows_count', sa.Integer(), server_default='0', nullable=False))
+
+    watermark = op.create_table('ShowCounterWatermark',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('rolled_over_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+    )
+    # show times are stored in UTC
+    now = datetime.datetime.utcnow()
+    op.bulk_insert(watermark, [{'id': 1, 'rolled_over_at': now}])
+
+    # count the existing shows, same as 'flask counters rebuild'
+    for table, key in (('Venue', 'venue_id'), ('Artist', 'artist_id')):
+        op.execute(sa.text(f'''
+            UPDATE "{table}" SET
+              upcoming_shows_count = (SELECT count(*) FROM "Show"
+                                      WHERE "Show".{key} = "{table}".id AND start_time >= :now),
+              past_shows_count = (SELECT count(*) FROM "Show"
+                                  WHERE "Show".{key} = "{table}".id AND start_time < :now)
+        ''').bindparams(now=now))
+
+
+def downgrade():
+    op.drop_table('ShowCounterWatermark')
+    for table in ('Venue', 'Artist'):
+        op.drop_column(table, 'past_shows_count')
+        op.drop_column(table, 'upcoming_shows_count')
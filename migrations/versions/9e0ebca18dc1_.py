@@ -0,0 +1,32 @@
+"""venue coordinates and their grid cell
+
+Revision ID: 9e0ebca18dc1
+Revises: dcd860fc6ac0
+Create Date: 2026-10-18 23:12:44.630518
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9e0ebca18dc1'
+down_revision = 'dcd860fc6ac0'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # existing venues have no coordinates (and no cell) until they are edited
+    # or imported again
+    op.add_column('Venue', sa.Column('latitude', sa.Float(), nullable=True))
+    op.add_column('Venue', sa.Column('longitude', sa.Float(), nullable=True))
+    op.add_column('Venue', sa.Column('geo_cell', sa.Integer(), nullable=True))
+    op.create_index('ix_Venue_geo_cell', 'Venue', ['geo_cell'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_Venue_geo_cell', table_name='Venue')
+    op.drop_column('Venue', 'geo_cell')
+    op.drop_column('Venue', 'longitude')
+    op.drop_column('Venue', 'latitude')
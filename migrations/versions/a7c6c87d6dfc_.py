@@ -0,0 +1,41 @@
+"""indexes for the page queries
+
+Revision ID: a7c6c87d6dfc
+Revises: e5b165eaa362
+Create Date: 2026-10-18 11:20:45.307716
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a7c6c87d6dfc'
+down_revision = 'e5b165eaa362'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # show_venue / show_artist: a venue's or artist's shows by date
+    op.create_index('ix_Show_venue_id_start_time', 'Show', ['venue_id', 'start_time'], unique=False)
+    op.create_index('ix_Show_artist_id_start_time', 'Show', ['artist_id', 'start_time'], unique=False)
+    # /shows keyset pagination on (start_time, id)
+    op.create_index('ix_Show_start_time_id', 'Show', ['start_time', 'id'], unique=False)
+    # /venues: areas in order, with the venue names read from the index
+    op.create_index('ix_Venue_city_state_name', 'Venue', ['city', 'state', 'name'], unique=False)
+    # /artists ordering
+    op.create_index('ix_Artist_name', 'Artist', ['name'], unique=False)
+    # genre filters, written as genres @> ARRAY[...] so they can use the index
+    op.create_index('ix_Venue_genres', 'Venue', ['genres'], unique=False, postgresql_using='gin')
+    op.create_index('ix_Artist_genres', 'Artist', ['genres'], unique=False, postgresql_using='gin')
+
+
+def downgrade():
+    op.drop_index('ix_Artist_genres', table_name='Artist')
+    op.drop_index('ix_Venue_genres', table_name='Venue')
+    op.drop_index('ix_Artist_name', table_name='Artist')
+    op.drop_index('ix_Venue_city_state_name', table_name='Venue')
+    op.drop_index('ix_Show_start_time_id', table_name='Show')
+    op.drop_index('ix_Show_artist_id_start_time', table_name='Show')
+    op.drop_index('ix_Show_venue_id_start_time', table_name='Show')
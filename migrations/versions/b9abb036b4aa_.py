@@ -0,0 +1,30 @@
+"""import checkpoints
+
+Revision ID: b9abb036b4aa
+Revises: 9e0ebca18dc1
+Create Date: 2026-10-18 20:14:03.214871
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b9abb036b4aa'
+down_revision = '9e0ebca18dc1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('ImportCheckpoint',
+        sa.Column('name', sa.String(), nullable=False),
+        sa.Column('rows', sa.Integer(), nullable=False),
+        sa.Column('inserted', sa.Integer(), nullable=False),
+        sa.Column('rejected', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('name')
+    )
+
+
+def downgrade():
+    op.drop_table('ImportCheckpoint')
@@ -0,0 +1,54 @@
+"""show times in UTC
+
+Revision ID: c401980a7db5
+Revises: b9abb036b4aa
+Create Date: 2026-10-18 21:02:37.518204
+
+"""
+import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c401980a7db5'
+down_revision = 'b9abb036b4aa'
+branch_labels = None
+depends_on = None
+
+
+def convert(source, target):
+    # the shows of venues with a timezone; the others were already in UTC
+    # (BABEL_DEFAULT_TIMEZONE)
+    op.execute(f'''
+        UPDATE "Show" SET
+          start_time = ("Show".start_time AT TIME ZONE {source}) AT TIME ZONE {target},
+          end_time = ("Show".end_time AT TIME ZONE {source}) AT TIME ZONE {target},
+          updated_at = now()
+        FROM "Venue"
+        WHERE "Venue".id = "Show".venue_id AND "Venue".timezone IS NOT NULL
+    ''')
+
+
+def recount(now):
+    # same as 'flask counters rebuild'
+    for table, key in (('Venue', 'venue_id'), ('Artist', 'artist_id')):
+        op.execute(sa.text(f'''
+            UPDATE "{table}" SET
+              upcoming_shows_count = (SELECT count(*) FROM "Show"
+                                      WHERE "Show".{key} = "{table}".id AND start_time >= :now),
+              past_shows_count = (SELECT count(*) FROM "Show"
+                                  WHERE "Show".{key} = "{table}".id AND start_time < :now)
+        ''').bindparams(now=now))
+    op.execute(sa.text('UPDATE "ShowCounterWatermark" SET rolled_over_at = :now WHERE id = 1').bindparams(now=now))
+
+
+def upgrade():
+    convert('"Venue".timezone', "'UTC'")
+    recount(datetime.datetime.utcnow())
+
+
+def downgrade():
+    convert("'UTC'", '"Venue".timezone')
+    recount(datetime.datetime.now())
@@ -0,0 +1,40 @@
+"""search indexes
+
+Revision ID: d097ffc6917a
+Revises: 63a050f44ac1
+Create Date: 2026-10-18 09:12:41.118203
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd097ffc6917a'
+down_revision = '63a050f44ac1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    # immutable so that it can be used in an index expression
+    op.execute("""
+        CREATE OR REPLACE FUNCTION fyyur_search_document(name text, city text, state text, genres text[])
+        RETURNS text
+        LANGUAGE sql IMMUTABLE PARALLEL SAFE
+        AS $$
+            SELECT coalesce($1, '') || ' ' || coalesce($2, '') || ' ' ||
+                   coalesce($3, '') || ' ' || coalesce(array_to_string($4, ' '), '')
+        $$
+    """)
+    op.execute('CREATE INDEX ix_venue_search ON "Venue" USING gin '
+               '(fyyur_search_document(name, city, state, genres) gin_trgm_ops)')
+    op.execute('CREATE INDEX ix_artist_search ON "Artist" USING gin '
+               '(fyyur_search_document(name, city, state, genres) gin_trgm_ops)')
+
+
+def downgrade():
+    op.execute('DROP INDEX IF EXISTS ix_artist_search')
+    op.execute('DROP INDEX IF EXISTS ix_venue_search')
+    op.execute('DROP FUNCTION IF EXISTS fyyur_search_document(text, text, text, text[])')
@@ -0,0 +1,25 @@
+"""venue timezone
+
+Revision ID: d9a06c1f92c0
+Revises: a7c6c87d6dfc
+Create Date: 2026-10-18 19:32:10.518204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd9a06c1f92c0'
+down_revision = 'a7c6c87d6dfc'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # IANA name, show times are displayed in it
+    op.add_column('Venue', sa.Column('timezone', sa.String(length=64), nullable=True))
+
+
+def downgrade():
+    op.drop_column('Venue', 'timezone')
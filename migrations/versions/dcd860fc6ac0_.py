@@ -0,0 +1,42 @@
+"""show end times, no overlapping shows at a venue
+
+Revision ID: dcd860fc6ac0
+Revises: 150eb06ebb75
+Create Date: 2026-10-18 22:31:07.516204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'dcd860fc6ac0'
+down_revision = '150eb06ebb75'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('Show', sa.Column('end_time', sa.DateTime(), nullable=True))
+    # two hours (SHOW_DEFAULT_MINUTES), cut short at the venue's next show so
+    # the shows already double-booked do not break the constraint
+    op.execute('''
+        UPDATE "Show" SET end_time = ends.end_time
+        FROM (SELECT id, LEAST(start_time + interval '120 minutes',
+                               LEAD(start_time) OVER (PARTITION BY venue_id ORDER BY start_time, id)) AS end_time
+              FROM "Show") AS ends
+        WHERE "Show".id = ends.id
+    ''')
+    op.alter_column('Show', 'end_time', nullable=False)
+
+    # btree_gist for the integer equality in a GiST index
+    op.execute('CREATE EXTENSION IF NOT EXISTS btree_gist')
+    op.execute('''
+        ALTER TABLE "Show" ADD CONSTRAINT "Show_venue_id_during_excl"
+        EXCLUDE USING gist (venue_id WITH =, tsrange(start_time, end_time) WITH &&)
+    ''')
+
+
+def downgrade():
+    op.drop_constraint('Show_venue_id_during_excl', 'Show')
+    op.drop_column('Show', 'end_time')
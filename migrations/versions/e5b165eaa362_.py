@@ -0,0 +1,46 @@
+"""updated_at columns
+
+Revision ID: e5b165eaa362
+Revises: d097ffc6917a
+Create Date: 2026-10-18 10:02:17.540918
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5b165eaa362'
+down_revision = 'd097ffc6917a'
+branch_labels = None
+depends_on = None
+
+tables = ['Venue', 'Artist', 'Show']
+
+
+def upgrade():
+    # keeps updated_at current for every UPDATE, including ones made outside the ORM
+    op.execute("""
+        CREATE OR REPLACE FUNCTION fyyur_touch_updated_at() RETURNS trigger
+        LANGUAGE plpgsql
+        AS $$
+        BEGIN
+            NEW.updated_at := now();
+            RETURN NEW;
+        END
+        $$
+    """)
+    for table in tables:
+        op.add_column(table, sa.Column('updated_at', sa.DateTime(timezone=True),
+                                       server_default=sa.text('now()'), nullable=False))
+        op.create_index(op.f(f'ix_{table}_updated_at'), table, ['updated_at'], unique=False)
+        op.execute(f'CREATE TRIGGER "{table}_touch_updated_at" BEFORE UPDATE ON "{table}" '
+                   f'FOR EACH ROW EXECUTE PROCEDURE fyyur_touch_updated_at()')
+
+
+def downgrade():
+    for table in reversed(tables):
+        op.execute(f'DROP TRIGGER IF EXISTS "{table}_touch_updated_at" ON "{table}"')
+        op.drop_index(op.f(f'ix_{table}_updated_at'), table_name=table)
+        op.drop_column(table, 'updated_at')
+    op.execute('DROP FUNCTION IF EXISTS fyyur_touch_updated_at()')
@@ -1,7 +1,41 @@
-from app import db
+from sqlalchemy import event
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import FunctionElement
+
+from extensions import db
+import geo
+from typeahead import index as typeahead_index
+from cache import response_cache
+from transaction import on_commit
+
+# text[] on Postgres, JSON on SQLite so the app can also run on SQLite
+StringArray = db.ARRAY(db.String).with_variant(db.JSON, 'sqlite')
+
+
+# now() to the microsecond on SQLite as well, whose CURRENT_TIMESTAMP has
+# whole seconds: two edits within a second must not share an updated_at (the
+# ETags of conditional.py are made from it)
+class precise_now(FunctionElement):
+    type = db.DateTime(timezone=True)
+
+
+@compiles(precise_now)
+def compile_precise_now(element, compiler, **kw):
+    return compiler.process(db.func.now(), **kw)
+
+
+@compiles(precise_now, 'sqlite')
+def compile_precise_now_sqlite(element, compiler, **kw):
+    return "strftime('%Y-%m-%d %H:%M:%f', 'now') || '000'"
+
 
 class Venue(db.Model): 
     __tablename__ = 'Venue'
+    __table_args__ = (
+        db.Index('ix_Venue_city_state_name', 'city', 'state', 'name'),
+        db.Index('ix_Venue_genres', 'genres', postgresql_using='gin'),
+        db.Index('ix_Venue_geo_cell', 'geo_cell'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String, nullable=False)
     city = db.Column(db.String(120), nullable=False)
@@ -9,56 +43,115 @@ class Venue(db.Model):
     address = db.Column(db.String(120), nullable=False)
     phone = db.Column(db.String(120)) 
     website = db.Column(db.String(500))
-    genres = db.Column('genres', db.ARRAY(db.String), nullable=False)
+    genres = db.Column('genres', StringArray, nullable=False)
     facebook_link = db.Column(db.String(500))  
     image_link = db.Column(db.String(500))
     seeking_talent = db.Column(db.Boolean, nullable=True, default=False)
     seeking_description = db.Column(db.String(1000))
+    timezone = db.Column(db.String(64))
+    latitude = db.Column(db.Float)
+    longitude = db.Column(db.Float)
+    # grid cell of the coordinates, kept by locate_venue (see geo.py)
+    geo_cell = db.Column(db.Integer)
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    past_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    updated_at = db.Column(db.DateTime(timezone=True), nullable=False, index=True, server_default=db.func.now(), default=precise_now(), onupdate=precise_now())
     shows = db.relationship('Show', backref='pVenue', lazy=True, cascade='all, delete')
      
+    # staged in the session and committed by transaction.atomic
     def create(self):
         db.session.add(self)
-        db.session.commit()
+        on_commit(lambda: typeahead_index.add('venue', self.id, self.name))
+        on_commit(lambda: response_cache.invalidate('venues'))
 
     def update(self):
-        db.session.update(self)
-        db.session.commit()
+        db.session.add(self)
+        on_commit(lambda: typeahead_index.add('venue', self.id, self.name))
+        on_commit(lambda: response_cache.invalidate('venues', 'shows', f'venue:{self.id}'))
 
     def delete(self):
+        venue_id = self.id
+        # the shows go with the venue (the cascade loads them anyway), and
+        # with them their artists' upcoming shows
+        artist_ids = {show.artist_id for show in self.shows}
         db.session.delete(self)
-        db.session.commit()
-    
+        on_commit(lambda: typeahead_index.remove('venue', venue_id))
+        on_commit(lambda: response_cache.invalidate('venues', 'artists', 'shows', f'venue:{venue_id}',
+                                                    *(f'artist:{id}' for id in artist_ids)))
+
+
+@event.listens_for(Venue, 'before_insert')
+@event.listens_for(Venue, 'before_update')
+def locate_venue(mapper, connection, venue):
+    venue.geo_cell = geo.grid_cell(venue.latitude, venue.longitude)
+
+
 class Artist(db.Model):
     __tablename__ = 'Artist'
+    __table_args__ = (
+        db.Index('ix_Artist_name', 'name'),
+        db.Index('ix_Artist_genres', 'genres', postgresql_using='gin'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String, nullable=False)
     city = db.Column(db.String(120), nullable=False)
     state = db.Column(db.String(120), nullable=False)
     phone = db.Column(db.String(120)) 
     website = db.Column(db.String(500))
-    genres = db.Column('genres', db.ARRAY(db.String), nullable=False)
+    genres = db.Column('genres', StringArray, nullable=False)
     facebook_link = db.Column(db.String(500), nullable=False) 
     image_link = db.Column(db.String(500)) 
     seeking_venue = db.Column(db.Boolean, default=True)
     seeking_description = db.Column(db.String(1000))
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    past_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    updated_at = db.Column(db.DateTime(timezone=True), nullable=False, index=True, server_default=db.func.now(), default=precise_now(), onupdate=precise_now())
     shows = db.relationship('Show', backref='pArtist', lazy=True, cascade='all, delete')
 
     def create(self):
         db.session.add(self)
-        db.session.commit()
+        on_commit(lambda: typeahead_index.add('artist', self.id, self.name))
+        on_commit(lambda: response_cache.invalidate('artists'))
 
     def update(self):
-        db.session.update(self)
-        db.session.commit()
+        db.session.add(self)
+        on_commit(lambda: typeahead_index.add('artist', self.id, self.name))
+        on_commit(lambda: response_cache.invalidate('artists', 'shows', f'artist:{self.id}'))
 
 
 class Show(db.Model):
     __tablename__ = 'Show'
+    __table_args__ = (
+        db.Index('ix_Show_venue_id_start_time', 'venue_id', 'start_time'),
+        db.Index('ix_Show_artist_id_start_time', 'artist_id', 'start_time'),
+        db.Index('ix_Show_start_time_id', 'start_time', 'id'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     start_time = db.Column(db.DateTime, nullable=False)
+    # no two shows of a venue overlap: an exclusion constraint on Postgres
+    # (migration dcd860fc6ac0), triggers on SQLite (scheduling.py)
+    end_time = db.Column(db.DateTime, nullable=False)
     artist_id = db.Column(db.Integer, db.ForeignKey('Artist.id', ondelete='CASCADE'), nullable=False)
     venue_id = db.Column(db.Integer, db.ForeignKey('Venue.id', ondelete='CASCADE'), nullable=False)
+    updated_at = db.Column(db.DateTime(timezone=True), nullable=False, index=True, server_default=db.func.now(), default=precise_now(), onupdate=precise_now())
 
     def create(self):
         db.session.add(self)
-        db.session.commit()
\ No newline at end of file
+        on_commit(lambda: response_cache.invalidate('venues', 'artists', 'shows',
+                                                    f'venue:{self.venue_id}', f'artist:{self.artist_id}'))
+
+
+# shows starting before rolled_over_at are counted as past (see counters.py)
+class ShowCounterWatermark(db.Model):
+    __tablename__ = 'ShowCounterWatermark'
+    id = db.Column(db.Integer, primary_key=True)
+    rolled_over_at = db.Column(db.DateTime, nullable=False)
+
+
+# how far 'flask import' got in a file, committed with each chunk (see importer.py)
+class ImportCheckpoint(db.Model):
+    __tablename__ = 'ImportCheckpoint'
+    name = db.Column(db.String(), primary_key=True)
+    rows = db.Column(db.Integer, nullable=False)
+    inserted = db.Column(db.Integer, nullable=False)
+    rejected = db.Column(db.Integer, nullable=False)
@@ -0,0 +1,359 @@
+#----------------------------------------------------------------------------#
+# Read pages: the queries behind each listing and detail page, and the
+# template context built from their rows.
+#
+# The Flask views run these queries through db.session; asgi.py compiles the
+# same queries for asyncpg. Queries of one page never depend on each other's
+# results, so the async server can run them concurrently.
+#----------------------------------------------------------------------------#
+
+import datetime
+import heapq
+import itertools
+import json
+
+from sqlalchemy import String, and_, case, cast, func, or_, select, tuple_
+from sqlalchemy.dialects import postgresql
+
+from extensions import db
+import geo
+from models import Venue, Artist, Show
+
+
+#  Venues
+#  ----------------------------------------------------------------
+
+def parse_area_cursor(cursor):
+    # 'city,state' -> (city, state); raises ValueError
+    city, state = cursor.rsplit(',', 1)
+    return city, state
+
+
+def venues_query(after, per_page):
+    # distinct city and state, one extra to know whether there is a next page
+    areas = db.session.query(Venue.city, Venue.state).distinct()
+    if after:
+        areas = areas.filter(tuple_(Venue.city, Venue.state) > tuple_(*after))
+    areas = areas.order_by(Venue.city, Venue.state).limit(per_page + 1).subquery()
+
+    # only the columns venues.html uses, already ordered by area
+    return db.session.query(Venue.city, Venue.state, Venue.id, Venue.name, Venue.upcoming_shows_count,
+                            Venue.updated_at) \
+        .join(areas, and_(Venue.city == areas.c.city, Venue.state == areas.c.state)) \
+        .order_by(Venue.city, Venue.state, Venue.name)
+
+
+def venues_context(rows, per_page):
+    result = []
+    next_cursor = None
+    for (city, state), venues in itertools.groupby(rows, key=lambda row: (row.city, row.state)):
+        if len(result) == per_page:
+            last = result[-1]
+            next_cursor = f"{last['city']},{last['state']}"
+            break
+        result.append({
+            'city': city,
+            'state': state,
+            'venues': [{'id': venue.id, 'name': venue.name, 'num_upcoming_shows': venue.upcoming_shows_count,
+                        'version': venue.updated_at}
+                       for venue in venues],
+        })
+    return {'areas': result, 'next_cursor': next_cursor}
+
+
+def venue_query(venue_id):
+    # the venue's columns, counters included
+    return db.session.query(*Venue.__table__.columns).filter(Venue.id == venue_id)
+
+
+def upcoming():
+    # split at the current time, not at the counters' watermark, which only
+    # moves when 'flask counters rollover' runs; the detail pages count their
+    # own lists, and their validators change when one of their shows starts
+    return (Show.start_time >= datetime.datetime.utcnow()).label('upcoming')
+
+
+def started():
+    # how many of the rows' shows have started
+    return func.coalesce(func.sum(case([(Show.start_time < datetime.datetime.utcnow(), 1)], else_=0)), 0)
+
+
+def venue_shows_query(venue_id):
+    # every show of the venue with the artist columns the page needs
+    return db.session.query(
+        Show.artist_id,
+        Artist.name.label('artist_name'),
+        Artist.image_link.label('artist_image_link'),
+        Show.start_time,
+        upcoming(),
+    ).join(Artist, Artist.id == Show.artist_id) \
+        .filter(Show.venue_id == venue_id) \
+        .order_by(Show.start_time)
+
+
+def venue_context(venue, shows):
+    upcoming_shows = []
+    past_shows = []
+    for show in shows:
+        record = {
+            "artist_id": show.artist_id,
+            "artist_name": show.artist_name,
+            "artist_image_link": show.artist_image_link,
+            "start_time": show.start_time,
+        }
+        if show.upcoming:
+            upcoming_shows.append(record)
+        else:
+            past_shows.append(record)
+
+    return {'venue': {
+        "id": venue.id,
+        "name": venue.name,
+        "genres": venue.genres,
+        "address": venue.address,
+        "city": venue.city,
+        "state": venue.state,
+        "phone": venue.phone,
+        "website": venue.website,
+        "facebook_link": venue.facebook_link,
+        "seeking_talent": venue.seeking_talent,
+        "seeking_description": venue.seeking_description,
+        "image_link": venue.image_link,
+        "timezone": venue.timezone,
+        "past_shows": past_shows,
+        "upcoming_shows": upcoming_shows,
+        "past_shows_count": len(past_shows),
+        "upcoming_shows_count": len(upcoming_shows),
+    }}
+
+
+#  Nearby venues
+#  ----------------------------------------------------------------
+
+def has_genre(column, genre):
+    # genres @> ARRAY[genre] can use the GIN index; on SQLite genres is JSON text
+    if db.engine.dialect.name == 'postgresql':
+        return column.op('@>')(cast(postgresql.array([genre]), postgresql.ARRAY(String)))
+    needle = json.dumps(genre).replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return cast(column, String).like(f'%{needle}%', escape='\\')
+
+
+def near_query(latitude, longitude, km, seeking_talent=None, genre=None):
+    # the venues of the grid cells around the point: a range of the geo_cell
+    # index for each row of cells
+    cells = or_(*(Venue.geo_cell.between(first, last) for first, last in geo.cell_ranges(latitude, longitude, km)))
+    query = db.session.query(Venue.id, Venue.name, Venue.city, Venue.state, Venue.address, Venue.genres,
+                             Venue.seeking_talent, Venue.image_link, Venue.latitude, Venue.longitude) \
+        .filter(cells)
+    if seeking_talent is not None:
+        query = query.filter(Venue.seeking_talent == seeking_talent)
+    if genre:
+        query = query.filter(has_genre(Venue.genres, genre))
+    return query
+
+
+def near_context(rows, latitude, longitude, km, limit):
+    # the cells reach past the circle: keep the venues really within km
+    distances = ((geo.distance_km(latitude, longitude, row.latitude, row.longitude), row) for row in rows)
+    nearest = heapq.nsmallest(limit, ((distance, row) for distance, row in distances if distance <= km),
+                              key=lambda item: item[0])
+    return {'latitude': latitude, 'longitude': longitude, 'km': km, 'venues': [{
+        "id": row.id,
+        "name": row.name,
+        "city": row.city,
+        "state": row.state,
+        "address": row.address,
+        "genres": row.genres,
+        "seeking_talent": row.seeking_talent,
+        "image_link": row.image_link,
+        "latitude": row.latitude,
+        "longitude": row.longitude,
+        "distance_km": round(distance, 2),
+    } for distance, row in nearest]}
+
+
+#  Artists
+#  ----------------------------------------------------------------
+
+def artists_query():
+    return db.session.query(Artist.id, Artist.name, Artist.upcoming_shows_count, Artist.updated_at) \
+        .order_by(Artist.name)
+
+
+def artists_context(rows):
+    # a generator, so a streamed page renders the rows as they are fetched
+    return {'artists': ({"id": artist.id, "name": artist.name, "num_upcoming_shows": artist.upcoming_shows_count,
+                         "version": artist.updated_at}
+                        for artist in rows)}
+
+
+def artist_query(artist_id):
+    return db.session.query(*Artist.__table__.columns).filter(Artist.id == artist_id)
+
+
+def artist_shows_query(artist_id):
+    return db.session.query(
+        Show.venue_id,
+        Venue.name.label('venue_name'),
+        Venue.image_link.label('venue_image_link'),
+        Venue.timezone.label('venue_timezone'),
+        Show.start_time,
+        upcoming(),
+    ).join(Venue, Venue.id == Show.venue_id) \
+        .filter(Show.artist_id == artist_id) \
+        .order_by(Show.start_time)
+
+
+def artist_context(artist, shows):
+    past_shows = []
+    upcoming_shows = []
+    for show in shows:
+        record = {
+            "venue_id": show.venue_id,
+            "venue_name": show.venue_name,
+            "venue_image_link": show.venue_image_link,
+            "venue_timezone": show.venue_timezone,
+            "start_time": show.start_time
+        }
+        if show.upcoming:
+            upcoming_shows.append(record)
+        else:
+            past_shows.append(record)
+
+    return {'artist': {
+        "id": artist.id,
+        "name": artist.name,
+        "genres": artist.genres,
+        "city": artist.city,
+        "state": artist.state,
+        "phone": artist.phone,
+        "website": artist.website,
+        "facebook_link": artist.facebook_link,
+        "seeking_venue": artist.seeking_venue,
+        "seeking_description": artist.seeking_description,
+        "image_link": artist.image_link,
+        "past_shows": past_shows,
+        "upcoming_shows": upcoming_shows,
+        "past_shows_count": len(past_shows),
+        "upcoming_shows_count": len(upcoming_shows),
+    }}
+
+
+#  Shows
+#  ----------------------------------------------------------------
+
+def parse_show_cursor(cursor):
+    # 'start_time,id' -> (datetime, int); raises ValueError
+    after_time, after_id = cursor.rsplit(',', 1)
+    return datetime.datetime.fromisoformat(after_time), int(after_id)
+
+
+def shows_query(after, per_page):
+    # pages are keyed on (start_time, id) so the cost of a page does not
+    # depend on how far into the listing it is
+    query = db.session.query(
+        Show.id,
+        Show.start_time,
+        Show.venue_id,
+        Venue.name.label('venue_name'),
+        Venue.timezone.label('venue_timezone'),
+        Show.artist_id,
+        Artist.name.label('artist_name'),
+        Artist.image_link.label('artist_image_link'),
+        Show.updated_at,
+        Venue.updated_at.label('venue_updated_at'),
+        Artist.updated_at.label('artist_updated_at'),
+    ).join(Venue, Venue.id == Show.venue_id) \
+        .join(Artist, Artist.id == Show.artist_id)
+    if after:
+        query = query.filter(tuple_(Show.start_time, Show.id) > tuple_(*after))
+    # one extra row tells us whether there is a next page
+    return query.order_by(Show.start_time, Show.id).limit(per_page + 1)
+
+
+def shows_context(rows, per_page):
+    data = []
+    for show in rows[:per_page]:
+        data.append({
+            "id": show.id,
+            "version": max(show.updated_at, show.venue_updated_at, show.artist_updated_at),
+            "venue_id": show.venue_id,
+            "venue_name": show.venue_name,
+            "artist_id": show.artist_id,
+            "artist_name": show.artist_name,
+            "artist_image_link": show.artist_image_link,
+            "venue_timezone": show.venue_timezone,
+            "start_time": show.start_time
+        })
+
+    next_cursor = None
+    if len(rows) > per_page:
+        last = rows[per_page - 1]
+        next_cursor = f'{last.start_time.isoformat()},{last.id}'
+    return {'shows': data, 'next_cursor': next_cursor}
+
+
+#  Search
+#  ----------------------------------------------------------------
+
+def search_context(search_term, count, rows, page, per_page):
+    return {'search_term': search_term, 'results': {
+        "count": count,
+        "data": [{"id": row.id, "name": row.name} for row in rows],
+        "page": page,
+        "has_next": page * per_page < count,
+    }}
+
+
+#  Validators for conditional GET: (last modified, version), one query each
+#  ----------------------------------------------------------------
+
+def latest(*values):
+    values = [value for value in values if value is not None]
+    return max(values) if values else None
+
+
+def venues_validator():
+    row = db.session.query(func.max(Venue.updated_at), func.count(Venue.id)).one()
+    return row[0], row[1]
+
+
+def artists_validator():
+    row = db.session.query(func.max(Artist.updated_at), func.count(Artist.id)).one()
+    return row[0], row[1]
+
+
+def shows_validator():
+    row = db.session.query(
+        select([func.max(Show.updated_at)]).as_scalar(),
+        select([func.max(Venue.updated_at)]).as_scalar(),
+        select([func.max(Artist.updated_at)]).as_scalar(),
+        select([func.count(Show.id)]).as_scalar(),
+      ).one()
+    return latest(row[0], row[1], row[2]), row[3]
+
+
+def show_venue_validator(venue_id):
+    row = db.session.query(
+        Venue.updated_at, func.max(Show.updated_at), func.max(Artist.updated_at), func.count(Show.id), started(),
+      ).outerjoin(Show, Show.venue_id == Venue.id) \
+      .outerjoin(Artist, Artist.id == Show.artist_id) \
+      .filter(Venue.id == venue_id) \
+      .group_by(Venue.id) \
+      .first()
+    if row is None:
+      return None
+    return latest(row[0], row[1], row[2]), (row[3], row[4])
+
+
+def show_artist_validator(artist_id):
+    row = db.session.query(
+        Artist.updated_at, func.max(Show.updated_at), func.max(Venue.updated_at), func.count(Show.id), started(),
+      ).outerjoin(Show, Show.artist_id == Artist.id) \
+      .outerjoin(Venue, Venue.id == Show.venue_id) \
+      .filter(Artist.id == artist_id) \
+      .group_by(Artist.id) \
+      .first()
+    if row is None:
+      return None
+    return latest(row[0], row[1], row[2]), (row[3], row[4])
@@ -0,0 +1,151 @@
+#----------------------------------------------------------------------------#
+# Read replicas.
+#
+#   REPLICA_DATABASE_URLS=postgresql://replica1/fyyur,postgresql://replica2/fyyur
+#
+# Each replica is a bind of its own (SQLALCHEMY_BINDS 'replica0', 'replica1',
+# ...). A GET or HEAD request reads from one healthy replica, picked at its
+# first query; everything else goes to the primary: other methods, flushes,
+# a session once it has written, and work outside a request (commands,
+# before_first_request). A client that has just written (any non-GET request)
+# reads from the primary for REPLICA_STICKY_SECONDS afterwards, so it sees
+# its own writes whatever the replicas' lag.
+#
+# A replica is pinged before it is used at most every REPLICA_CHECK_SECONDS;
+# one that fails the ping or drops a connection is left out for
+# REPLICA_RETRY_SECONDS, and with no healthy replica the primary serves the
+# reads.
+#
+# The response cache stores what was read: a page read from a lagging
+# replica is served until its tags are invalidated or its TTL passes, so the
+# lag a cached page can show is bounded by CACHE_DEFAULT_TTL, not by the
+# replica.
+#
+# tests/test_routing.py runs a primary and a replica as two SQLite files.
+#----------------------------------------------------------------------------#
+
+import random
+import threading
+import time
+
+from flask import current_app, has_request_context, request, session
+from flask_sqlalchemy import SQLAlchemy, SignallingSession
+from sqlalchemy import event, orm, text
+
+from dbpool import pool_stats
+
+STICKY_KEY = '_primary_until'
+
+
+class Replica:
+
+    def __init__(self, key):
+        self.key = key
+        self.lock = threading.Lock()
+        self.checked_at = 0.0
+        self.down_until = 0.0
+        self.failures = 0
+
+    def mark_down(self, retry_seconds):
+        with self.lock:
+            self.down_until = time.monotonic() + retry_seconds
+            self.failures += 1
+
+    def healthy(self, engine, config):
+        now = time.monotonic()
+        with self.lock:
+            if now < self.down_until:
+                return False
+            if now - self.checked_at < config['REPLICA_CHECK_SECONDS']:
+                return True
+            self.checked_at = now
+        try:
+            with engine.connect() as connection:
+                connection.execute(text('SELECT 1'))
+        except Exception:
+            self.mark_down(config['REPLICA_RETRY_SECONDS'])
+            return False
+        return True
+
+
+class RoutingSession(SignallingSession):
+
+    def __init__(self, db, **options):
+        self.db = db
+        super().__init__(db, **options)
+
+    def get_bind(self, mapper=None, clause=None):
+        if self.reads_from_primary():
+            return super().get_bind(mapper, clause)
+        if 'replica' not in self.info:
+            self.info['replica'] = self.db.pick_replica(self.app)
+        engine = self.info['replica']
+        return engine if engine is not None else super().get_bind(mapper, clause)
+
+    def reads_from_primary(self):
+        if self._flushing or self.info.get('wrote') or not has_request_context():
+            return True
+        if request.method not in ('GET', 'HEAD'):
+            return True
+        return session.get(STICKY_KEY, 0) > time.time()
+
+
+class RoutingSQLAlchemy(SQLAlchemy):
+
+    def __init__(self, app=None, **kwargs):
+        self.replicas = {}
+        super().__init__(app, **kwargs)
+
+    def init_app(self, app):
+        super().init_app(app)
+        # one app per process: a new app (e.g. in the tests) starts afresh
+        self.replicas = {key: Replica(key) for key in app.config.get('SQLALCHEMY_BINDS') or ()
+                         if key.startswith('replica')}
+        if self.replicas:
+            app.after_request(remember_write)
+
+    def create_session(self, options):
+        return orm.sessionmaker(class_=RoutingSession, db=self, **options)
+
+    def create_scoped_session(self, options=None):
+        scoped = super().create_scoped_session(options)
+        # a session that has flushed keeps reading from the primary
+        event.listen(scoped, 'after_flush', lambda session, context: session.info.update(wrote=True))
+        return scoped
+
+    def replica_engine(self, app, key):
+        engine = self.get_engine(app, bind=key)
+        if not getattr(engine, 'replica_events', False):
+            engine.replica_events = True
+            replica = self.replicas[key]
+
+            @event.listens_for(engine, 'handle_error')
+            def on_error(context):
+                if context.is_disconnect:
+                    replica.mark_down(app.config['REPLICA_RETRY_SECONDS'])
+        return engine
+
+    def pick_replica(self, app):
+        # a healthy replica's engine, or None for the primary
+        keys = list(self.replicas)
+        random.shuffle(keys)
+        for key in keys:
+            engine = self.replica_engine(app, key)
+            if self.replicas[key].healthy(engine, app.config):
+                return engine
+        return None
+
+
+def remember_write(response):
+    if request.method not in ('GET', 'HEAD', 'OPTIONS'):
+        session[STICKY_KEY] = time.time() + current_app.config['REPLICA_STICKY_SECONDS']
+    return response
+
+
+def replica_stats(db):
+    stats = {}
+    now = time.monotonic()
+    for key, replica in db.replicas.items():
+        stats[key] = dict(pool_stats(db.get_engine(current_app, bind=key)),
+                          healthy=now >= replica.down_until, failures=replica.failures)
+    return stats
@@ -0,0 +1,207 @@
+#----------------------------------------------------------------------------#
+# Show scheduling: overlap checks, venue availability, and bulk and recurring
+# scheduling (/shows/bulk).
+#
+# A show runs from start_time to end_time and two shows of one venue must not
+# overlap. Postgres refuses overlaps with an exclusion constraint on
+# (venue_id, tsrange(start_time, end_time)); SQLite with the triggers below.
+# Shows last at most SHOW_MAX_MINUTES, so the shows overlapping a window are
+# found with a bounded range of the (venue_id, start_time) index.
+#
+# A bulk batch is either a list of shows, one 'artist_id, venue_id,
+# start_time[, minutes]' per line, or a recurrence: one artist at one venue,
+# weekly for N weeks on the given weekdays. Every artist and venue id of the
+# batch is checked with one IN query per table, and every clash with a show
+# already booked with one range query more. The rows that pass are inserted
+# with a single multi-row INSERT and committed together; the others are
+# reported back with the reason.
+#
+# Show times are entered in the venue's local time and stored in UTC:
+# to_utc() converts rows before they are checked.
+#----------------------------------------------------------------------------#
+
+import datetime
+
+from flask import current_app
+from sqlalchemy import or_, text
+
+from extensions import db
+from cache import response_cache
+import counters
+import formatting
+from models import Venue, Artist, Show
+from transaction import on_commit
+
+
+#  Overlaps
+#  ----------------------------------------------------------------
+
+def longest_show():
+    return datetime.timedelta(minutes=current_app.config['SHOW_MAX_MINUTES'])
+
+
+def overlapping(column, id, start, end):
+    # the shows of one venue (Show.venue_id) or artist overlapping [start, end)
+    return db.session.query(Show.id, Show.start_time, Show.end_time) \
+        .filter(column == id,
+                Show.start_time > start - longest_show(),
+                Show.start_time < end,
+                Show.end_time > start)
+
+
+def availability(venue_id, start, end):
+    # (busy shows, free (start, end) slots) of the venue within [start, end)
+    busy = overlapping(Show.venue_id, venue_id, start, end).order_by(Show.start_time).all()
+    free = []
+    cursor = start
+    for show in busy:
+        if show.start_time > cursor:
+            free.append((cursor, show.start_time))
+        cursor = max(cursor, show.end_time)
+    if cursor < end:
+        free.append((cursor, end))
+    return busy, free
+
+
+def install_sqlite_triggers(engine, max_minutes):
+    # Postgres has the exclusion constraint instead
+    overlap = f'''
+        SELECT 1 FROM "Show"
+        WHERE venue_id = NEW.venue_id
+          AND start_time > datetime(NEW.start_time, '-{int(max_minutes)} minutes')
+          AND start_time < NEW.end_time AND end_time > NEW.start_time'''
+    with engine.begin() as connection:
+        for event, condition in (('INSERT', overlap), ('UPDATE', overlap + ' AND id != NEW.id')):
+            connection.execute(text(f'''
+                CREATE TRIGGER IF NOT EXISTS show_overlap_{event.lower()} BEFORE {event} ON "Show"
+                WHEN EXISTS ({condition})
+                BEGIN
+                  SELECT RAISE(ABORT, 'venue already has a show at that time');
+                END'''))
+
+
+#  Batches
+#  ----------------------------------------------------------------
+#  Rows are dicts of artist_id, venue_id, start_time and end_time, with
+#  'line' and 'text' for the report and 'error' set when the row cannot be
+#  scheduled.
+
+def parse_lines(text, minutes):
+    rows = []
+    for number, line in enumerate(text.splitlines(), 1):
+        if not line.strip():
+            continue
+        row = {'line': number, 'text': line.strip(), 'error': None}
+        try:
+            parts = [part.strip() for part in line.split(',')]
+            if len(parts) not in (3, 4):
+                raise ValueError(line)
+            start_time = datetime.datetime.fromisoformat(parts[2])
+            length = int(parts[3]) if len(parts) == 4 else minutes
+            row.update(artist_id=int(parts[0]), venue_id=int(parts[1]), start_time=start_time,
+                       end_time=start_time + datetime.timedelta(minutes=length))
+        except ValueError:
+            row['error'] = 'expected artist_id, venue_id, YYYY-MM-DD HH:MM and optionally minutes'
+        else:
+            if not 0 < length <= current_app.config['SHOW_MAX_MINUTES']:
+                row['error'] = f'a show lasts 1 to {current_app.config["SHOW_MAX_MINUTES"]} minutes'
+        rows.append(row)
+    return rows
+
+
+def recurring(artist_id, venue_id, start_time, minutes, weeks, weekdays):
+    # every selected weekday of the weeks starting with start_time's day, at
+    # start_time's time; start_time's own weekday when none are selected
+    weekdays = set(weekdays) or {start_time.weekday()}
+    length = datetime.timedelta(minutes=minutes)
+    rows = []
+    for day in range(weeks * 7):
+        when = start_time + datetime.timedelta(days=day)
+        if when.weekday() in weekdays:
+            rows.append({'line': len(rows) + 1, 'text': f'{artist_id}, {venue_id}, {when:%Y-%m-%d %H:%M}',
+                         'error': None, 'artist_id': artist_id, 'venue_id': venue_id,
+                         'start_time': when, 'end_time': when + length})
+    return rows
+
+
+def local_timezone(name):
+    # a venue's timezone, BABEL_DEFAULT_TIMEZONE for a venue without one
+    return name or current_app.config['BABEL_DEFAULT_TIMEZONE']
+
+
+def to_utc(rows):
+    # converts the rows' times from their venue's local time; the length of a
+    # show is kept, across a DST change too
+    venue_ids = {row['venue_id'] for row in rows if row['error'] is None}
+    zones = dict(db.session.query(Venue.id, Venue.timezone).filter(Venue.id.in_(venue_ids))) if venue_ids else {}
+    for row in rows:
+        if row['error'] is None:
+            start_time = formatting.to_utc(row['start_time'], local_timezone(zones.get(row['venue_id'])))
+            row['end_time'] = start_time + (row['end_time'] - row['start_time'])
+            row['start_time'] = start_time
+    return rows
+
+
+def overlaps(bookings, start, end):
+    return any(booked_start < end and start < booked_end for booked_start, booked_end in bookings)
+
+
+def check(rows):
+    # sets 'error' on the rows that cannot be scheduled
+    candidates = [row for row in rows if row['error'] is None]
+    if not candidates:
+        return rows
+    artist_ids = {row['artist_id'] for row in candidates}
+    venue_ids = {row['venue_id'] for row in candidates}
+    first = min(row['start_time'] for row in candidates)
+    last = max(row['end_time'] for row in candidates)
+
+    artists = {id for id, in db.session.query(Artist.id).filter(Artist.id.in_(artist_ids))}
+    venues = {id for id, in db.session.query(Venue.id).filter(Venue.id.in_(venue_ids))}
+
+    # what the venues and artists have booked over the batch's span, and then
+    # the rows of this batch as they are accepted
+    booked_venues, booked_artists = {}, {}
+    for venue_id, artist_id, start_time, end_time in \
+            db.session.query(Show.venue_id, Show.artist_id, Show.start_time, Show.end_time) \
+            .filter(or_(Show.venue_id.in_(venue_ids), Show.artist_id.in_(artist_ids))) \
+            .filter(Show.start_time > first - longest_show(), Show.start_time < last, Show.end_time > first):
+        booked_venues.setdefault(venue_id, []).append((start_time, end_time))
+        booked_artists.setdefault(artist_id, []).append((start_time, end_time))
+
+    for row in candidates:
+        span = (row['start_time'], row['end_time'])
+        if row['artist_id'] not in artists:
+            row['error'] = f'artist {row["artist_id"]} does not exist'
+        elif row['venue_id'] not in venues:
+            row['error'] = f'venue {row["venue_id"]} does not exist'
+        elif overlaps(booked_venues.get(row['venue_id'], ()), *span):
+            row['error'] = f'venue {row["venue_id"]} already has a show at that time'
+        elif overlaps(booked_artists.get(row['artist_id'], ()), *span):
+            row['error'] = f'artist {row["artist_id"]} already has a show at that time'
+        else:
+            booked_venues.setdefault(row['venue_id'], []).append(span)
+            booked_artists.setdefault(row['artist_id'], []).append(span)
+    return rows
+
+
+#  Inserting
+#  ----------------------------------------------------------------
+
+def schedule(rows):
+    # inserts the rows that passed check() in one statement, committed by the
+    # caller's transaction.atomic; returns how many were inserted
+    records = [{'artist_id': row['artist_id'], 'venue_id': row['venue_id'],
+                'start_time': row['start_time'], 'end_time': row['end_time']}
+               for row in rows if row['error'] is None]
+    if not records:
+        return 0
+    connection = db.session.connection()
+    connection.execute(Show.__table__.insert().values(records))
+    # a Core insert bypasses the flush events that keep the counters
+    counters.count_shows(connection, [(record['venue_id'], record['artist_id'], record['start_time'])
+                                      for record in records])
+    on_commit(lambda: response_cache.invalidate('venues', 'artists', 'shows',
+                                                *{f'venue:{record["venue_id"]}' for record in records},
+                                                *{f'artist:{record["artist_id"]}' for record in records}))
+    return len(records)
@@ -0,0 +1,124 @@
+#----------------------------------------------------------------------------#
+# Venue and artist search.
+#
+# On Postgres every term is matched against a search document made of the
+# name, city, state and genres, backed by a pg_trgm GIN index on
+# fyyur_search_document() (see migration d097ffc6917a), and results are
+# ranked by trigram word similarity.
+# On SQLite the same search runs against FTS5 tables kept in sync by triggers.
+#----------------------------------------------------------------------------#
+
+import re
+from sqlalchemy import func, text
+from extensions import db
+
+
+def tokenize(term):
+    # "San Francisco, CA" -> ['San', 'Francisco', 'CA']
+    return [token for token in re.split(r'\W+', term or '') if token]
+
+
+def search(model, term, page=1, per_page=20):
+    # returns (total count, one page of (id, name) rows ordered by relevance)
+    page = max(page, 1)
+    if db.engine.dialect.name == 'sqlite':
+        return _search_fts5(model, term, page, per_page)
+    return _search_trigram(model, term, page, per_page)
+
+
+#  Postgres
+#  ----------------------------------------------------------------
+
+def search_document(model):
+    # must stay identical to the indexed expression for the index to be used
+    return func.fyyur_search_document(model.name, model.city, model.state, model.genres)
+
+
+def _escape_like(token):
+    return token.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def trigram_queries(model, term, page, per_page):
+    # (count query, page query); asyncpg runs these too, see asgi.py
+    document = search_document(model)
+    query = db.session.query(model.id, model.name)
+
+    tokens = tokenize(term)
+    # every token has to appear somewhere in the document; each ILIKE is
+    # answered by the trigram index
+    for token in tokens:
+        query = query.filter(document.ilike(f'%{_escape_like(token)}%'))
+
+    count = query.with_entities(func.count(model.id))
+    if tokens:
+        query = query.order_by(func.word_similarity(' '.join(tokens), document).desc(), model.name, model.id)
+    else:
+        query = query.order_by(model.name, model.id)
+    return count, query.limit(per_page).offset((page - 1) * per_page)
+
+
+def _search_trigram(model, term, page, per_page):
+    count, rows = trigram_queries(model, term, page, per_page)
+    return count.scalar(), rows.all()
+
+
+#  SQLite
+#  ----------------------------------------------------------------
+
+def fts_table(model):
+    return model.__tablename__.lower() + '_search'
+
+
+def install_sqlite_fts(engine, models):
+    # external-content FTS5 tables over the model tables, plus the triggers
+    # that keep them in sync; safe to run on every startup
+    with engine.begin() as connection:
+        for model in models:
+            table = model.__tablename__
+            fts = fts_table(model)
+            exists = connection.execute(
+                text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+                name=fts).first()
+            if exists:
+                continue
+            columns = 'name, city, state, genres'
+            new_values = 'new.name, new.city, new.state, new.genres'
+            old_values = 'old.name, old.city, old.state, old.genres'
+            connection.execute(
+                f"CREATE VIRTUAL TABLE {fts} USING fts5({columns}, "
+                f"content='{table}', content_rowid='id')")
+            connection.execute(
+                f'CREATE TRIGGER {fts}_ai AFTER INSERT ON "{table}" BEGIN '
+                f'INSERT INTO {fts}(rowid, {columns}) VALUES (new.id, {new_values}); END')
+            connection.execute(
+                f'CREATE TRIGGER {fts}_ad AFTER DELETE ON "{table}" BEGIN '
+                f"INSERT INTO {fts}({fts}, rowid, {columns}) VALUES ('delete', old.id, {old_values}); END")
+            connection.execute(
+                f'CREATE TRIGGER {fts}_au AFTER UPDATE ON "{table}" BEGIN '
+                f"INSERT INTO {fts}({fts}, rowid, {columns}) VALUES ('delete', old.id, {old_values}); "
+                f'INSERT INTO {fts}(rowid, {columns}) VALUES (new.id, {new_values}); END')
+            # index rows that were there before the table existed
+            connection.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+
+
+def _search_fts5(model, term, page, per_page):
+    tokens = tokenize(term)
+    if not tokens:
+        query = db.session.query(model.id, model.name)
+        rows = query.order_by(model.name, model.id).limit(per_page).offset((page - 1) * per_page).all()
+        return query.count(), rows
+
+    fts = fts_table(model)
+    table = model.__tablename__
+    # prefix match on every token, implicitly AND-ed
+    match = ' '.join('"{}"*'.format(token.replace('"', '""')) for token in tokens)
+
+    count = db.session.execute(
+        text(f'SELECT count(*) FROM {fts} WHERE {fts} MATCH :match'),
+        {'match': match}).scalar()
+    rows = db.session.execute(
+        text(f'SELECT t.id, t.name FROM {fts} JOIN "{table}" t ON t.id = {fts}.rowid '
+             f'WHERE {fts} MATCH :match ORDER BY bm25({fts}), t.name, t.id '
+             f'LIMIT :limit OFFSET :offset'),
+        {'match': match, 'limit': per_page, 'offset': (page - 1) * per_page}).fetchall()
+    return count, rows
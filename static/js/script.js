@@ -2,3 +2,31 @@ window.parseISOString = function parseISOString(s) {
   var b = s.split(/\D+/);
   return new Date(Date.UTC(b[0], --b[1], b[2], b[3], b[4], b[5], b[6]));
 };
+
+// search box suggestions from /api/typeahead
+document.addEventListener('DOMContentLoaded', function(){
+  var input = document.querySelector('input[data-typeahead]');
+  var list = document.getElementById('typeahead-results');
+  if (!input || !list) return;
+  var last = '';
+  input.addEventListener('input', function(){
+    var q = input.value.trim();
+    if (q === last) return;
+    last = q;
+    if (!q) { list.innerHTML = ''; return; }
+    fetch('/api/typeahead?type=' + input.dataset.typeahead + '&q=' + encodeURIComponent(q))
+    .then(function(response){ return response.json(); })
+    .then(function(body){
+      if (q !== last) return;
+      list.innerHTML = '';
+      body.results.forEach(function(result){
+        var option = document.createElement('option');
+        option.value = result.name;
+        list.appendChild(option);
+      });
+    })
+    .catch(function(e){
+      console.error(e);
+    });
+  });
+});
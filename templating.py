@@ -0,0 +1,124 @@
+#----------------------------------------------------------------------------#
+# Template compilation and fragment caching.
+#
+# Compiled templates are kept in a bytecode cache at TEMPLATE_CACHE_PATH,
+# shared by every worker of the host, so a worker that boots loads them
+# instead of compiling them again. Outside development TEMPLATES_AUTO_RELOAD
+# is off and a template, once loaded, is not checked for changes.
+#
+# {% cache 'venue-tile', venue.id, venue.version %} ... {% endcache %} stores
+# what its body renders under the key made of its arguments (and the page
+# locale, see response_cache.vary) and renders it from there next time. The
+# arguments must identify everything the body shows: the listings key their
+# tiles by entity id and a version, the latest updated_at of the rows the
+# tile is made of, so an edited tile gets a new key and old ones age out.
+#
+# render_streamed() sends a page while it renders, STREAM_BUFFER_BYTES at a
+# time, so the head of the layout (with the stylesheet and script links)
+# leaves before the rows are through. Views start their query before they
+# return, so a failing query is still a 500 page; the rows are then fetched
+# (yield_per) and rendered as the response is sent. A page with flashed
+# messages is rendered whole: the messages are removed from the session
+# cookie, which is sent before a streamed body.
+#----------------------------------------------------------------------------#
+
+import os
+
+from flask import current_app, render_template, session, stream_with_context
+from jinja2 import FileSystemBytecodeCache, nodes
+from jinja2.ext import Extension
+from markupsafe import Markup
+
+from cache import make_backend, response_cache
+
+
+class FragmentCache:
+
+    def __init__(self):
+        self.backend = None
+        self.ttl = 3600
+        self.hits = 0
+        self.misses = 0
+
+    def init_app(self, app):
+        self.ttl = app.config.get('FRAGMENT_CACHE_TTL', 3600)
+        self.backend = make_backend(app.config.get('FRAGMENT_CACHE_BACKEND', 'memory'),
+                                    os.path.join(app.instance_path, 'fragments.sqlite'),
+                                    app.config.get('FRAGMENT_CACHE_MAX_ENTRIES', 10000))
+
+    def render(self, parts, body):
+        if self.backend is None:
+            return body()
+        key = 'fragment:' + ':'.join(str(part) for part in parts)
+        if response_cache.variant is not None:
+            key += '|' + response_cache.variant()
+        html = self.backend.get(key)
+        if html is not None:
+            self.hits += 1
+            return Markup(html)
+        self.misses += 1
+        html = body()
+        self.backend.set(key, str(html), self.ttl)
+        return html
+
+    def stats(self):
+        return {
+            'backend': type(self.backend).__name__ if self.backend is not None else None,
+            'entries': len(self.backend) if self.backend is not None else 0,
+            'hits': self.hits,
+            'misses': self.misses,
+        }
+
+
+fragment_cache = FragmentCache()
+
+
+class FragmentCacheExtension(Extension):
+    tags = {'cache'}
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        parts = [parser.parse_expression()]
+        while parser.stream.skip_if('comma'):
+            parts.append(parser.parse_expression())
+        body = parser.parse_statements(['name:endcache'], drop_needle=True)
+        return nodes.CallBlock(self.call_method('_render', [nodes.List(parts)]), [], [], body).set_lineno(lineno)
+
+    def _render(self, parts, caller):
+        return fragment_cache.render(parts, caller)
+
+
+#  Streaming
+#  ----------------------------------------------------------------
+
+def buffered(chunks, size):
+    buffer, buffered_size = [], 0
+    for chunk in chunks:
+        buffer.append(chunk)
+        buffered_size += len(chunk)
+        if buffered_size >= size:
+            yield ''.join(buffer)
+            buffer, buffered_size = [], 0
+    if buffer:
+        yield ''.join(buffer)
+
+
+def render_streamed(template_name, **context):
+    if session.get('_flashes'):
+        return render_template(template_name, **context)
+    app = current_app._get_current_object()
+    app.update_template_context(context)
+    template = app.jinja_env.get_template(template_name)
+    chunks = buffered(template.generate(context), app.config['STREAM_BUFFER_BYTES'])
+    return app.response_class(stream_with_context(chunks), mimetype='text/html')
+
+
+def init_app(app):
+    env = app.jinja_env
+    env.auto_reload = app.config['TEMPLATES_AUTO_RELOAD']
+    path = app.config.get('TEMPLATE_CACHE_PATH')
+    if path:
+        os.makedirs(path, exist_ok=True)
+        env.bytecode_cache = FileSystemBytecodeCache(path)
+    env.add_extension(FragmentCacheExtension)
+    fragment_cache.init_app(app)
@@ -0,0 +1,93 @@
+#----------------------------------------------------------------------------#
+# Test fixtures.
+#
+#   python -m pytest tests
+#
+# Every test gets an app of its own on a fresh SQLite file (with the tables,
+# triggers and counters that prepare_sqlite sets up), caching off and CSRF
+# off. The working directory is the test's temporary one, so error.log and
+# the like are written there.
+#----------------------------------------------------------------------------#
+
+import os
+import types
+
+import pytest
+
+os.environ.setdefault('SECRET_KEY', 'tests')
+
+import config
+from app import create_app
+from extensions import db
+from models import Venue, Artist
+import views
+
+
+def make_config(path, **overrides):
+    settings = {name: getattr(config, name) for name in dir(config) if name.isupper()}
+    settings.update(
+        SQLALCHEMY_DATABASE_URI=f'sqlite:///{path / "fyyur.db"}',
+        SQLALCHEMY_ENGINE_OPTIONS={},
+        SQLALCHEMY_BINDS={},
+        CACHE_BACKEND=None,
+        FRAGMENT_CACHE_BACKEND=None,
+        WTF_CSRF_ENABLED=False,
+        TESTING=True,
+    )
+    settings.update(overrides)
+    return types.SimpleNamespace(**settings)
+
+
+@pytest.fixture
+def make_app(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    apps = []
+
+    def make(**overrides):
+        app = create_app(make_config(tmp_path, **overrides))
+        with app.app_context():
+            views.prepare_sqlite()
+        apps.append(app)
+        return app
+
+    yield make
+    for app in apps:
+        with app.app_context():
+            db.session.remove()
+            db.get_engine(app).dispose()
+
+
+@pytest.fixture
+def app(make_app):
+    app = make_app()
+    with app.app_context():
+        yield app
+        db.session.remove()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def add_venue(app):
+    def add(**fields):
+        venue = Venue(**dict({'name': 'The Musical Hop', 'city': 'San Francisco', 'state': 'CA',
+                              'address': '1015 Folsom Street', 'genres': ['Jazz']}, **fields))
+        db.session.add(venue)
+        db.session.commit()
+        return venue.id
+    return add
+
+
+@pytest.fixture
+def add_artist(app):
+    def add(**fields):
+        artist = Artist(**dict({'name': 'Guns N Petals', 'city': 'San Francisco', 'state': 'CA',
+                                'genres': ['Rock n Roll'], 'facebook_link': 'https://www.facebook.com/x'},
+                               **fields))
+        db.session.add(artist)
+        db.session.commit()
+        return artist.id
+    return add
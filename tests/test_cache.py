@@ -0,0 +1,25 @@
+def test_stats_of_an_empty_response_cache(make_app):
+    app = make_app(CACHE_BACKEND='memory')
+
+    stats = app.test_client().get('/internal/cache').get_json()
+    assert stats['backend'] == 'MemoryBackend'
+    assert stats['entries'] == 0
+
+
+def test_stats_count_cached_pages(make_app):
+    app = make_app(CACHE_BACKEND='memory')
+    client = app.test_client()
+
+    client.get('/venues')
+    client.get('/venues')
+    stats = client.get('/internal/cache').get_json()
+    assert stats['entries'] == 1
+    assert stats['hits'] == 1
+
+
+def test_stats_of_an_empty_fragment_cache(make_app):
+    app = make_app(FRAGMENT_CACHE_BACKEND='memory')
+
+    stats = app.test_client().get('/internal/cache').get_json()['fragments']
+    assert stats['backend'] == 'MemoryBackend'
+    assert stats['entries'] == 0
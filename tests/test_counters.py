@@ -0,0 +1,57 @@
+import datetime
+
+import pytest
+from sqlalchemy.exc import IntegrityError
+
+from extensions import db
+from models import Show, ShowCounterWatermark
+import pages
+
+
+def add_show(venue_id, artist_id, start_time):
+    db.session.add(Show(venue_id=venue_id, artist_id=artist_id, start_time=start_time,
+                        end_time=start_time + datetime.timedelta(hours=1)))
+    db.session.commit()
+
+
+def test_sqlite_enforces_foreign_keys(app, add_venue):
+    venue_id = add_venue()
+    with pytest.raises(IntegrityError):
+        add_show(venue_id, 99, datetime.datetime(2030, 1, 1, 20))
+    db.session.rollback()
+    assert db.session.query(Show).count() == 0
+
+
+def test_detail_pages_split_shows_at_the_current_time(client, add_venue, add_artist):
+    venue_id = add_venue()
+    artist_id = add_artist()
+    # a rollover is due: the watermark is a day old
+    db.session.query(ShowCounterWatermark).update(
+        {'rolled_over_at': datetime.datetime.utcnow() - datetime.timedelta(days=1)})
+    db.session.commit()
+    add_show(venue_id, artist_id, datetime.datetime.utcnow() - datetime.timedelta(hours=2))
+    add_show(venue_id, artist_id, datetime.datetime.utcnow() + datetime.timedelta(days=2))
+
+    for path in (f'/venues/{venue_id}', f'/artists/{artist_id}'):
+        page = client.get(path).get_data(as_text=True)
+        assert '1 Upcoming Show<' in page
+        assert '1 Past Show<' in page
+
+
+def test_validator_changes_when_a_show_starts(app, add_venue, add_artist, monkeypatch):
+    venue_id = add_venue()
+    artist_id = add_artist()
+    start = datetime.datetime(2030, 1, 1, 20)
+    add_show(venue_id, artist_id, start)
+
+    class Clock(datetime.datetime):
+        now = start - datetime.timedelta(minutes=1)
+
+        @classmethod
+        def utcnow(cls):
+            return cls.now
+
+    monkeypatch.setattr(pages.datetime, 'datetime', Clock)
+    before = pages.show_venue_validator(venue_id)
+    Clock.now = start + datetime.timedelta(minutes=1)
+    assert pages.show_venue_validator(venue_id) != before
@@ -0,0 +1,35 @@
+import datetime
+
+import pytest
+from werkzeug.datastructures import MultiDict
+
+from forms import BulkShowForm, ShowForm
+
+
+@pytest.mark.parametrize('form_class', [ShowForm, BulkShowForm])
+@pytest.mark.parametrize('value', ['2030-01-01 20:00', '2030-01-01 20:00:00'])
+def test_start_time_takes_both_formats(app, form_class, value):
+    form = form_class(formdata=MultiDict({'start_time': value, 'artist_id': '1', 'venue_id': '1',
+                                          'duration': '60'}), meta={'csrf': False})
+    assert form.validate(), form.errors
+    assert form.start_time.data == datetime.datetime(2030, 1, 1, 20, 0)
+
+
+@pytest.mark.parametrize('form_class', [ShowForm, BulkShowForm])
+def test_start_time_is_shown_without_seconds(app, form_class):
+    form = form_class(formdata=None, data={'start_time': datetime.datetime(2030, 1, 1, 20, 0, 30)},
+                      meta={'csrf': False})
+    assert form.start_time._value() == '2030-01-01 20:00'
+
+
+def test_bad_start_time_is_refused(app):
+    form = ShowForm(formdata=MultiDict({'start_time': '1 January 2030', 'duration': '60'}), meta={'csrf': False})
+    assert not form.validate()
+    assert 'start_time' in form.errors
+
+
+def test_bulk_start_time_is_optional(app):
+    form = BulkShowForm(formdata=MultiDict({'shows': '1, 1, 2030-01-01 20:00', 'start_time': '',
+                                            'duration': '60'}), meta={'csrf': False})
+    assert form.validate(), form.errors
+    assert form.start_time.data is None
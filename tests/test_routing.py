@@ -0,0 +1,82 @@
+import shutil
+import sqlite3
+
+import pytest
+
+from extensions import db
+from routing import replica_stats
+
+VENUE = {'city': 'San Francisco', 'state': 'CA', 'address': '1015 Folsom Street', 'phone': '555-555-5555',
+         'genres': 'Jazz', 'website': 'https://www.themusicalhop.com',
+         'image_link': 'https://example.com/hop.jpg', 'facebook_link': 'https://www.facebook.com/TheMusicalHop'}
+
+
+@pytest.fixture
+def replicated(make_app, add_venue, tmp_path):
+    # a primary and a replica that has copied it, then drifted: what a page
+    # says tells which of the two it was read from
+    venue_id = add_venue(name='On the primary')
+    db.session.remove()
+    shutil.copy(tmp_path / 'fyyur.db', tmp_path / 'replica.db')
+    with sqlite3.connect(tmp_path / 'replica.db') as connection:
+        connection.execute('UPDATE "Venue" SET name = ?', ('On the replica',))
+
+    def make(replica='replica.db', **overrides):
+        app = make_app(SQLALCHEMY_BINDS={'replica0': f'sqlite:///{tmp_path / replica}'}, **overrides)
+        return app, app.test_client(), venue_id
+    return make
+
+
+def page(client, venue_id):
+    return client.get(f'/venues/{venue_id}').get_data(as_text=True)
+
+
+def test_reads_go_to_the_replica(replicated):
+    app, client, venue_id = replicated()
+    assert 'On the replica' in page(client, venue_id)
+
+
+def test_writes_go_to_the_primary(replicated, tmp_path):
+    app, client, venue_id = replicated()
+    response = client.post(f'/venues/{venue_id}/edit', data=dict(VENUE, name='Edited'))
+    assert response.status_code == 302
+
+    with sqlite3.connect(tmp_path / 'fyyur.db') as connection:
+        assert connection.execute('SELECT name FROM "Venue"').fetchall() == [('Edited',)]
+    with sqlite3.connect(tmp_path / 'replica.db') as connection:
+        assert connection.execute('SELECT name FROM "Venue"').fetchall() == [('On the replica',)]
+
+
+def test_a_client_reads_its_own_writes(replicated):
+    app, client, venue_id = replicated()
+    client.post(f'/venues/{venue_id}/edit', data=dict(VENUE, name='Edited'))
+
+    assert 'Edited' in page(client, venue_id)
+    # other clients read from the replica, which has not caught up
+    assert 'On the replica' in page(app.test_client(), venue_id)
+
+
+def test_stickiness_expires(replicated):
+    app, client, venue_id = replicated(REPLICA_STICKY_SECONDS=0)
+    client.post(f'/venues/{venue_id}/edit', data=dict(VENUE, name='Edited'))
+
+    assert 'On the replica' in page(client, venue_id)
+
+
+def test_reads_fail_over_to_the_primary(replicated):
+    app, client, venue_id = replicated(replica='missing/replica.db')
+
+    assert 'On the primary' in page(client, venue_id)
+    with app.app_context():
+        stats = replica_stats(db)['replica0']
+    assert stats['healthy'] is False
+    assert stats['failures'] == 1
+
+
+def test_a_failed_replica_is_left_out_until_retried(replicated):
+    app, client, venue_id = replicated(replica='missing/replica.db', REPLICA_RETRY_SECONDS=3600)
+
+    page(client, venue_id)
+    page(client, venue_id)
+    # not pinged again while it is left out
+    assert db.replicas['replica0'].failures == 1
@@ -0,0 +1,62 @@
+import pytest
+
+from extensions import db
+from models import Show
+import scheduling
+
+
+def create_show(client, artist_id, venue_id, start_time='2030-01-01 20:00:00', duration=90):
+    return client.post('/shows/create', data={'artist_id': artist_id, 'venue_id': venue_id,
+                                              'start_time': start_time, 'duration': duration})
+
+
+@pytest.fixture
+def booked(client, add_venue, add_artist):
+    venue_id = add_venue()
+    artist_id = add_artist()
+    create_show(client, artist_id, venue_id)
+    assert db.session.query(Show).count() == 1
+    return artist_id, venue_id
+
+
+def test_venue_double_booking_is_refused(client, booked, add_artist):
+    artist_id, venue_id = booked
+    page = create_show(client, add_artist(name='Matt Quevedo'), venue_id, '2030-01-01 21:00:00').get_data(as_text=True)
+    assert f'venue {venue_id} already has a show at that time' in page
+    assert db.session.query(Show).count() == 1
+
+
+def test_artist_double_booking_is_refused(client, booked, add_venue):
+    artist_id, venue_id = booked
+    page = create_show(client, artist_id, add_venue(name='Park Square'), '2030-01-01 21:00:00').get_data(as_text=True)
+    assert f'artist {artist_id} already has a show at that time' in page
+    assert db.session.query(Show).count() == 1
+
+
+def test_unknown_artist_is_refused(client, add_venue):
+    venue_id = add_venue()
+    page = create_show(client, 99, venue_id).get_data(as_text=True)
+    assert 'artist 99 does not exist' in page
+    assert db.session.query(Show).count() == 0
+
+
+def test_shows_one_after_the_other_are_accepted(client, booked):
+    artist_id, venue_id = booked
+    create_show(client, artist_id, venue_id, '2030-01-01 21:30:00')
+    assert db.session.query(Show).count() == 2
+
+
+def test_bulk_scheduling_errors_are_logged(client, add_venue, add_artist, monkeypatch, caplog):
+    venue_id = add_venue()
+    artist_id = add_artist()
+
+    def fail(rows):
+        raise RuntimeError('disk full')
+    monkeypatch.setattr(scheduling, 'schedule', fail)
+
+    page = client.post('/shows/bulk', data={'shows': f'{artist_id}, {venue_id}, 2030-01-01 20:00',
+                                            'duration': 60}).get_data(as_text=True)
+    assert 'The shows could not be saved' in page
+    record, = [record for record in caplog.records if record.levelname == 'ERROR']
+    assert record.getMessage() == 'Bulk scheduling failed'
+    assert 'disk full' in str(record.exc_info[1])
@@ -0,0 +1,63 @@
+import datetime
+import json
+
+from extensions import db
+import exporter
+from models import Show
+
+
+def test_show_is_stored_in_utc_and_shown_in_the_venue_timezone(client, add_venue, add_artist):
+    venue_id = add_venue(timezone='America/Chicago')
+    artist_id = add_artist()
+
+    response = client.post('/shows/create', data={'artist_id': artist_id, 'venue_id': venue_id,
+                                                  'start_time': '2030-01-01 20:00:00', 'duration': 90})
+    assert response.status_code == 200
+
+    show = db.session.query(Show).one()
+    assert show.start_time == datetime.datetime(2030, 1, 2, 2, 0)
+    assert show.end_time == datetime.datetime(2030, 1, 2, 3, 30)
+
+    page = client.get(f'/venues/{venue_id}').get_data(as_text=True)
+    assert 'January, 1, 2030 at 8:00PM' in page
+    page = client.get(f'/artists/{artist_id}').get_data(as_text=True)
+    assert 'January, 1, 2030 at 8:00PM' in page
+
+
+def test_show_without_venue_timezone_uses_the_default(client, add_venue, add_artist):
+    venue_id = add_venue()
+    artist_id = add_artist()
+
+    client.post('/shows/create', data={'artist_id': artist_id, 'venue_id': venue_id,
+                                       'start_time': '2030-01-01 20:00:00', 'duration': 90})
+
+    assert db.session.query(Show.start_time).scalar() == datetime.datetime(2030, 1, 1, 20, 0)
+    assert 'January, 1, 2030 at 8:00PM' in client.get(f'/venues/{venue_id}').get_data(as_text=True)
+
+
+def test_bulk_shows_are_converted_across_a_dst_change(client, add_venue, add_artist):
+    venue_id = add_venue(timezone='Europe/Paris')
+    artist_id = add_artist()
+
+    # Paris is UTC+1 in winter and UTC+2 from the last Sunday of March
+    client.post('/shows/bulk', data={'shows': f'{artist_id}, {venue_id}, 2030-03-30 20:00, 60\n'
+                                              f'{artist_id}, {venue_id}, 2030-03-31 20:00, 60',
+                                     'duration': 120})
+
+    times = db.session.query(Show.start_time, Show.end_time).order_by(Show.start_time).all()
+    assert times == [
+        (datetime.datetime(2030, 3, 30, 19, 0), datetime.datetime(2030, 3, 30, 20, 0)),
+        (datetime.datetime(2030, 3, 31, 18, 0), datetime.datetime(2030, 3, 31, 19, 0)),
+    ]
+
+
+def test_export_writes_the_venue_local_time(client, add_venue, add_artist):
+    venue_id = add_venue(timezone='America/Chicago')
+    artist_id = add_artist()
+    client.post('/shows/create', data={'artist_id': artist_id, 'venue_id': venue_id,
+                                       'start_time': '2030-01-01 20:00:00', 'duration': 90})
+
+    row = json.loads(''.join(exporter.generate('shows', 'ndjson')))
+    assert row['start_time'] == '2030-01-01 20:00:00'
+    assert row['end_time'] == '2030-01-01 21:30:00'
+    assert row['venue_timezone'] == 'America/Chicago'
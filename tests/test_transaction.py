@@ -0,0 +1,134 @@
+import sqlite3
+
+import pytest
+from sqlalchemy.exc import IntegrityError, OperationalError
+
+from extensions import db
+from models import Venue
+import transaction
+
+
+def new_venue(name):
+    return Venue(name=name, city='San Francisco', state='CA', address='1015 Folsom Street', genres=['Jazz'])
+
+
+def locked():
+    return OperationalError('INSERT', {}, sqlite3.OperationalError('database is locked'))
+
+
+def venue_names():
+    # what is committed, read on a connection of its own
+    with db.engine.connect() as connection:
+        return [name for name, in connection.execute(db.select([Venue.name]).order_by(Venue.id))]
+
+
+def test_atomic_commits(app):
+    @transaction.atomic
+    def save():
+        new_venue('The Dueling Pianos Bar').create()
+        return 'saved'
+
+    assert save() == 'saved'
+    assert venue_names() == ['The Dueling Pianos Bar']
+
+
+def test_atomic_rolls_back_and_raises(app):
+    @transaction.atomic
+    def save():
+        new_venue('The Dueling Pianos Bar').create()
+        db.session.flush()
+        raise ValueError('no')
+
+    with pytest.raises(ValueError):
+        save()
+    assert venue_names() == []
+
+
+def test_atomic_retries_a_locked_database(app):
+    attempts = []
+
+    @transaction.atomic
+    def save():
+        attempts.append(1)
+        new_venue(f'Attempt {len(attempts)}').create()
+        if len(attempts) == 1:
+            db.session.flush()
+            raise locked()
+
+    save()
+    assert len(attempts) == 2
+    assert venue_names() == ['Attempt 2']
+
+
+def test_atomic_gives_up_after_the_retries(app):
+    app.config['TRANSACTION_RETRIES'] = 2
+    attempts = []
+
+    @transaction.atomic
+    def save():
+        attempts.append(1)
+        raise locked()
+
+    with pytest.raises(OperationalError):
+        save()
+    assert len(attempts) == 3
+
+
+def test_atomic_does_not_retry_other_errors(app):
+    attempts = []
+
+    @transaction.atomic
+    def save():
+        attempts.append(1)
+        raise IntegrityError('INSERT', {}, sqlite3.IntegrityError('UNIQUE constraint failed'))
+
+    with pytest.raises(IntegrityError):
+        save()
+    assert len(attempts) == 1
+
+
+def test_commit_hooks_run_after_the_commit(app):
+    calls = []
+
+    @transaction.atomic
+    def save():
+        new_venue('The Dueling Pianos Bar').create()
+        transaction.on_commit(lambda: calls.append(venue_names()))
+
+    save()
+    # the hook saw the committed row
+    assert calls == [['The Dueling Pianos Bar']]
+
+
+def test_commit_hooks_are_dropped_on_rollback(app):
+    calls = []
+
+    @transaction.atomic
+    def save():
+        transaction.on_commit(lambda: calls.append('failed'))
+        raise ValueError('no')
+
+    with pytest.raises(ValueError):
+        save()
+
+    @transaction.atomic
+    def save_again():
+        transaction.on_commit(lambda: calls.append('committed'))
+
+    save_again()
+    assert calls == ['committed']
+
+
+def test_commit_hooks_of_a_retried_attempt_are_dropped(app):
+    calls = []
+    attempts = []
+
+    @transaction.atomic
+    def save():
+        attempts.append(1)
+        transaction.on_commit(lambda attempt=len(attempts): calls.append(attempt))
+        if len(attempts) == 1:
+            raise locked()
+
+    save()
+    assert calls == [2]
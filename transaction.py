@@ -0,0 +1,79 @@
+#----------------------------------------------------------------------------#
+# Unit-of-work transactions.
+#
+#   @transaction.atomic
+#   def save():
+#       venue = Venue.query.get(venue_id)
+#       venue.name = name
+#       venue.update()
+#
+# The models' create(), update() and delete() only stage their changes in the
+# request's session. A function decorated with atomic runs them and commits
+# once at the end, so a request makes one flush (inserts of a table batched)
+# and one commit. Any error rolls the session back and is raised again.
+# Serialization failures and deadlocks (SQLSTATE 40001 and 40P01, a locked
+# database on SQLite) are retried up to TRANSACTION_RETRIES times: the whole
+# function runs again, so it must read what it changes itself rather than
+# reuse objects loaded before a rollback.
+#
+# on_commit() registers work that must only happen once the data is
+# committed (cache invalidation, the typeahead index); it is dropped when the
+# transaction rolls back.
+#----------------------------------------------------------------------------#
+
+import functools
+import random
+import time
+
+from flask import current_app
+from sqlalchemy import event
+from sqlalchemy.exc import DBAPIError
+
+from extensions import db
+
+RETRYABLE = ('40001', '40P01')
+
+
+def retryable(error):
+    code = getattr(error.orig, 'pgcode', None)
+    return code in RETRYABLE or 'database is locked' in str(error.orig)
+
+
+def atomic(f):
+    @functools.wraps(f)
+    def wrapper(*args, **kwargs):
+        attempts = current_app.config['TRANSACTION_RETRIES'] + 1
+        for attempt in range(1, attempts + 1):
+            try:
+                result = f(*args, **kwargs)
+                db.session.commit()
+                return result
+            except DBAPIError as e:
+                db.session.rollback()
+                if attempt == attempts or not retryable(e):
+                    raise
+                current_app.logger.warning('Retrying %s after %s (attempt %d)', f.__name__, e.orig, attempt)
+                # jittered backoff so the transactions that collided do not collide again
+                time.sleep(random.uniform(0, 0.01 * 2 ** attempt))
+            except BaseException:
+                db.session.rollback()
+                raise
+    return wrapper
+
+
+#  Commit hooks
+#  ----------------------------------------------------------------
+
+def on_commit(callback):
+    db.session().info.setdefault('on_commit', []).append(callback)
+
+
+@event.listens_for(db.session, 'after_commit')
+def run_commit_hooks(session):
+    for callback in session.info.pop('on_commit', []):
+        callback()
+
+
+@event.listens_for(db.session, 'after_soft_rollback')
+def drop_commit_hooks(session, previous_transaction):
+    session.info.pop('on_commit', None)
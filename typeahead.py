@@ -0,0 +1,100 @@
+#----------------------------------------------------------------------------#
+# In-process prefix index for the typeahead endpoint.
+#
+# A sorted list of (key, kind, id) tuples searched with bisect. Every name is
+# indexed once per word, so "jazz" finds "The Jazz Cafe". The index is built
+# from the database once per worker and then kept current by the models'
+# create/update/delete methods, so keystrokes never hit the database. The
+# writes of other workers and of the flask commands are caught by comparing
+# the version the index was built from (the count and latest updated_at of
+# venues and artists) with the database's, at most every few seconds.
+#----------------------------------------------------------------------------#
+
+import bisect
+import threading
+import time
+
+
+def index_keys(name):
+    # 'The Jazz Cafe' -> ['the jazz cafe', 'jazz cafe', 'cafe']
+    words = (name or '').lower().split()
+    return [' '.join(words[i:]) for i in range(len(words))]
+
+
+class PrefixIndex:
+
+    def __init__(self):
+        self._keys = []      # sorted (key, kind, id)
+        self._names = {}     # (kind, id) -> name
+        self._lock = threading.Lock()
+        self._checked_at = None
+        self.version = None
+
+    def build(self, items, version=None):
+        # items: iterable of (kind, id, name); version: what they were read at
+        keys = []
+        names = {}
+        for kind, id, name in items:
+            names[(kind, id)] = name
+            keys.extend((key, kind, id) for key in index_keys(name))
+        keys.sort()
+        with self._lock:
+            self._keys = keys
+            self._names = names
+            self.version = version
+            self._checked_at = time.monotonic()
+
+    def due(self, seconds):
+        # true at most once every `seconds`: time to compare versions
+        now = time.monotonic()
+        with self._lock:
+            if self._checked_at is not None and now - self._checked_at < seconds:
+                return False
+            self._checked_at = now
+            return True
+
+    def add(self, kind, id, name):
+        with self._lock:
+            self._remove(kind, id)
+            self._names[(kind, id)] = name
+            for key in index_keys(name):
+                bisect.insort(self._keys, (key, kind, id))
+
+    def remove(self, kind, id):
+        with self._lock:
+            self._remove(kind, id)
+
+    def _remove(self, kind, id):
+        name = self._names.pop((kind, id), None)
+        if name is None:
+            return
+        for key in index_keys(name):
+            i = bisect.bisect_left(self._keys, (key, kind, id))
+            if i < len(self._keys) and self._keys[i] == (key, kind, id):
+                del self._keys[i]
+
+    def search(self, prefix, limit=10, kind=None):
+        # returns up to limit (kind, id, name), one per entity, optionally
+        # only of the given kind
+        prefix = ' '.join(prefix.lower().split())
+        if not prefix:
+            return []
+        results = []
+        seen = set()
+        with self._lock:
+            i = bisect.bisect_left(self._keys, (prefix,))
+            while i < len(self._keys) and len(results) < limit:
+                key, entry_kind, id = self._keys[i]
+                if not key.startswith(prefix):
+                    break
+                if (entry_kind, id) not in seen and kind in (None, entry_kind):
+                    seen.add((entry_kind, id))
+                    results.append((entry_kind, id, self._names[(entry_kind, id)]))
+                i += 1
+        return results
+
+    def __len__(self):
+        return len(self._names)
+
+
+index = PrefixIndex()
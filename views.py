@@ -0,0 +1,663 @@
+#----------------------------------------------------------------------------#
+# The site's pages and forms, registered by create_app() (app.py).
+#----------------------------------------------------------------------------#
+
+import datetime
+import functools
+
+from flask import Blueprint, Response, abort, current_app, flash, jsonify, redirect, render_template, request, \
+    stream_with_context, url_for
+
+from cache import response_cache
+from conditional import conditional
+from dbpool import pool_stats
+from extensions import db
+from forms import ArtistForm, BulkShowForm, ShowForm, VenueForm
+from models import Venue, Artist
+from routing import replica_stats
+import counters
+import exporter
+import pages
+import scheduling
+import search
+import templating
+import transaction
+import typeahead
+
+main = Blueprint('main', __name__)
+
+
+@main.route('/')
+def index():
+    return render_template('pages/home.html')
+
+
+#  Venues
+#  ----------------------------------------------------------------
+
+#List of all venues, grouped by area, a page of areas at a time
+@main.route('/venues')
+@conditional(pages.venues_validator)
+@response_cache.cached(tags=['venues'])
+def venues():
+    per_page = current_app.config['AREAS_PER_PAGE']
+    try:
+      after = request.args.get('after') and pages.parse_area_cursor(request.args['after'])
+    except ValueError:
+      abort(400)
+
+    rows = pages.venues_query(after, per_page)
+    return render_template('pages/venues.html', **pages.venues_context(rows, per_page))
+
+#search venues by name, city, state and genre, ranked by relevance
+@main.route('/venues/search', methods=['POST'])  
+def search_venues():
+    # main.html -> name="search_term"
+    search_term = request.form.get('search_term', '')
+    page = request.form.get('page', 1, type=int)
+    per_page = current_app.config['SEARCH_RESULTS_PER_PAGE']
+
+    count, results = search.search(Venue, search_term, page, per_page)
+    return render_template('pages/search_venues.html',
+                           **pages.search_context(search_term, count, results, page, per_page))
+
+# show venue page with the given venue_id
+@main.route('/venues/<int:venue_id>')
+@conditional(pages.show_venue_validator)
+@response_cache.cached()
+def show_venue(venue_id):
+    response_cache.tag(f'venue:{venue_id}')
+
+    venue = pages.venue_query(venue_id).first()
+    if venue is None:
+      abort(404)
+    shows = pages.venue_shows_query(venue_id).all()
+
+    # the page shows artist names and images
+    response_cache.tag(*{f'artist:{show.artist_id}' for show in shows})
+
+    return render_template('pages/show_venue.html', **pages.venue_context(venue, shows))
+
+# booked and free time of a venue, ?from=2021-06-01T00:00&to=2021-06-08T00:00
+# (the coming week by default), in UTC as show times are stored
+@main.route('/venues/<int:venue_id>/availability')
+def venue_availability(venue_id):
+    try:
+      start = request.args.get('from')
+      start = datetime.datetime.fromisoformat(start) if start else datetime.datetime.utcnow().replace(second=0, microsecond=0)
+      end = request.args.get('to')
+      end = datetime.datetime.fromisoformat(end) if end else start + datetime.timedelta(days=7)
+    except ValueError:
+      abort(400)
+    if not start < end <= start + datetime.timedelta(days=current_app.config['AVAILABILITY_MAX_DAYS']):
+      abort(400)
+    if db.session.query(Venue.id).filter(Venue.id == venue_id).scalar() is None:
+      abort(404)
+
+    busy, free = scheduling.availability(venue_id, start, end)
+    return jsonify({
+      "venue_id": venue_id,
+      "from": start.isoformat(),
+      "to": end.isoformat(),
+      "busy": [{"show_id": show.id, "start_time": show.start_time.isoformat(), "end_time": show.end_time.isoformat()}
+               for show in busy],
+      "free": [{"start_time": slot_start.isoformat(), "end_time": slot_end.isoformat()}
+               for slot_start, slot_end in free],
+    })
+
+
+# venues around a point, nearest first: ?lat=30.27&lng=-97.74&km=25, and
+# optionally &seeking_talent=1 and &genre=Jazz
+@main.route('/venues/near')
+def venues_near():
+    try:
+      latitude = float(request.args['lat'])
+      longitude = float(request.args['lng'])
+      km = float(request.args.get('km', current_app.config['NEAR_DEFAULT_KM']))
+    except (KeyError, ValueError):
+      abort(400)
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180 and 0 < km <= current_app.config['NEAR_MAX_KM']):
+      abort(400)
+    limit = max(1, min(request.args.get('limit', 20, type=int), current_app.config['NEAR_MAX_RESULTS']))
+    seeking_talent = request.args.get('seeking_talent')
+    if seeking_talent is not None:
+      seeking_talent = seeking_talent.lower() in ('1', 'true', 'yes')
+
+    rows = pages.near_query(latitude, longitude, km, seeking_talent, request.args.get('genre')).all()
+    return jsonify(pages.near_context(rows, latitude, longitude, km, limit))
+
+
+#  Typeahead
+#  ----------------------------------------------------------------
+
+# name suggestions for the search box, answered from memory
+@main.route('/api/typeahead')
+def typeahead_suggestions():
+    refresh_typeahead_index()
+    q = request.args.get('q', '')
+    limit = min(request.args.get('limit', 10, type=int), 50)
+    kind = request.args.get('type')
+
+    data = []
+    for result_kind, id, name in typeahead.index.search(q, limit, kind):
+      data.append({
+        "type": result_kind,
+        "id": id,
+        "name": name,
+        "url": f'/{result_kind}s/{id}',
+      })
+
+    return jsonify(results=data)
+
+
+#  Create and Delete Venues
+#  ----------------------------------------------------------------
+
+@main.route('/venues/create', methods=['GET'])
+def create_venue_form():
+    form = VenueForm()
+    return render_template('forms/new_venue.html', form=form)
+
+# Create venue
+@main.route('/venues/create', methods=['POST'])
+def create_venue_submission():
+    form = VenueForm()
+    if form.validate_on_submit():
+      error = False
+      try:
+          name = form.name.data
+          city = form.city.data
+          state = form.state.data
+          address = form.address.data
+          phone = form.phone.data
+          website = form.website.data
+          genres = form.genres.data
+          image_link = form.image_link.data
+          facebook_link = form.facebook_link.data
+   
+          timezone = form.timezone.data or None
+          latitude = form.latitude.data
+          longitude = form.longitude.data
+   
+          seeking_description = form.seeking_description.data
+          if seeking_description:
+            seeking_talent = True
+          else:
+            seeking_talent = False
+
+          @transaction.atomic
+          def save():
+            venue = Venue(name=name, city=city, state=state,
+                          address=address, phone=phone, image_link=image_link,
+                          facebook_link=facebook_link, website=website, genres=genres,
+                          seeking_talent=seeking_talent, seeking_description=seeking_description,
+                          timezone=timezone, latitude=latitude, longitude=longitude)
+            venue.create()
+
+          save()
+      except Exception as e:
+          error = True
+          print(f'Error ==> {e}')
+      if error:
+          # TODO: on unsuccessful db insert, flash an error instead.
+          flash('An error occurred. Venue ' + request.form['name'] + ' could not be listed.')
+      else:
+          flash('Venue ' + request.form['name'] + ' was successfully listed!')
+    else:
+      errors_list = []
+      for error in form.errors.values():
+        errors_list.append(error[0])
+      flash('Invalid submission: \n' + ', '.join(errors_list))
+      return render_template('forms/new_venue.html', form=form)
+
+    return render_template('pages/home.html')
+
+# Delete venue
+@main.route('/venues/<venue_id>', methods=['DELETE'])
+def delete_venue(venue_id):
+# TODO: Complete this endpoint for taking a venue_id, and using
+# SQLAlchemy ORM to delete a record. Handle cases where the session commit could fail.
+  @transaction.atomic
+  def delete():
+    venues = Venue.query.get(venue_id)
+    name = venues.name
+    venues.delete()
+    return name
+
+  error = False
+  try:
+    name = delete()
+  except Exception as e:
+    error = True
+    print(f'Error ==> {e}')
+
+  if error:
+    flash('Error)')
+  else:
+    flash('Venue ' +name+' deleted.')
+
+  return 'OK'
+
+#  Artists
+#  ----------------------------------------------------------------
+
+#List of all artists alphabitacly 
+@main.route('/artists')
+@conditional(pages.artists_validator)
+@response_cache.cached(tags=['artists'])
+def artists():
+  # streamed: iter() runs the query here, so a failing one is still a 500
+  # page, and the rows are then fetched and rendered as the page is sent
+  rows = iter(pages.artists_query().yield_per(500))
+  return templating.render_streamed('pages/artists.html', **pages.artists_context(rows))
+
+# search artists by name, city, state and genre, ranked by relevance
+@main.route('/artists/search', methods=['POST'])
+def search_artists():
+    # main.html -> name="search_term"
+    search_term = request.form.get('search_term', '')
+    page = request.form.get('page', 1, type=int)
+    per_page = current_app.config['SEARCH_RESULTS_PER_PAGE']
+
+    count, results = search.search(Artist, search_term, page, per_page)
+    return render_template('pages/search_artists.html',
+                           **pages.search_context(search_term, count, results, page, per_page))
+
+# show artist
+@main.route('/artists/<int:artist_id>')
+@conditional(pages.show_artist_validator)
+@response_cache.cached()
+def show_artist(artist_id):
+    response_cache.tag(f'artist:{artist_id}')
+
+    artist = pages.artist_query(artist_id).first()
+    if artist is None:
+      abort(404)
+    shows = pages.artist_shows_query(artist_id).all()
+
+    # the page shows venue names and images
+    response_cache.tag(*{f'venue:{show.venue_id}' for show in shows})
+
+    return render_template('pages/show_artist.html', **pages.artist_context(artist, shows))
+
+
+#  Update
+#  ----------------------------------------------------------------
+#edit artist show fields
+@main.route('/artists/<int:artist_id>/edit', methods=['GET'])
+def edit_artist(artist_id):
+    # TODO: populate form with fields from artist with ID <artist_id>
+    artist = Artist.query.get(artist_id)
+    form = ArtistForm(obj=artist)
+
+    return render_template('forms/edit_artist.html', form=form, artist=artist)
+
+#edit artist submit fields
+@main.route('/artists/<int:artist_id>/edit', methods=['POST'])
+def edit_artist_submission(artist_id):
+    # TODO: take values from the form submitted, and update existing
+    # artist record with ID <artist_id> using the new attributes
+   
+    form = ArtistForm(request.form)
+    artist = Artist.query.get(artist_id)
+    if form.validate_on_submit():
+      # loads the artist again when a retry follows a rollback
+      @transaction.atomic
+      def save():
+        artist = Artist.query.get(artist_id)
+        artist.name=form.name.data
+        artist.city=form.city.data
+        artist.state=form.state.data
+        artist.phone=form.phone.data
+        artist.genres=form.genres.data
+        artist.website=form.website.data
+        artist.facebook_link=form.facebook_link.data
+        artist.image_link=form.image_link.data
+        artist.seeking_venue=form.seeking_venue.data
+        artist.seeking_description=form.seeking_description.data
+        artist.update()
+
+      error = False
+      try:
+        save()
+      except Exception as e:
+        error = True
+        print(f'Error ==> {e}')
+      if error:
+        flash('Artist ' + request.form['name'] + ' was not updated.')
+      else:
+        flash('Artist ' +request.form['name'] + ' was successfully updated.')
+    else:
+      errors_list = []
+      for error in form.errors.values():
+        errors_list.append(error[0])
+      flash('Invalid submission: \n' + ', '.join(errors_list))
+      return render_template('forms/edit_artist.html', form=form, artist=artist)
+
+    return redirect(url_for('main.show_artist', artist_id=artist_id))
+
+
+#edit venue show fields
+@main.route('/venues/<int:venue_id>/edit', methods=['GET'])
+def edit_venue(venue_id):
+    # TODO: populate form with values from venue with ID <venue_id>
+    venue = Venue.query.get(venue_id)
+    form = VenueForm(obj=venue)
+
+    return render_template('forms/edit_venue.html', form=form, venue=venue)
+
+#edit venue submit
+@main.route('/venues/<int:venue_id>/edit', methods=['POST'])
+def edit_venue_submission(venue_id):
+    # TODO: take values from the form submitted, and update existing
+    # venue record with ID <venue_id> using the new attributes
+    error = False
+    form = VenueForm(request.form)
+    if form.validate_on_submit():
+      @transaction.atomic
+      def save():
+        venue = Venue.query.get(venue_id)
+        venue.name=form.name.data
+        venue.city=form.city.data
+        venue.state=form.state.data
+        venue.address=form.address.data
+        venue.phone=form.phone.data
+        venue.genres=form.genres.data
+        venue.facebook_link=form.facebook_link.data
+        venue.image_link=form.image_link.data
+        venue.website=form.website.data
+        venue.timezone=form.timezone.data or None
+        venue.latitude=form.latitude.data
+        venue.longitude=form.longitude.data
+
+        venue.seeking_description=form.seeking_description.data
+        if venue.seeking_description:
+          venue.seeking_talent = True
+        else:
+          venue.seeking_talent = False
+        
+        venue.update()
+
+      try:
+        save()
+      except Exception as e:
+        error = True
+        print(f'Error ==> {e}')
+      if error:
+        flash('Error! Venue ' + request.form['name'] + ' was not updated.')
+      else:
+        flash( 'Venue ' + request.form['name'] + ' was successfully updated.')
+    else:
+      errors_list = []
+      for error in form.errors.values():
+        errors_list.append(error[0])
+      flash('Invalid submission: \n' + ', '.join(errors_list))
+      return render_template('forms/edit_venue.html', form=form, venue=Venue.query.get(venue_id))
+
+    return redirect(url_for('main.show_venue', venue_id=venue_id))
+
+#  Create Artist
+#  ----------------------------------------------------------------
+
+
+@main.route('/artists/create', methods=['GET'])
+def create_artist_form():
+    form = ArtistForm()
+    return render_template('forms/new_artist.html', form=form)
+
+
+@main.route('/artists/create', methods=['POST'])
+def create_artist_submission():
+    # called upon submitting the new artist listing form
+    # TODO: insert form data as a new Venue record in the db, instead
+    # TODO: modify data to be the data object returned from db insertion
+    form = ArtistForm()
+    if form.validate_on_submit():
+      error = False
+      try:
+          name = form.name.data
+          city = form.city.data
+          state = form.state.data
+          phone = form.phone.data
+          genres = form.genres.data
+          website = form.website.data
+          image_link = form.image_link.data
+          facebook_link = form.facebook_link.data
+
+          seeking_description = form.seeking_description.data
+          if seeking_description:
+            seeking_venue = True
+          else:
+            seeking_venue = False
+
+          @transaction.atomic
+          def save():
+            artist = Artist(name=name, city=city, state=state,
+                              phone=phone, genres=genres, image_link=image_link, website=website,
+                              facebook_link=facebook_link, seeking_venue=seeking_venue,
+                              seeking_description=seeking_description)
+            artist.create()
+
+          save()
+      except Exception as e:
+          error = True
+          print(f'Error ==> {e}')
+      if error:
+        # TODO: on unsuccessful db insert, flash an error instead.
+        flash('An error occurred. Artist ' + request.form['name'] + ' could not be listed.')
+      else:
+        flash('Artist ' + request.form['name'] + ' was successfully listed!')
+    else:
+      errors_list = []
+      for error in form.errors.values():
+        errors_list.append(error[0])
+      flash('Invalid submission: \n' + ', '.join(errors_list))
+      return render_template('forms/new_artist.html', form=form)
+
+    return render_template('pages/home.html')
+
+
+#  Shows
+#  ----------------------------------------------------------------
+
+#list of all shows, by date, one page at a time
+@main.route('/shows')
+@conditional(pages.shows_validator)
+@response_cache.cached(tags=['shows'])
+def shows():
+    # displays list of shows at /shows
+    per_page = current_app.config['SHOWS_PER_PAGE']
+    try:
+      after = request.args.get('after') and pages.parse_show_cursor(request.args['after'])
+    except ValueError:
+      abort(400)
+
+    rows = pages.shows_query(after, per_page).all()
+    return templating.render_streamed('pages/shows.html', **pages.shows_context(rows, per_page))
+
+
+@main.route('/shows/create')
+def create_shows():
+    # renders form. do not touch.
+    form = ShowForm()
+    return render_template('forms/new_show.html', form=form)
+
+#create show
+@main.route('/shows/create', methods=['POST'])
+def create_show_submission():
+    # called to create new shows in the db, upon submitting new show listing form
+    # TODO: insert form data as a new Show record in the db, instead
+    form = ShowForm()
+    if form.validate_on_submit():
+      error = False
+      try:
+          artist_id, venue_id = int(form.artist_id.data), int(form.venue_id.data)
+      except (TypeError, ValueError):
+          flash('Invalid submission: \nartist_id and venue_id must be ids')
+          return render_template('forms/new_show.html', form=form)
+      row = {'line': 1, 'text': '', 'error': None, 'artist_id': artist_id, 'venue_id': venue_id,
+             'start_time': form.start_time.data,
+             'end_time': form.start_time.data + datetime.timedelta(minutes=form.duration.data)}
+      try:
+          # the same checks as /shows/bulk and flask import, and the insert,
+          # in one transaction; check() marks the row, so a retry starts
+          # from a copy
+          @transaction.atomic
+          def save():
+            rows = scheduling.check(scheduling.to_utc([dict(row)]))
+            scheduling.schedule(rows)
+            return rows[0]['error']
+
+          reason = save()
+          if reason:
+            flash(f'The show could not be scheduled: {reason}.')
+            return render_template('forms/new_show.html', form=form)
+      except Exception as e:
+          error = True
+          print(f'Error ==> {e}')
+      if error:
+        # TODO: on unsuccessful db insert, flash an error instead.
+        flash('An error occurred. Show could not be saved.')
+      else:
+        flash('Show was successfully saved.')
+    else:
+      errors_list = []
+      for error in form.errors.values():
+        errors_list.append(error[0])
+      flash('Invalid submission: \n' + ', '.join(errors_list))
+      return render_template('forms/new_show.html', form=form)
+
+    return render_template('pages/home.html')
+
+#schedule many shows at once, from a list or a weekly recurrence
+@main.route('/shows/bulk')
+def bulk_shows():
+    form = BulkShowForm()
+    return render_template('forms/bulk_shows.html', form=form)
+
+@main.route('/shows/bulk', methods=['POST'])
+def bulk_shows_submission():
+    form = BulkShowForm()
+    if not form.validate_on_submit():
+      errors_list = []
+      for error in form.errors.values():
+        errors_list.append(error[0])
+      flash('Invalid submission: \n' + ', '.join(errors_list))
+      return render_template('forms/bulk_shows.html', form=form)
+
+    if (form.shows.data or '').strip():
+      rows = scheduling.parse_lines(form.shows.data, form.duration.data)
+    else:
+      rows = scheduling.recurring(form.artist_id.data, form.venue_id.data, form.start_time.data,
+                                  form.duration.data, form.weeks.data or 1, form.weekdays.data)
+    if len(rows) > current_app.config['BULK_SHOWS_MAX']:
+      flash(f"At most {current_app.config['BULK_SHOWS_MAX']} shows can be scheduled at once.")
+      return render_template('forms/bulk_shows.html', form=form)
+
+    # check() marks rows, so a retry after a rollback starts from copies
+    @transaction.atomic
+    def save():
+      checked = scheduling.check(scheduling.to_utc([dict(row) for row in rows]))
+      return checked, scheduling.schedule(checked)
+
+    try:
+      rows, scheduled = save()
+    except Exception:
+      current_app.logger.exception('Bulk scheduling failed')
+      flash('An error occurred. The shows could not be saved.')
+      return render_template('forms/bulk_shows.html', form=form)
+
+    skipped = len(rows) - scheduled
+    flash(f'{scheduled} shows were successfully saved.' + (f' {skipped} could not be scheduled.' if skipped else ''))
+    return render_template('forms/bulk_shows.html', form=form, rows=rows)
+
+
+# on SQLite (local development and tests) there are no migrations to run:
+# create the tables and the FTS5 search tables directly
+@main.before_app_first_request
+def prepare_sqlite():
+    if db.engine.dialect.name == 'sqlite':
+      db.create_all(bind=None)   # replicas copy the primary
+      search.install_sqlite_fts(db.engine, [Venue, Artist])
+      scheduling.install_sqlite_triggers(db.engine, current_app.config['SHOW_MAX_MINUTES'])
+      counters.install(db.engine)
+
+
+def typeahead_version():
+    return tuple(tuple(db.session.query(db.func.count(model.id), db.func.max(model.updated_at)).one())
+                 for model in (Venue, Artist))
+
+
+# load every venue and artist name into this worker's typeahead index
+@main.before_app_first_request
+def build_typeahead_index():
+    version = typeahead_version()
+    venues = db.session.query(Venue.id, Venue.name).all()
+    artists = db.session.query(Artist.id, Artist.name).all()
+    typeahead.index.build(
+      [('venue', venue.id, venue.name) for venue in venues] +
+      [('artist', artist.id, artist.name) for artist in artists], version)
+
+
+# and load them again when another worker or a flask command has changed them
+def refresh_typeahead_index():
+    if typeahead.index.due(current_app.config['TYPEAHEAD_REFRESH_SECONDS']) \
+        and typeahead_version() != typeahead.index.version:
+      build_typeahead_index()
+
+
+#  Internal
+#  ----------------------------------------------------------------
+
+# only reachable from the addresses in INTERNAL_IPS
+def internal_only(f):
+    @functools.wraps(f)
+    def wrapper(*args, **kwargs):
+      if request.remote_addr not in current_app.config['INTERNAL_IPS']:
+        abort(404)
+      return f(*args, **kwargs)
+    return wrapper
+
+
+@main.route('/internal/cache')
+@internal_only
+def cache_stats():
+    return jsonify(dict(response_cache.stats(), fragments=templating.fragment_cache.stats()))
+
+
+# connection pool usage, for sizing workers against the database
+@main.route('/internal/pool')
+@internal_only
+def pool_status():
+    return jsonify(primary=pool_stats(db.engine), replicas=replica_stats(db))
+
+
+# streamed catalogue dumps, e.g. /export/shows.csv?city=Austin&from=2021-01-01
+@main.route('/export/<kind>.<format>')
+@internal_only
+def export(kind, format):
+    if kind not in exporter.EXPORTS or format not in exporter.MIMETYPES:
+      abort(404)
+    try:
+      start = request.args.get('from')
+      start = start and datetime.datetime.fromisoformat(start)
+      end = request.args.get('to')
+      end = end and datetime.datetime.fromisoformat(end)
+    except ValueError:
+      abort(400)
+
+    chunks = exporter.generate(kind, format,
+                               city=request.args.get('city'), start=start, end=end,
+                               after=request.args.get('after', type=int))
+    return Response(stream_with_context(chunks), mimetype=exporter.MIMETYPES[format],
+                    headers={'Content-Disposition': f'attachment; filename={kind}.{format}'})
+
+
+@main.app_errorhandler(404)
+def not_found_error(error):
+    return render_template('errors/404.html'), 404
+
+
+@main.app_errorhandler(500)
+def server_error(error):
+    return render_template('errors/500.html'), 500
@@ -0,0 +1,9 @@
+#----------------------------------------------------------------------------#
+# WSGI entry point.
+#
+#   gunicorn                 (gunicorn.conf.py serves wsgi:app)
+#----------------------------------------------------------------------------#
+
+from app import create_app
+
+app = create_app()